@@ -0,0 +1,212 @@
+# Released under the BSD license, see LICENSE for details
+
+"""
+Synthetic kernels for the benchmarks, written locally so nothing has to be
+downloaded.
+
+The bodies move on circular orbits and the spacecraft spins about its z
+axis, which is enough for the work CSPICE does per call to be the same as
+with real ephemerides and attitude:
+
+  paths = kernels.write_kernels(directory)
+  for path in paths:
+      spice.furnsh(path)
+"""
+
+import math, os
+
+import spice
+
+LEAPSECONDS = """
+\\begindata
+
+DELTET/DELTA_T_A = 32.184
+DELTET/K = 1.657D-3
+DELTET/EB = 1.671D-2
+DELTET/M = ( 6.239996D0 1.99096871D-7 )
+
+DELTET/DELTA_AT = ( 10, @1972-JAN-1
+                    11, @1972-JUL-1
+                    12, @1973-JAN-1
+                    32, @1999-JAN-1
+                    33, @2006-JAN-1
+                    34, @2009-JAN-1
+                    35, @2012-JUL-1
+                    36, @2015-JUL-1
+                    37, @2017-JAN-1 )
+
+\\begintext
+"""
+
+# the frames and names used by the benchmarks: a fixed frame on the moon,
+# whose radii make it a target for sincpt, and the frame of the spacecraft
+# given by the CK
+FRAMES = """
+\\begindata
+
+NAIF_BODY_NAME += ( 'BENCH_SC' )
+NAIF_BODY_CODE += ( -1000 )
+
+BODY301_RADII = ( 1737.4 1737.4 1737.4 )
+
+FRAME_BENCH_MOON_FIXED = 1400301
+FRAME_1400301_NAME = 'BENCH_MOON_FIXED'
+FRAME_1400301_CLASS = 4
+FRAME_1400301_CLASS_ID = 1400301
+FRAME_1400301_CENTER = 301
+TKFRAME_1400301_RELATIVE = 'J2000'
+TKFRAME_1400301_SPEC = 'ANGLES'
+TKFRAME_1400301_UNITS = 'DEGREES'
+TKFRAME_1400301_AXES = ( 3, 1, 3 )
+TKFRAME_1400301_ANGLES = ( 10.0, 20.0, 30.0 )
+
+FRAME_BENCH_SPACECRAFT = -1000000
+FRAME_-1000000_NAME = 'BENCH_SPACECRAFT'
+FRAME_-1000000_CLASS = 3
+FRAME_-1000000_CLASS_ID = -1000000
+FRAME_-1000000_CENTER = -1000
+CK_-1000000_SCLK = -1000
+CK_-1000000_SPK = -1000
+
+\\begintext
+"""
+
+# one tick per second, counting from SCLK_START seconds past J2000 (TDB)
+SCLK_START = -1.1e8
+
+SCLK = """
+\\begindata
+
+SCLK_KERNEL_ID = ( @2000-01-01 )
+SCLK_DATA_TYPE_1000 = ( 1 )
+SCLK01_TIME_SYSTEM_1000 = ( 1 )
+SCLK01_N_FIELDS_1000 = ( 1 )
+SCLK01_MODULI_1000 = ( 1000000000000 )
+SCLK01_OFFSETS_1000 = ( 0 )
+SCLK01_OUTPUT_DELIM_1000 = ( 1 )
+SCLK_PARTITION_START_1000 = ( 0.0 )
+SCLK_PARTITION_END_1000 = ( 1.0D12 )
+SCLK01_COEFFICIENTS_1000 = ( 0.0 %.1f 1.0 )
+
+\\begintext
+""" % SCLK_START
+
+# the time span covered by the kernels, about three years either side of
+# J2000
+FIRST = -1e8
+LAST = 1e8
+
+# the CK only covers a few weeks, with a record every CK_STEP seconds
+CK_FIRST = -1e6
+CK_LAST = 1e6
+CK_STEP = 300.0
+
+# the spin period of the spacecraft
+SPIN_PERIOD = 3600.0
+
+# (body, center, radius in km, period in seconds) of the orbits
+ORBITS = (
+    (399, 0, 1.496e8, 365.25 * 86400.0),
+    (301, 399, 384400.0, 27.32 * 86400.0),
+    (-1000, 301, 10000.0, 2 * 86400.0),
+)
+
+
+def write_text(path, text):
+    with open(path, 'w') as f:
+        f.write(text)
+
+
+def write_lsk(path):
+    write_text(path, LEAPSECONDS)
+
+
+def write_fk(path):
+    write_text(path, FRAMES)
+
+
+def write_sclk(path):
+    write_text(path, SCLK)
+
+
+def get_states(radius, period, epochs):
+    """
+    Return the states of a circular orbit in the xy plane at epochs.
+    """
+    rate = 2 * math.pi / period
+    states = []
+
+    for et in epochs:
+        angle = rate * et
+        cos, sin = math.cos(angle), math.sin(angle)
+        states.append([radius * cos, radius * sin, 0.0,
+                       -radius * rate * sin, radius * rate * cos, 0.0])
+
+    return states
+
+
+def write_spk(path, step=21600.0):
+    """
+    Write the orbits to a type 13 SPK, one segment per body, with a state
+    every step seconds or less.
+    """
+    handle = spice.spkopn(path, 'benchmark', 0)
+
+    for body, center, radius, period in ORBITS:
+        # short orbits need shorter steps to be followed
+        body_step = min(step, period / 20)
+        count = int((LAST - FIRST) / body_step) + 1
+        epochs = [FIRST + i * body_step for i in range(count)]
+
+        spice.spkw13(handle, body, center, 'J2000', epochs[0], epochs[-1],
+                     'benchmark', 7, get_states(radius, period, epochs),
+                     epochs)
+
+    spice.spkcls(handle)
+
+
+def write_ck(path):
+    """
+    Write the attitude of the spacecraft, spinning about the z axis of
+    J2000, to a type 3 CK.
+    """
+    rate = 2 * math.pi / SPIN_PERIOD
+    count = int((CK_LAST - CK_FIRST) / CK_STEP) + 1
+    ticks = []
+    quats = []
+
+    for i in range(count):
+        et = CK_FIRST + i * CK_STEP
+        # the quaternion of the rotation from J2000 to the spacecraft frame
+        angle = rate * et
+        ticks.append(et - SCLK_START)
+        quats.append((math.cos(angle / 2), 0.0, 0.0, -math.sin(angle / 2)))
+
+    avvs = [(0.0, 0.0, rate)] * count
+
+    handle = spice.ckopn(path, 'benchmark', 0)
+    spice.ckw03(handle, ticks[0], ticks[-1], -1000000, 'J2000', True,
+                'benchmark', ticks, quats, avvs, [ticks[0]])
+    spice.ckcls(handle)
+
+
+def write_kernels(directory):
+    """
+    Write the kernels to directory and return their paths.
+    """
+    paths = []
+
+    for name, writer in (('benchmark.tls', write_lsk),
+                         ('benchmark.tf', write_fk),
+                         ('benchmark.tsc', write_sclk),
+                         ('benchmark.bsp', write_spk),
+                         ('benchmark.bc', write_ck)):
+        path = os.path.join(directory, name)
+
+        if os.path.exists(path):
+            os.remove(path)
+
+        writer(path)
+        paths.append(path)
+
+    return paths
@@ -0,0 +1,303 @@
+# Released under the BSD license, see LICENSE for details
+
+"""
+Benchmarks of the spice wrappers, run on the synthetic kernels of
+kernels.py:
+
+  python benchmarks/run.py -o results.json
+
+Each benchmark measures the latency of one call, the best over a few
+repetitions of a loop of calls, and the throughput of a batch of calls,
+made with the array functions of spice.vec or spice.timeconv where there
+are some.  The results are written as JSON and compared with the baseline
+(benchmarks/baseline.json by default) when there is one.  A benchmark
+regresses when its latency grows or its throughput drops by more than the
+threshold, 10% unless --threshold or the "thresholds" of the baseline say
+otherwise, and the exit status is 1 if any did.
+
+--save-baseline writes the results as the new baseline.
+"""
+
+import argparse, json, math, os, platform, shutil, sys, tempfile, time
+
+import spice
+
+import kernels
+
+try:
+    import numpy
+    from spice import timeconv
+except ImportError:
+    numpy = None
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        'baseline.json')
+
+# the benchmarks in the order they run, see benchmark()
+BENCHMARKS = []
+
+
+class Benchmark(object):
+    """
+    function is called with each tuple of args in turn to measure the
+    latency.  batch, if given, processes all of them at once to measure the
+    throughput, otherwise the loop of calls is used.
+    """
+
+    def __init__(self, name, function, args, batch=None):
+        self.name = name
+        self.function = function
+        self.args = args
+        self.batch = batch
+
+    def run_calls(self):
+        function = self.function
+
+        for args in self.args:
+            function(*args)
+
+    def measure(self, repeat):
+        latency = min(get_time(self.run_calls) for i in range(repeat))
+        batch = self.batch or self.run_calls
+        throughput = min(get_time(batch) for i in range(repeat))
+
+        return {
+            'calls': len(self.args),
+            'latency': latency / len(self.args),
+            'throughput': len(self.args) / throughput,
+        }
+
+
+def benchmark(function):
+    """
+    Register a function returning the Benchmark objects to run, given the
+    epochs to use.
+    """
+    BENCHMARKS.append(function)
+    return function
+
+
+def get_time(function):
+    start = time.time()
+    function()
+    return time.time() - start
+
+
+def get_vec(name):
+    # the array version of a function, if there is one
+    return getattr(spice.vec, name, None)
+
+
+@benchmark
+def time_conversions(ets):
+    utcs = [spice.et2utc(et, 'ISOC', 3) for et in ets]
+    str2et_batch = et2utc_batch = None
+
+    if numpy is not None:
+        times = timeconv.TimeConverter()
+        array = numpy.array(ets)
+
+        str2et_batch = lambda: times.str2et(utcs)
+        et2utc_batch = lambda: times.et2utc(array, 'ISOC', 3)
+
+    return [
+        Benchmark('str2et', spice.str2et, [(x,) for x in utcs], str2et_batch),
+        Benchmark('et2utc', spice.et2utc, [(x, 'ISOC', 3) for x in ets],
+                  et2utc_batch),
+    ]
+
+
+@benchmark
+def states(ets):
+    results = []
+
+    for name, args in (('spkezr', ('MOON', 'J2000', 'LT+S', 'EARTH')),
+                       ('spkpos', ('BENCH_SC', 'J2000', 'NONE', 'MOON'))):
+        function = getattr(spice, name)
+        vec = get_vec(name)
+        batch = vec and (lambda vec=vec, args=args: vec(args[0], ets, *args[1:]))
+
+        results.append(Benchmark(name, function,
+                                 [(args[0], x) + args[1:] for x in ets],
+                                 batch))
+
+    return results
+
+
+@benchmark
+def frames(ets):
+    vec = get_vec('pxform')
+    results = []
+
+    # a fixed offset frame, and the CK frame of the spacecraft
+    for name, frame in (('pxform_tk', 'BENCH_MOON_FIXED'),
+                        ('pxform_ck', 'BENCH_SPACECRAFT')):
+        batch = vec and (lambda frame=frame: vec('J2000', frame, ets))
+
+        results.append(Benchmark(name, spice.pxform,
+                                 [('J2000', frame, x) for x in ets], batch))
+
+    return results
+
+
+@benchmark
+def surface_intercepts(ets):
+    # looking from the spacecraft at the center of the moon
+    directions = [spice.spkpos('MOON', x, 'J2000', 'NONE', 'BENCH_SC')[0]
+                  for x in ets]
+
+    return [
+        Benchmark('sincpt', spice.sincpt,
+                  [('Ellipsoid', 'MOON', x, 'BENCH_MOON_FIXED', 'NONE',
+                    'BENCH_SC', 'J2000', y) for x, y in zip(ets, directions)]),
+    ]
+
+
+@benchmark
+def objects(ets):
+    def ellipse(center, vec1, vec2):
+        return spice.el2cgv(spice.cgv2el(center, vec1, vec2))
+
+    def plane(normal, constant):
+        return spice.pl2nvc(spice.nvc2pl(normal, constant))
+
+    angles = [2 * math.pi * i / len(ets) for i in range(len(ets))]
+
+    return [
+        Benchmark('ellipse', ellipse,
+                  [((1.0, 2.0, 3.0), (math.cos(x), math.sin(x), 0.0),
+                    (0.0, 0.0, 0.5)) for x in angles]),
+        Benchmark('plane', plane,
+                  [((math.cos(x), math.sin(x), 1.0), x) for x in angles]),
+        Benchmark('vnorm', spice.vnorm,
+                  [((math.cos(x), math.sin(x), 1.0),) for x in angles]),
+    ]
+
+
+@benchmark
+def errors(ets):
+    def unknown_body(et):
+        try:
+            spice.spkezr('NO_SUCH_BODY', et, 'J2000', 'NONE', 'EARTH')
+        except spice.SpiceException:
+            pass
+
+    return [Benchmark('error', unknown_body, [(x,) for x in ets])]
+
+
+def run(calls, repeat, names=None):
+    """
+    Run the benchmarks, or those in names, and return their results by
+    name.
+    """
+    step = (kernels.CK_LAST - kernels.CK_FIRST) / (calls + 1)
+    ets = [kernels.CK_FIRST + (i + 1) * step for i in range(calls)]
+    results = {}
+
+    for function in BENCHMARKS:
+        for bench in function(ets):
+            if names and bench.name not in names:
+                continue
+
+            results[bench.name] = bench.measure(repeat)
+
+    return results
+
+
+def compare(results, baseline, threshold):
+    """
+    Return (name, measure, change) for the results that regressed by more
+    than their threshold compared with the baseline.
+    """
+    thresholds = baseline.get('thresholds', {})
+    regressions = []
+
+    for name, result in sorted(results.items()):
+        base = baseline.get('results', {}).get(name)
+        if not base:
+            continue
+
+        limit = thresholds.get(name, threshold)
+
+        # the relative change, positive when it got worse
+        changes = (('latency', result['latency'] / base['latency'] - 1),
+                   ('throughput', base['throughput'] / result['throughput'] - 1))
+
+        for measure, change in changes:
+            if change > limit:
+                regressions.append((name, measure, change))
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('names', nargs='*', help='benchmarks to run')
+    parser.add_argument('-o', '--output', help='write the results here')
+    parser.add_argument('-b', '--baseline', default=BASELINE,
+                        help='compare the results with this baseline')
+    parser.add_argument('-t', '--threshold', type=float, default=0.1,
+                        help='regression allowed, as a fraction')
+    parser.add_argument('-n', '--calls', type=int, default=2000,
+                        help='calls per measurement')
+    parser.add_argument('-r', '--repeat', type=int, default=5,
+                        help='measurements per benchmark')
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='write the results to the baseline')
+    options = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    try:
+        for path in kernels.write_kernels(directory):
+            spice.furnsh(path)
+
+        results = run(options.calls, options.repeat, options.names)
+    finally:
+        spice.kclear()
+        shutil.rmtree(directory)
+
+    report = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'results': results,
+    }
+
+    for name, result in sorted(results.items()):
+        print '%-12s %10.2f us/call %12.0f calls/s' % \
+            (name, result['latency'] * 1e6, result['throughput'])
+
+    if options.output:
+        with open(options.output, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+
+    if options.save_baseline:
+        # the thresholds set in the baseline are kept
+        if os.path.exists(options.baseline):
+            with open(options.baseline) as f:
+                thresholds = json.load(f).get('thresholds')
+
+            if thresholds:
+                report['thresholds'] = thresholds
+
+        with open(options.baseline, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+
+        return 0
+
+    if not os.path.exists(options.baseline):
+        return 0
+
+    with open(options.baseline) as f:
+        baseline = json.load(f)
+
+    regressions = compare(results, baseline, options.threshold)
+
+    for name, measure, change in regressions:
+        print 'regression: %s %s is %.0f%% worse' % (name, measure, change * 100)
+
+    return regressions and 1 or 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
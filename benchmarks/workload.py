@@ -0,0 +1,54 @@
+# Released under the BSD license, see LICENSE for details
+
+"""
+A representative workload for the pgo build profile of setup.py, which
+runs it with the instrumented extension to gather the profiles of the
+optimized build.  It calls the time conversion, ephemeris and frame
+functions the way an application does, with the synthetic kernels of
+kernels.py.
+"""
+
+import shutil, tempfile
+
+import spice
+
+import kernels
+
+ITERATIONS = 20000
+
+
+def run(iterations=ITERATIONS):
+    step = (kernels.LAST - kernels.FIRST) / (iterations + 1)
+    ets = [kernels.FIRST + (i + 1) * step for i in range(iterations)]
+
+    for et in ets:
+        utc = spice.et2utc(et, 'ISOC', 3)
+        spice.str2et(utc)
+
+        spice.spkezr('301', et, 'J2000', 'LT+S', '399')
+        spice.spkpos('-1000', et, 'ECLIPJ2000', 'NONE', '399')
+
+        rotation = spice.pxform('J2000', 'ECLIPJ2000', et)
+        spice.mxv(rotation, (1.0, 2.0, 3.0))
+
+    spice.vec.spkezr('301', ets, 'J2000', 'NONE', '399')
+    spice.vec.spkpos('-1000', ets, 'J2000', 'NONE', '0')
+
+
+def main():
+    directory = tempfile.mkdtemp()
+
+    try:
+        paths = kernels.write_kernels(directory)
+
+        for path in paths:
+            spice.furnsh(path)
+
+        run()
+    finally:
+        spice.kclear()
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
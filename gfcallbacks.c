@@ -0,0 +1,668 @@
+/**
+ * PySPICE geometry finder callbacks
+ *
+ * This file contains the hand written wrappers for the GF routines and
+ * numerical differentiation routines that take user defined functions.
+ * Python callables are invoked from C through the trampoline functions
+ * below; the callables for the current call are kept in a static struct
+ * that is saved and restored around each call so searches can be nested.
+ *
+ * Released under the BSD license, see LICENSE for details
+ *
+ * $Id$
+ */
+#include "pyspice.h"
+
+/* longest string accepted for the gfevnt quantity parameters */
+#define GFEVNT_LENVALS 81
+
+/**
+ * Python callables used by the trampolines during the current call
+ */
+typedef struct {
+    PyObject *udfuns;
+    PyObject *udqdec;
+    PyObject *udstep;
+    PyObject *udrefn;
+    PyObject *udrepi;
+    PyObject *udrepu;
+    PyObject *udrepf;
+    PyObject *udbail;
+    SpiceDouble dx;
+} gf_callbacks;
+
+/**
+ * CSPICE functions passed to the GF routines taking all of the callbacks
+ */
+typedef struct {
+    void (*udstep)(SpiceDouble et, SpiceDouble *step);
+    void (*udrefn)(SpiceDouble t1, SpiceDouble t2, SpiceBoolean s1,
+                   SpiceBoolean s2, SpiceDouble *t);
+    void (*udrepi)(SpiceCell *cnfine, ConstSpiceChar *srcpre,
+                   ConstSpiceChar *srcsuf);
+    void (*udrepu)(SpiceDouble ivbeg, SpiceDouble ivend, SpiceDouble et);
+    void (*udrepf)(void);
+    SpiceBoolean (*udbail)(void);
+    /* step size of gfstep_c, see set_search_step() */
+    int set_step;
+    SpiceDouble step;
+} gf_functions;
+
+static gf_callbacks callbacks;
+
+/* argument tuple reused by call_with_double() */
+static PyObject *double_args = NULL;
+
+/**
+ * Stop the CSPICE routine calling back into Python once a callback raised
+ * an exception.  The Python exception is reported instead of the SPICE
+ * error, see check_callback_call().
+ */
+static void signal_callback_error(void)
+{
+    if(!failed_c()) {
+        setmsg_c("A Python callback raised an exception.");
+        sigerr_c("SPICE(PYTHONCALLBACK)");
+    }
+}
+
+/**
+ * Call func with a single float argument
+ *
+ * This is the hot path of a search, so the argument tuple is reused as long
+ * as the callee did not keep a reference to it, and functions implemented
+ * in C taking a single argument are called directly.
+ */
+static PyObject * call_with_double(PyObject *func, SpiceDouble x)
+{
+    PyObject *args = NULL, *value = NULL, *result = NULL;
+
+    /* don't call back into Python while an exception is pending */
+    if(PyErr_Occurred()) {
+        return NULL;
+    }
+
+    value = PyFloat_FromDouble(x);
+
+    if(!value) {
+        return NULL;
+    }
+
+    if(PyCFunction_Check(func) &&
+       (PyCFunction_GET_FLAGS(func) & ~METH_COEXIST) == METH_O) {
+        result = PyCFunction_GET_FUNCTION(func)(PyCFunction_GET_SELF(func), value);
+        Py_DECREF(value);
+
+        return result;
+    }
+
+    if(double_args && Py_REFCNT(double_args) == 1) {
+        args = double_args;
+
+        Py_DECREF(PyTuple_GET_ITEM(args, 0));
+        PyTuple_SET_ITEM(args, 0, value);
+    } else {
+        args = PyTuple_New(1);
+
+        if(!args) {
+            Py_DECREF(value);
+            return NULL;
+        }
+
+        PyTuple_SET_ITEM(args, 0, value);
+
+        Py_XDECREF(double_args);
+        double_args = args;
+    }
+
+    Py_INCREF(args);
+    result = PyObject_Call(func, args, NULL);
+    Py_DECREF(args);
+
+    return result;
+}
+
+/**
+ * Store the float returned by a callback in value
+ */
+static void get_callback_double(PyObject *result, SpiceDouble *value)
+{
+    if(result) {
+        *value = PyFloat_AsDouble(result);
+        Py_DECREF(result);
+    }
+
+    if(PyErr_Occurred()) {
+        *value = 0.0;
+        signal_callback_error();
+    }
+}
+
+/**
+ * Store the truth value returned by a callback in value
+ */
+static void get_callback_boolean(PyObject *result, SpiceBoolean *value)
+{
+    int truth = -1;
+
+    if(result) {
+        truth = PyObject_IsTrue(result);
+        Py_DECREF(result);
+    }
+
+    *value = (truth > 0) ? SPICETRUE : SPICEFALSE;
+
+    if(truth < 0) {
+        signal_callback_error();
+    }
+}
+
+/**
+ * Discard the result of a callback returning nothing
+ */
+static void check_callback_result(PyObject *result)
+{
+    if(result) {
+        Py_DECREF(result);
+    } else {
+        signal_callback_error();
+    }
+}
+
+/* trampolines from the CSPICE callbacks to the Python callables */
+
+static void udfuns_trampoline(SpiceDouble et, SpiceDouble *value)
+{
+    get_callback_double(call_with_double(callbacks.udfuns, et), value);
+}
+
+static void udqdec_trampoline(void (*udfuns)(SpiceDouble et, SpiceDouble *value),
+                              SpiceDouble et, SpiceBoolean *isdecr)
+{
+    get_callback_boolean(call_with_double(callbacks.udqdec, et), isdecr);
+}
+
+/**
+ * Decide whether udfuns is decreasing with uddc_c when gfuds is not given a
+ * udqdec callable
+ */
+static void default_udqdec(void (*udfuns)(SpiceDouble et, SpiceDouble *value),
+                           SpiceDouble et, SpiceBoolean *isdecr)
+{
+    uddc_c(udfuns, et, callbacks.dx, isdecr);
+}
+
+static void udstep_trampoline(SpiceDouble et, SpiceDouble *step)
+{
+    get_callback_double(call_with_double(callbacks.udstep, et), step);
+}
+
+static void udrefn_trampoline(SpiceDouble t1, SpiceDouble t2, SpiceBoolean s1,
+                              SpiceBoolean s2, SpiceDouble *t)
+{
+    PyObject *result = NULL;
+
+    if(!PyErr_Occurred()) {
+        result = PyObject_CallFunction(callbacks.udrefn, "ddNN", t1, t2,
+                                       PyBool_FromLong(s1), PyBool_FromLong(s2));
+    }
+
+    get_callback_double(result, t);
+}
+
+static void udrepi_trampoline(SpiceCell *cnfine, ConstSpiceChar *srcpre,
+                              ConstSpiceChar *srcsuf)
+{
+    PyObject *result = NULL;
+
+    if(!PyErr_Occurred()) {
+        result = PyObject_CallFunction(callbacks.udrepi, "Nss", get_py_cell(cnfine),
+                                       srcpre, srcsuf);
+    }
+
+    check_callback_result(result);
+}
+
+static void udrepu_trampoline(SpiceDouble ivbeg, SpiceDouble ivend, SpiceDouble et)
+{
+    PyObject *result = NULL;
+
+    if(!PyErr_Occurred()) {
+        result = PyObject_CallFunction(callbacks.udrepu, "ddd", ivbeg, ivend, et);
+    }
+
+    check_callback_result(result);
+}
+
+static void udrepf_trampoline(void)
+{
+    PyObject *result = NULL;
+
+    if(!PyErr_Occurred()) {
+        result = PyObject_CallObject(callbacks.udrepf, NULL);
+    }
+
+    check_callback_result(result);
+}
+
+static SpiceBoolean udbail_trampoline(void)
+{
+    PyObject *result = NULL;
+    SpiceBoolean bail = SPICEFALSE;
+
+    /* give up on the search right away after an exception */
+    if(PyErr_Occurred()) {
+        return SPICETRUE;
+    }
+
+    result = PyObject_CallObject(callbacks.udbail, NULL);
+    get_callback_boolean(result, &bail);
+
+    return bail || PyErr_Occurred();
+}
+
+/**
+ * Check that a callback argument is callable.  None stands for the default
+ * if allow_none is set.
+ */
+static int check_callable(PyObject *func, const char *name, int allow_none)
+{
+    if(allow_none && (!func || func == Py_None)) {
+        return 1;
+    }
+
+    if(!PyCallable_Check(func)) {
+        PyErr_Format(PyExc_TypeError, "%s must be callable", name);
+        return 0;
+    }
+
+    return 1;
+}
+
+/**
+ * Set up the step, refinement, reporting and interrupt callbacks shared by
+ * gfevnt, gffove and gfocce.  CSPICE's default functions are used for the
+ * callables left out.  udstep can also be a step size in seconds for
+ * gfstep_c, which is only passed to CSPICE by set_search_step().
+ */
+static int get_search_functions(PyObject *udstep, PyObject *udrefn,
+                                PyObject *udrepi, PyObject *udrepu,
+                                PyObject *udrepf, PyObject *udbail,
+                                gf_functions *functions)
+{
+    if(!check_callable(udrefn, "udrefn", 1) || !check_callable(udrepi, "udrepi", 1) ||
+       !check_callable(udrepu, "udrepu", 1) || !check_callable(udrepf, "udrepf", 1) ||
+       !check_callable(udbail, "udbail", 1)) {
+        return 0;
+    }
+
+    functions->udstep = gfstep_c;
+    functions->set_step = 0;
+
+    if(udstep && udstep != Py_None) {
+        if(PyCallable_Check(udstep)) {
+            functions->udstep = udstep_trampoline;
+        } else {
+            double step = 0.0;
+
+            if(!get_spice_double(udstep, &step)) {
+                PyErr_SetString(PyExc_TypeError,
+                                "udstep must be callable or a step size");
+                return 0;
+            }
+
+            functions->set_step = 1;
+            functions->step = step;
+        }
+    }
+
+    functions->udrefn = (udrefn && udrefn != Py_None) ? udrefn_trampoline : gfrefn_c;
+    functions->udrepi = (udrepi && udrepi != Py_None) ? udrepi_trampoline : gfrepi_c;
+    functions->udrepu = (udrepu && udrepu != Py_None) ? udrepu_trampoline : gfrepu_c;
+    functions->udrepf = (udrepf && udrepf != Py_None) ? udrepf_trampoline : gfrepf_c;
+    functions->udbail = (udbail && udbail != Py_None) ? udbail_trampoline : gfbail_c;
+
+    return 1;
+}
+
+/**
+ * Set the step size of gfstep_c given to get_search_functions(), if any.
+ * It is global state in CSPICE, so it is only set right before the search,
+ * once all the arguments are checked.
+ */
+static int set_search_step(const gf_functions *functions)
+{
+    char failed = 0;
+
+    if(functions->set_step) {
+        gfsstp_c(functions->step);
+
+        PYSPICE_CHECK_FAILED;
+    }
+
+    return !failed;
+}
+
+/**
+ * Check for errors after calling a CSPICE routine that called back into
+ * Python.  An exception raised by a callback takes precedence over the
+ * SPICE error it triggered.
+ */
+static int check_callback_call(void)
+{
+    char failed = 0;
+
+    if(PyErr_Occurred()) {
+        reset_c();
+        return 0;
+    }
+
+    PYSPICE_CHECK_FAILED;
+
+    return !failed;
+}
+
+/**
+ * Set the callables used by a search, saving the ones of an enclosing call
+ */
+#define PYSPICE_PUSH_CALLBACKS(saved)                                   \
+    gf_callbacks saved = callbacks;                                     \
+    callbacks.udstep = udstep;                                          \
+    callbacks.udrefn = udrefn;                                          \
+    callbacks.udrepi = udrepi;                                          \
+    callbacks.udrepu = udrepu;                                          \
+    callbacks.udrepf = udrepf;                                          \
+    callbacks.udbail = udbail;
+
+PyObject * spice_uddc(PyObject *self, PyObject *args)
+{
+    PyObject *udfunc = NULL;
+    double x = 0.0, dx = 0.0;
+    SpiceBoolean isdecr = SPICEFALSE;
+    gf_callbacks saved = callbacks;
+
+    PYSPICE_CHECK_RETURN_STATUS(PyArg_ParseTuple(args, "Odd:uddc", &udfunc, &x, &dx));
+    PYSPICE_CHECK_RETURN_STATUS(check_callable(udfunc, "udfunc", 0));
+
+    callbacks.udfuns = udfunc;
+    uddc_c(udfuns_trampoline, x, dx, &isdecr);
+    callbacks = saved;
+
+    PYSPICE_CHECK_RETURN_STATUS(check_callback_call());
+
+    return PyBool_FromLong(isdecr);
+}
+
+PyObject * spice_uddf(PyObject *self, PyObject *args)
+{
+    PyObject *udfunc = NULL;
+    double x = 0.0, dx = 0.0, deriv = 0.0;
+    gf_callbacks saved = callbacks;
+
+    PYSPICE_CHECK_RETURN_STATUS(PyArg_ParseTuple(args, "Odd:uddf", &udfunc, &x, &dx));
+    PYSPICE_CHECK_RETURN_STATUS(check_callable(udfunc, "udfunc", 0));
+
+    callbacks.udfuns = udfunc;
+    uddf_c(udfuns_trampoline, x, dx, &deriv);
+    callbacks = saved;
+
+    PYSPICE_CHECK_RETURN_STATUS(check_callback_call());
+
+    return PyFloat_FromDouble(deriv);
+}
+
+PyObject * spice_gfuds(PyObject *self, PyObject *args, PyObject *kwds)
+{
+    static char *kwlist[] = {"udfuns", "udqdec", "relate", "refval", "adjust",
+                             "step", "nintvls", "cnfine", "result", "dx", NULL};
+    PyObject *udfuns = NULL, *udqdec = NULL, *py_cnfine = NULL, *py_result = NULL;
+    char *relate = NULL;
+    double refval = 0.0, adjust = 0.0, step = 0.0, dx = 10.0;
+    long nintvls = 0;
+    SpiceCell *cnfine = NULL, *result = NULL;
+    gf_callbacks saved = callbacks;
+
+    PYSPICE_CHECK_RETURN_STATUS(PyArg_ParseTupleAndKeywords(
+        args, kwds, "OOsdddlOO|d:gfuds", kwlist, &udfuns, &udqdec, &relate,
+        &refval, &adjust, &step, &nintvls, &py_cnfine, &py_result, &dx));
+    PYSPICE_CHECK_RETURN_STATUS(check_callable(udfuns, "udfuns", 0));
+    PYSPICE_CHECK_RETURN_STATUS(check_callable(udqdec, "udqdec", 1));
+    PYSPICE_CHECK_RETURN_STATUS(cnfine = get_spice_cell(py_cnfine));
+    PYSPICE_CHECK_RETURN_STATUS(result = get_spice_cell(py_result));
+
+    callbacks.udfuns = udfuns;
+    callbacks.udqdec = udqdec;
+    callbacks.dx = dx;
+
+    gfuds_c(udfuns_trampoline,
+            (udqdec == Py_None) ? default_udqdec : udqdec_trampoline,
+            relate, refval, adjust, step, nintvls, cnfine, result);
+
+    callbacks = saved;
+
+    PYSPICE_CHECK_RETURN_STATUS(check_callback_call());
+
+    Py_RETURN_NONE;
+}
+
+PyObject * spice_gfevnt(PyObject *self, PyObject *args, PyObject *kwds)
+{
+    static char *kwlist[] = {"gquant", "qpnams", "qcpars", "qdpars", "qipars",
+                             "qlpars", "op", "refval", "tol", "adjust", "rpt",
+                             "nintvls", "bail", "cnfine", "result", "udstep",
+                             "udrefn", "udrepi", "udrepu", "udrepf", "udbail",
+                             NULL};
+    PyObject *py_qpnams = NULL, *py_qcpars = NULL, *py_qdpars = NULL,
+        *py_qipars = NULL, *py_qlpars = NULL, *py_cnfine = NULL,
+        *py_result = NULL, *udstep = NULL, *udrefn = NULL, *udrepi = NULL,
+        *udrepu = NULL, *udrepf = NULL, *udbail = NULL;
+    PyObject *sequences[5] = {NULL, NULL, NULL, NULL, NULL};
+    char *gquant = NULL, *op = NULL;
+    char qpnams[SPICE_GFEVNT_MAXPAR][GFEVNT_LENVALS];
+    char qcpars[SPICE_GFEVNT_MAXPAR][GFEVNT_LENVALS];
+    double refval = 0.0, tol = 0.0, adjust = 0.0;
+    SpiceDouble qdpars[SPICE_GFEVNT_MAXPAR];
+    SpiceInt qipars[SPICE_GFEVNT_MAXPAR];
+    SpiceBoolean qlpars[SPICE_GFEVNT_MAXPAR];
+    int rpt = 0, bail = 0, i = 0, j = 0, status = 0;
+    long nintvls = 0;
+    Py_ssize_t qnpars = 0;
+    SpiceCell *cnfine = NULL, *result = NULL;
+    gf_functions functions;
+
+    PYSPICE_CHECK_RETURN_STATUS(PyArg_ParseTupleAndKeywords(
+        args, kwds, "sOOOOOsdddiliOO|OOOOOO:gfevnt", kwlist, &gquant,
+        &py_qpnams, &py_qcpars, &py_qdpars, &py_qipars, &py_qlpars, &op,
+        &refval, &tol, &adjust, &rpt, &nintvls, &bail, &py_cnfine, &py_result,
+        &udstep, &udrefn, &udrepi, &udrepu, &udrepf, &udbail));
+    PYSPICE_CHECK_RETURN_STATUS(cnfine = get_spice_cell(py_cnfine));
+    PYSPICE_CHECK_RETURN_STATUS(result = get_spice_cell(py_result));
+    PYSPICE_CHECK_RETURN_STATUS(get_search_functions(
+        udstep, udrefn, udrepi, udrepu, udrepf, udbail, &functions));
+
+    /* the quantity parameters are parallel sequences of qnpars items */
+    sequences[0] = PySequence_Fast(py_qpnams, "qpnams must be a sequence");
+    sequences[1] = PySequence_Fast(py_qcpars, "qcpars must be a sequence");
+    sequences[2] = PySequence_Fast(py_qdpars, "qdpars must be a sequence");
+    sequences[3] = PySequence_Fast(py_qipars, "qipars must be a sequence");
+    sequences[4] = PySequence_Fast(py_qlpars, "qlpars must be a sequence");
+
+    for(i = 0; i < 5; ++ i) {
+        if(!sequences[i]) {
+            goto done;
+        }
+    }
+
+    qnpars = PySequence_Fast_GET_SIZE(sequences[0]);
+
+    if(qnpars > SPICE_GFEVNT_MAXPAR) {
+        PyErr_Format(PyExc_ValueError, "at most %d quantity parameters are supported",
+                     SPICE_GFEVNT_MAXPAR);
+        goto done;
+    }
+
+    for(i = 1; i < 5; ++ i) {
+        if(PySequence_Fast_GET_SIZE(sequences[i]) != qnpars) {
+            PyErr_SetString(PyExc_ValueError,
+                            "the quantity parameter sequences must have the same length");
+            goto done;
+        }
+    }
+
+    for(j = 0; j < qnpars; ++ j) {
+        char *strings[2] = {NULL, NULL};
+        double d = 0.0;
+        long l = 0;
+        int truth = 0;
+
+        for(i = 0; i < 2; ++ i) {
+            if(!get_spice_string(PySequence_Fast_GET_ITEM(sequences[i], j), &strings[i])) {
+                goto done;
+            }
+
+            if(strlen(strings[i]) >= GFEVNT_LENVALS) {
+                PyErr_Format(PyExc_ValueError,
+                             "quantity parameters are limited to %d characters",
+                             GFEVNT_LENVALS - 1);
+                goto done;
+            }
+        }
+
+        strcpy(qpnams[j], strings[0]);
+        strcpy(qcpars[j], strings[1]);
+
+        if(!get_spice_double(PySequence_Fast_GET_ITEM(sequences[2], j), &d) ||
+           !get_spice_long(PySequence_Fast_GET_ITEM(sequences[3], j), &l)) {
+            goto done;
+        }
+
+        truth = PyObject_IsTrue(PySequence_Fast_GET_ITEM(sequences[4], j));
+
+        if(truth < 0) {
+            goto done;
+        }
+
+        qdpars[j] = d;
+        qipars[j] = l;
+        qlpars[j] = truth ? SPICETRUE : SPICEFALSE;
+    }
+
+    if(!set_search_step(&functions)) {
+        goto done;
+    }
+
+    {
+        PYSPICE_PUSH_CALLBACKS(saved)
+
+        gfevnt_c(functions.udstep, functions.udrefn, gquant, qnpars,
+                 GFEVNT_LENVALS, qpnams, qcpars, qdpars, qipars, qlpars, op,
+                 refval, tol, adjust, rpt, functions.udrepi, functions.udrepu,
+                 functions.udrepf, nintvls, bail, functions.udbail, cnfine,
+                 result);
+
+        callbacks = saved;
+    }
+
+    status = check_callback_call();
+
+done:
+    for(i = 0; i < 5; ++ i) {
+        Py_XDECREF(sequences[i]);
+    }
+
+    PYSPICE_CHECK_RETURN_STATUS(status);
+
+    Py_RETURN_NONE;
+}
+
+PyObject * spice_gffove(PyObject *self, PyObject *args, PyObject *kwds)
+{
+    static char *kwlist[] = {"inst", "tshape", "raydir", "target", "tframe",
+                             "abcorr", "obsrvr", "tol", "rpt", "bail",
+                             "cnfine", "result", "udstep", "udrefn", "udrepi",
+                             "udrepu", "udrepf", "udbail", NULL};
+    static const Py_ssize_t raydir_shape[1] = {3};
+    PyObject *py_raydir = NULL, *py_cnfine = NULL, *py_result = NULL,
+        *udstep = NULL, *udrefn = NULL, *udrepi = NULL, *udrepu = NULL,
+        *udrepf = NULL, *udbail = NULL;
+    char *inst = NULL, *tshape = NULL, *target = NULL, *tframe = NULL,
+        *abcorr = NULL, *obsrvr = NULL;
+    SpiceDouble raydir[3];
+    double tol = 0.0;
+    int rpt = 0, bail = 0;
+    SpiceCell *cnfine = NULL, *result = NULL;
+    gf_functions functions;
+
+    PYSPICE_CHECK_RETURN_STATUS(PyArg_ParseTupleAndKeywords(
+        args, kwds, "ssOssssdiiOO|OOOOOO:gffove", kwlist, &inst, &tshape,
+        &py_raydir, &target, &tframe, &abcorr, &obsrvr, &tol, &rpt, &bail,
+        &py_cnfine, &py_result, &udstep, &udrefn, &udrepi, &udrepu, &udrepf,
+        &udbail));
+    PYSPICE_CHECK_RETURN_STATUS(get_spice_array(py_raydir, raydir, "d",
+                                                sizeof(SpiceDouble), 1, raydir_shape));
+    PYSPICE_CHECK_RETURN_STATUS(cnfine = get_spice_cell(py_cnfine));
+    PYSPICE_CHECK_RETURN_STATUS(result = get_spice_cell(py_result));
+    PYSPICE_CHECK_RETURN_STATUS(get_search_functions(
+        udstep, udrefn, udrepi, udrepu, udrepf, udbail, &functions));
+    PYSPICE_CHECK_RETURN_STATUS(set_search_step(&functions));
+
+    {
+        PYSPICE_PUSH_CALLBACKS(saved)
+
+        gffove_c(inst, tshape, raydir, target, tframe, abcorr, obsrvr, tol,
+                 functions.udstep, functions.udrefn, rpt, functions.udrepi,
+                 functions.udrepu, functions.udrepf, bail, functions.udbail,
+                 cnfine, result);
+
+        callbacks = saved;
+    }
+
+    PYSPICE_CHECK_RETURN_STATUS(check_callback_call());
+
+    Py_RETURN_NONE;
+}
+
+PyObject * spice_gfocce(PyObject *self, PyObject *args, PyObject *kwds)
+{
+    static char *kwlist[] = {"occtyp", "front", "fshape", "fframe", "back",
+                             "bshape", "bframe", "abcorr", "obsrvr", "tol",
+                             "rpt", "bail", "cnfine", "result", "udstep",
+                             "udrefn", "udrepi", "udrepu", "udrepf", "udbail",
+                             NULL};
+    PyObject *py_cnfine = NULL, *py_result = NULL, *udstep = NULL,
+        *udrefn = NULL, *udrepi = NULL, *udrepu = NULL, *udrepf = NULL,
+        *udbail = NULL;
+    char *occtyp = NULL, *front = NULL, *fshape = NULL, *fframe = NULL,
+        *back = NULL, *bshape = NULL, *bframe = NULL, *abcorr = NULL,
+        *obsrvr = NULL;
+    double tol = 0.0;
+    int rpt = 0, bail = 0;
+    SpiceCell *cnfine = NULL, *result = NULL;
+    gf_functions functions;
+
+    PYSPICE_CHECK_RETURN_STATUS(PyArg_ParseTupleAndKeywords(
+        args, kwds, "sssssssssdiiOO|OOOOOO:gfocce", kwlist, &occtyp, &front,
+        &fshape, &fframe, &back, &bshape, &bframe, &abcorr, &obsrvr, &tol,
+        &rpt, &bail, &py_cnfine, &py_result, &udstep, &udrefn, &udrepi,
+        &udrepu, &udrepf, &udbail));
+    PYSPICE_CHECK_RETURN_STATUS(cnfine = get_spice_cell(py_cnfine));
+    PYSPICE_CHECK_RETURN_STATUS(result = get_spice_cell(py_result));
+    PYSPICE_CHECK_RETURN_STATUS(get_search_functions(
+        udstep, udrefn, udrepi, udrepu, udrepf, udbail, &functions));
+    PYSPICE_CHECK_RETURN_STATUS(set_search_step(&functions));
+
+    {
+        PYSPICE_PUSH_CALLBACKS(saved)
+
+        gfocce_c(occtyp, front, fshape, fframe, back, bshape, bframe, abcorr,
+                 obsrvr, tol, functions.udstep, functions.udrefn, rpt,
+                 functions.udrepi, functions.udrepu, functions.udrepf, bail,
+                 functions.udbail, cnfine, result);
+
+        callbacks = saved;
+    }
+
+    PYSPICE_CHECK_RETURN_STATUS(check_callback_call());
+
+    Py_RETURN_NONE;
+}
@@ -5,7 +5,17 @@
 # Run this command by providing the location of the unpacked toolkit
 # directory:
 #
-# mkwrapper.py /path/to/cspice/toolkit
+# mkwrapper.py /path/to/cspice/toolkit [docs.zip [directory]]
+#
+# The C code is written to stdout, or to one file per family of functions
+# and the spicemodule.c registering them if a directory is given, see
+# write_sources().  The documentation of the functions is written to the
+# zip file if one is given, see write_docs().
+#
+# The generated code is cached in the directory named by the
+# MKWRAPPER_CACHE environment variable, if it is set, so running the script
+# again only regenerates the wrappers of the functions whose prototype or
+# source file changed, see WrapperCache.
 #
 # Author: Roberto Aguilar, roberto.c.aguilar@jpl.nasa.gov
 #
@@ -13,7 +23,7 @@
 #
 # $Id$
 
-import os, sys
+import cPickle, hashlib, os, re, sys, tempfile, textwrap, zipfile
 from cStringIO import StringIO
 
 # This is a parameter class that is used to hold all the information about a
@@ -37,7 +47,7 @@ function_types = ('ConstSpiceChar', 'SpiceBoolean', 'SpiceChar', 'SpiceDouble',
 RESERVED_NAMES = ('free',)
 
 # Reasons for excluding the following functions
-# appnd*, etc. - not looked into translating a SpiceCell to a python object yet.
+# zzsynccl_c - private routine for syncing cells
 # axisar_c - haven't written code to parse arrays
 # bodvar_c - deprecated
 # bschoc_c, etc. - how to support const void * array
@@ -48,19 +58,18 @@ RESERVED_NAMES = ('free',)
 # dasec_c - how to handle void types in parameter list
 # dafgh_c - does function actually exist?  I found no C file ...
 # ucase_c - not needed for python
-# gfevnt_c, gffove_c, gfocce_c, gfuds_c, uddc_c, uddf_c - how to support callbacks
 exclude_list = (
     'cnames',
 
-    'appndc_c', 'appndd_c', 'appndi_c', 'zzsynccl_c',
+    'zzsynccl_c',
 
     'bodvar_c',
 
     'bschoc_c', 'bsrchc_c', 'dafac_c', 'dafec_c', 'dasac_c', 'ekacec_c',
     'ekaclc_c', 'ekbseg_c', 'zzgetcml_c', 'ekifld_c', 'ekucec_c', 'esrchc_c',
-    'getelm_c', 'isrchc_c', 'kxtrct_c', 'lmpool_c', 'lstlec_c', 'lstltc_c',
-    'mequg_c', 'mtxmg_c', 'mtxvg_c', 'mxmg_c', 'mtmtg_c', 'mxmtg_c', 'mxvg_c',
-    'orderc_c', 'pcpool_c', 'swpool_c', 'vtmvg_c', 'xposeg_c',
+    'getelm_c', 'isrchc_c', 'kxtrct_c', 'lstlec_c', 'lstltc_c', 'mequg_c',
+    'mtxmg_c', 'mtxvg_c', 'mxmg_c', 'mtmtg_c', 'mxmtg_c', 'mxvg_c',
+    'orderc_c', 'swpool_c', 'vtmvg_c', 'xposeg_c',
 
     'ckw05_c',
 
@@ -69,22 +78,154 @@ exclude_list = (
     'spkw18_c',
 
     'dafgs_c', 'dafps_c', 'dafus_c', 'getfov_c',
-    'ckw01_c', 'ckw02_c', 'ckw03_c', 'spk14a_c', 'spkw02_c', 'spkw03_c',
-    'spkw05_c', 'spkw08_c', 'spkw09_c', 'spkw10_c', 'spkw12_c', 'spkw13_c',
+    'spk14a_c',
 
-    'dasec_c', 'ekpsel_c', 'ekrcec_c', 'gcpool_c', 'gnpool_c',
+    'dasec_c', 'ekpsel_c', 'ekrcec_c',
 
     'dafgh_c', 'prefix_c',
 
     'lcase_c', 'ucase_c', 'getcml_c', 'lparse_c', 'lparsm_c', 'prompt_c',
     'putcml_c', 'reordc_c', 'shellc_c', 'sumad_c', 'sumai_c',
 
-    'gfevnt_c', 'gffove_c', 'gfocce_c', 'gfuds_c', 'uddc_c', 'uddf_c',
 )
 
-module_defs = []
+# scalar double inputs with these names get an array-aware variant in the
+# _spice._vec.<family> module of their family that loops over an array of
+# values in C; see gen_vector_wrapper()
+vectorize_names = ('et', 'sclkdp')
+
+# functions taking arrays of records whose number is given by another
+# parameter.  Each entry maps the count parameter to the array parameters
+# holding that many records and the C expression for the number of doubles
+# in a record, which may use the other inputs.  The arrays are taken from
+# any float64 buffer without copying, or from (nested) sequences, and the
+# count is derived from their size instead of being passed from Python.
+record_inputs = {
+    'ckw01_c': {'nrec': (('sclkdp', '1'), ('quats', '4'), ('avvs', '3'))},
+    'ckw02_c': {'nrec': (('start', '1'), ('stop', '1'), ('quats', '4'),
+                         ('avvs', '3'), ('rates', '1'))},
+    'ckw03_c': {'nrec': (('sclkdp', '1'), ('quats', '4'), ('avvs', '3')),
+                'nints': (('starts', '1'),)},
+    'spkw02_c': {'n': (('cdata', '3 * (polydg + 1)'),)},
+    'spkw03_c': {'n': (('cdata', '6 * (polydg + 1)'),)},
+    'spkw05_c': {'n': (('states', '6'), ('epochs', '1'))},
+    'spkw08_c': {'n': (('states', '6'),)},
+    'spkw09_c': {'n': (('states', '6'), ('epochs', '1'))},
+    'spkw10_c': {'n': (('elems', '10'), ('epochs', '1'))},
+    'spkw12_c': {'n': (('states', '6'),)},
+    'spkw13_c': {'n': (('states', '6'), ('epochs', '1'))},
+    'pdpool_c': {'n': (('dvals', '1'),)},
+    'pckw02_c': {'n': (('cdata', '3 * (polydg + 1)'),)},
+}
+
+# functions taking an array of strings, mapped to the array parameter and the
+# parameters for the number of strings and the length of each string.  The
+# strings are taken from a Python sequence and copied into an array of
+# fixed length strings by get_spice_strings(), which sets both parameters.
+string_array_inputs = {
+    'pcpool_c': ('cvals', 'n', 'lenvals'),
+    'lmpool_c': ('cvals', 'n', 'lenvals'),
+}
+
+# functions taking callbacks are wrapped by hand in gfcallbacks.c; only their
+# documentation and method table entries are generated.  The Python call
+# signature is put at the top of the documentation.
+callback_wrappers = {
+    'gfevnt_c': ('gfevnt(gquant, qpnams, qcpars, qdpars, qipars, qlpars, op, '
+                 'refval, tol, adjust, rpt, nintvls, bail, cnfine, result, '
+                 'udstep=None, udrefn=None, udrepi=None, udrepu=None, '
+                 'udrepf=None, udbail=None)'),
+    'gffove_c': ('gffove(inst, tshape, raydir, target, tframe, abcorr, obsrvr, '
+                 'tol, rpt, bail, cnfine, result, udstep=None, udrefn=None, '
+                 'udrepi=None, udrepu=None, udrepf=None, udbail=None)'),
+    'gfocce_c': ('gfocce(occtyp, front, fshape, fframe, back, bshape, bframe, '
+                 'abcorr, obsrvr, tol, rpt, bail, cnfine, result, udstep=None, '
+                 'udrefn=None, udrepi=None, udrepu=None, udrepf=None, '
+                 'udbail=None)'),
+    'gfuds_c': ('gfuds(udfuns, udqdec, relate, refval, adjust, step, nintvls, '
+                'cnfine, result, dx=10.0)'),
+    'uddc_c': 'uddc(udfunc, x, dx) -> isdecr',
+    'uddf_c': 'uddf(udfunc, x, dx) -> deriv',
+}
+
+# notes on calling the callback wrappers from Python, added after the
+# signature in their documentation
+callback_notes = (
+    'The callbacks are Python callables.  udfuns(et) and udfunc(x) return a '
+    'float and udqdec(et) returns whether udfuns is decreasing at et; when '
+    'udqdec is None it is computed with uddc using the step dx.  The step, '
+    'refinement, reporting and interrupt callbacks of gfevnt, gffove and '
+    'gfocce default to gfstep, gfrefn, gfrep* and gfbail; udstep can also be '
+    'a constant step size in seconds.  An exception raised by a callback '
+    'stops the search and is raised by the wrapper.'
+)
+
+# functions that set the size of a cell, mapped to the (cell, size)
+# parameters checked against the memory of the Cell object
+cell_size_params = {
+    'ssize_c': ('cell', 'size'),
+    'valid_c': ('a', 'size'),
+    'wnvald_c': ('window', 'size'),
+}
+
+# inline functions in pyspice.h converting an argument for each
+# PyArg_ParseTuple format character, see write_arg_parsing()
+arg_converters = {
+    'd': 'get_spice_double',
+    'i': 'get_spice_int',
+    'l': 'get_spice_long',
+    's': 'get_spice_string',
+}
+
+# functions whose array output has a size computed from the inputs, mapped to
+# the output and the C expression for its number of elements.  The memory is
+# allocated before the call and the output is returned like the bodv* values.
+variable_outputs = {
+    'dafgda_c': ('data', 'eaddr - baddr + 1'),
+    'dafgsr_c': ('data', 'end - begin + 1'),
+    'gdpool_c': ('values', 'room'),
+    'gcpool_c': ('cvals', 'room'),
+    'gnpool_c': ('kvars', 'room'),
+}
+
+# output types that can be stored in a SpiceArray by the vectorized wrappers
+vector_output_types = ('SpiceDouble', 'SpiceInt', 'SpiceBoolean')
+
+# the wrappers are split into family modules of _spice, which are only
+# created when _spice._load_family() (or _load_vec_family() for the
+# array-aware variants) is first called for them, see spice/lazy.py.  A
+# function goes to the first family with a prefix of its name, or to the
+# misc family.
+families = (
+    ('pool', ('bodv', 'clpool', 'cvpool', 'dtpool', 'dvpool', 'expool',
+              'furnsh', 'gcpool', 'gdpool', 'gipool', 'gnpool', 'kclear',
+              'kdata', 'kinfo', 'ktotal', 'ldpool', 'lmpool', 'pcpool',
+              'pdpool', 'pipool', 'swpool', 'szpool', 'unload')),
+    ('time', ('b1900', 'b1950', 'deltet', 'et2', 'etcal', 'j1900', 'j1950',
+              'j2000', 'j2100', 'jyear', 'scdecd', 'sce2', 'scencd', 'scfmt',
+              'scpart', 'scs2e', 'sct2e', 'sctiks', 'spd', 'str2et',
+              'timdef', 'timout', 'tparse', 'tpictr', 'tsetyr', 'tyear',
+              'unitim', 'utc2et')),
+    ('spk', ('spk',)),
+    ('ck', ('ck',)),
+    ('frames', ('ccifrm', 'cidfrm', 'cnmfrm', 'frinfo', 'frmnam', 'namfrm',
+                'pxf', 'sxform', 'tipbod', 'tisbod')),
+    ('gf', ('gf', 'uddc', 'uddf')),
+    ('ek', ('ek',)),
+    ('dsk', ('dla', 'dsk')),
+)
+
+module_defs = dict([(family, []) for family, prefixes in families] +
+                   [('misc', [])])
+vector_module_defs = dict([(family, []) for family in module_defs])
+
+# the full documentation of the wrapped functions, see write_docs()
+docs = {}
 cspice_src = None
 
+# the directory of the cached wrappers, see WrapperCache
+cache_dir = os.environ.get('MKWRAPPER_CACHE')
+
 DEBUG = 0 # set it on when string is the right one
 
 INPUT_TYPE = 0
@@ -145,6 +286,11 @@ def determine_py_type(param_obj):
         sys.stderr.write('Warning: Unknown type: %s\n' % type)
 
 def get_doc(function_name):
+    """
+    Return the documentation sections of a CSPICE function read from its
+    source file, or an empty string if there is no source file.
+    """
+
     doc = StringIO()
 
     # the sections of documentation we want
@@ -159,44 +305,84 @@ def get_doc(function_name):
 
     if os.path.exists(src_file):
         f = open(src_file, 'r')
+        lines = [x.rstrip() for x in f.read().split('\n')]
+        f.close()
 
-        # loop for going through the entire source file
-        while 1:
-            input = f.readline()
-            input_len = len(input)
-
-            if not input: break
-
-            input = input.rstrip()
+        i = 0
+        while i < len(lines):
+            input = lines[i]
+            i += 1
 
             # skip blank lines
             if input == "": continue
 
-            #print "input: %s" % input
+            if input.split()[0] in sections:
+                doc.write('%s\n' % input)
 
-            split = input.split()
+                # the section ends where the next one starts
+                while i < len(lines) and not lines[i].startswith('-'):
+                    doc.write('%s\n' % lines[i])
+                    i += 1
 
-            if split[0] in sections:
-                while 1:
-                    if not input:
-                        doc.write('\\n')
-                    else:
-                        doc.write('%s\\n' % input.replace('\\', '\\\\').replace('"', '\\"'))
+    return doc.getvalue()
 
-                    input = f.readline()
-                    input_len = len(input)
-                    input = input.rstrip()
+def get_doc_summary(doc):
+    """
+    Return the first paragraph of the Abstract section of the documentation
+    returned by get_doc().
+    """
 
-                    if not input:
-                        continue
-                    elif input[0] == '-':
-                        f.seek(f.tell()-input_len)
-                        break
+    lines = doc.split('\n')
 
-        # t = f.readlines()
-        f.close()
+    if '-Abstract' not in lines:
+        return ''
+
+    paragraph = []
+    for line in lines[lines.index('-Abstract') + 1:]:
+        if line.strip():
+            paragraph.append(line.strip())
+        elif paragraph:
+            break
+
+    return ' '.join(paragraph)
+
+def get_c_string(text):
+    """
+    Return text as a C string literal.
+    """
+
+    return '"%s"' % text.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def add_doc(function_name, python_function_name, header=''):
+    """
+    Keep the documentation of a function for write_docs() and return the C
+    string literal of its short docstring: the header, the summary of the
+    documentation and a pointer to spice.doc().
+    """
+
+    doc = get_doc(function_name)
+    docs[python_function_name] = header + doc
+
+    text = header + textwrap.fill(get_doc_summary(doc), 72)
+    if doc:
+        text += "\n\nspice.doc('%s') returns the full documentation." % \
+            python_function_name
+
+    return get_c_string(text.strip())
+
+def write_docs(path):
+    """
+    Write the documentation of the wrapped functions to the zip archive at
+    path, where spice.doc() reads it on demand.  Keeping it out of the
+    extension module keeps the module small and its import fast.
+    """
 
-    return '"%s"' % doc.getvalue()
+    archive = zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED)
+
+    for name, doc in sorted(docs.items()):
+        archive.writestr(name, doc)
+
+    archive.close()
 
 def gen_wrapper(prototype, buffer):
     prototype = remove_extra_spaces(prototype)
@@ -221,10 +407,13 @@ def gen_wrapper(prototype, buffer):
     # check the exclude list before continuing
     if prototype_obj.function_name in exclude_list: return False
 
+    if prototype_obj.function_name in callback_wrappers:
+        gen_callback_wrapper(prototype_obj, buffer)
+        return True
+
     # the string that is passed to PyArg_ParseTuple for getting the
-    # arguments list and Py_BuildValue for returning results
+    # arguments list
     parse_tuple_string = ""
-    buildvalue_string = ""
 
     # remove the _c suffix for the python function name
     python_function_name = prototype_obj.function_name.rsplit('_c',1)[0]
@@ -261,7 +450,10 @@ def gen_wrapper(prototype, buffer):
             continue
         #debug("parsed param: %s" % param_info)
 
-        if param_info.is_array and not param_info.is_const:
+        # cells are created by the caller and updated in place
+        if param_info.type == 'SpiceCell':
+            t_type = INPUT_TYPE
+        elif param_info.is_array and not param_info.is_const:
             t_type = OUTPUT_TYPE
         elif param_info.is_const or not param_info.is_pointer:
             t_type = INPUT_TYPE
@@ -313,6 +505,22 @@ def gen_wrapper(prototype, buffer):
         manually_build_returnVal = True
         pass
 
+    if prototype_obj.function_name in variable_outputs:
+        name, size = variable_outputs[prototype_obj.function_name]
+
+        for output in output_list:
+            if output.name == name:
+                output.make_pointer = True
+                output.allocate_memory = '(%s)' % size
+
+                # arrays of strings are passed as void pointers, each string
+                # gets STRING_LEN characters
+                if output.type == 'void':
+                    output.type = 'SpiceChar'
+                    output.allocate_memory += ' * STRING_LEN'
+
+        manually_build_returnVal = True
+
     for output in output_list:
         #print output
 
@@ -324,6 +532,10 @@ def gen_wrapper(prototype, buffer):
 
         buffer.write(" %s" % output.name)
 
+        # freed on every failure, see cleanup below
+        if output.allocate_memory:
+            buffer.write(" = NULL")
+
         # this item may be an array pointer, so only add the brackets
         # if no memory allocation was done for this variable
         if output.is_array and not output.allocate_memory:
@@ -335,10 +547,18 @@ def gen_wrapper(prototype, buffer):
 
         if output.type == 'SpiceChar' and not output.is_array:
             string_output_num += 1
-            buffer.write("[STRING_LEN]")
+
+            if not output.allocate_memory:
+                buffer.write("[STRING_LEN]")
 
         buffer.write(";")
 
+        # the shape of fixed size arrays is handed to get_py_array()
+        if output.is_array and not output.allocate_memory:
+            buffer.write("\n  static const Py_ssize_t %s_shape[%d] = {%s};" % \
+                (output.name, len(output.num_elements),
+                 ', '.join([str(x) for x in output.num_elements])))
+
         output_name_list.append(output.name)
 
     # parse the inputs
@@ -350,54 +570,52 @@ def gen_wrapper(prototype, buffer):
     # arguments passed in from Python when using SPICE variable types.
     py_to_c_conversions = [];
 
+    # record arrays and the counts derived from them, see record_inputs
+    records = record_inputs.get(prototype_obj.function_name, {})
+    string_array = string_array_inputs.get(prototype_obj.function_name)
+    record_arrays = {}
+    for count_name, arrays in records.items():
+        for index, (name, row_size) in enumerate(arrays):
+            record_arrays[name] = index
+
     for input in input_list:
         input_name = input.name
 
+        if input_name in records:
+            buffer.write("\n  long %s = 0;" % input_name)
+        elif string_array and input_name in string_array[1:]:
+            buffer.write("\n  long %s = 0;" % input_name)
+        elif string_array and input_name == string_array[0]:
+            buffer.write("\n  char * %s = NULL;" % input_name)
+            buffer.write("\n  PyObject * py_%s = NULL;" % input_name)
+
+            parse_tuple_string += 'O'
+            input_name_list.append('py_%s' % input_name)
+        elif input_name in record_arrays:
+            buffer.write("\n  %s = NULL;" % get_record_type(input, ' ' + input_name))
+            buffer.write("\n  PyObject * py_%s = NULL;" % input_name)
+            buffer.write("\n  PySpiceDoubles %s_values;" % input_name)
+
+            if record_arrays[input_name]:
+                buffer.write("\n  long %s_rows = 0;" % input_name)
+
+            parse_tuple_string += 'O'
+            input_name_list.append('py_%s' % input_name)
+
         # if a character string output was detected and this variable has the
         # string 'len' in it, skip adding it to the ParseTuple string.
-        if 'len' in input_name and string_output_num > 0:
+        elif 'len' in input_name and string_output_num > 0:
             buffer.write("\n  %s %s = STRING_LEN;" % \
                          (input.reg_type, input_name)
             )
         else:
-            parse_tuple_string += input.py_string
-
-            if input.is_pointer:
-                pointer_string = " * "
-            else:
-                pointer_string = " "
-
-            buffer.write("\n  %s%s%s" % (
-                input.reg_type, pointer_string, input_name))
-
-            if input.is_array:
-                for count in input.num_elements:
-                    buffer.write("[%s]" % count)
-
-            buffer.write(";")
-
-            # if this input has a get_spice_fn function associated with it,
-            # declare a variable for the conversion
-            if input.get_spice_fn:
-                input_name = "py_%s" % input_name
-                buffer.write("\n  PyObject * %s = NULL;" % input_name)
-                py_to_c_conversions.append("%s = %s(%s);" % (input.name, input.get_spice_fn, input_name))
-
-            # if this is an array, put in the right amount of elements
-            # into the ParseTuple parameter list (one per element).
-            # Also, the list coming in can be 1D, 2D, or 3D.
-            if input.is_array:
-                input_name_list += get_array_sizes(
-                    input.num_elements, input_name)
-            else:
-                input_name_list.append(input_name)
+            py_string, names = declare_input(input, buffer, py_to_c_conversions)
+            parse_tuple_string += py_string
+            input_name_list += names
 
     # other variables needed below
     buffer.write('\n\n  char failed = 0;')
 
-    if not manually_build_returnVal and output_list:
-        buffer.write('\n  char buildvalue_string[STRING_LEN] = "";')
-
     # configure the input string list for parsing the args tuple
     input_list_string = "&" + ", &".join(input_name_list)
 
@@ -415,23 +633,52 @@ def gen_wrapper(prototype, buffer):
 
     buffer.write("\n")
 
-    # generate the PyArg_ParseTuple call if there were any inputs to
-    # this function
+    # unpack the arguments if there were any inputs to this function
     if input_name_list:
-        buffer.write(
-            ('\n  PYSPICE_CHECK_RETURN_STATUS(' +
-             'PyArg_ParseTuple(args, "%s", %s));') % \
-            (parse_tuple_string, input_list_string))
+        method_flags = write_arg_parsing(
+            buffer, python_function_name, parse_tuple_string, input_name_list)
+    else:
+        method_flags = 'METH_NOARGS'
+
+    # functions setting the size of a cell must stay within its memory
+    if prototype_obj.function_name in cell_size_params:
+        py_to_c_conversions.append(
+            'PYSPICE_CHECK_RETURN_STATUS(check_spice_cell_size(%s, %s));' % \
+            cell_size_params[prototype_obj.function_name])
 
     # if there are any Python -> C conversions that need to occur, add them here.
     if py_to_c_conversions:
-        buffer.write('\n  %s\n' % '\n'.join(py_to_c_conversions))
+        buffer.write('\n  %s\n' % '\n  '.join(py_to_c_conversions))
 
-    for output in output_list:
-        # see if memory needs to be allocated for this variable
-        if output.allocate_memory:
-            buffer.write("\n\n  %s = malloc(sizeof(%s) * %s);" % \
-                (output.name, output.type, output.allocate_memory))
+    # the record arrays come last since they have to be released again
+    record_names = write_record_conversions(buffer, input_list, records)
+
+    # from here on, failures go through the cleanup label below, which
+    # releases the record arrays, strings and outputs taken so far
+    allocated = [x for x in output_list if x.allocate_memory]
+    cleanup = bool(string_array or allocated)
+
+    if cleanup:
+        fail = "\n    failed = 1;\n    goto cleanup;\n  }"
+    else:
+        fail = "\n    return NULL;\n  }"
+
+    if string_array:
+        buffer.write(
+            "\n  if(!get_spice_strings(py_%s, &%s, &%s, &%s)) {" % \
+            ((string_array[0],) + string_array) + fail + "\n")
+
+    for output in allocated:
+        if prototype_obj.function_name in variable_outputs:
+            buffer.write(
+                ("\n\n  if(%s < 1) {" +
+                 "\n    PyErr_SetString(PyExc_ValueError, " +
+                 "\"%s: the output would be empty\");") % \
+                (output.allocate_memory, python_function_name) + fail)
+
+        buffer.write("\n\n  %s = malloc(sizeof(%s) * %s);" % \
+            (output.name, output.type, output.allocate_memory))
+        buffer.write("\n  if(!%s) {\n    PyErr_NoMemory();" % output.name + fail)
 
     # build the input name list for calling the C function
     input_name_list = []
@@ -471,44 +718,33 @@ def gen_wrapper(prototype, buffer):
 
     # debug(param_list_string)
 
-    # Call the C function
+    # Call the C function, timed when the extension keeps call statistics
     if prototype_obj.type != "void":
-        buffer.write("\n  result = %s(%s);" % (prototype_obj.function_name, param_list_string))
+        buffer.write("\n  PYSPICE_TIME_CSPICE(result = %s(%s));" % (prototype_obj.function_name, param_list_string))
     else:
-        buffer.write("\n  %s(%s);" % (prototype_obj.function_name, param_list_string))
+        buffer.write("\n  PYSPICE_TIME_CSPICE(%s(%s));" % (prototype_obj.function_name, param_list_string))
 
     # run the macro to check to see if an exception was raised.  once the
     # check is made, see if the failed boolean was set.  this is an indication
     # that the function should free any allocated memory and return NULL.
     buffer.write("\n\n  PYSPICE_CHECK_FAILED;\n")
 
-    buffer.write('\n  if(failed) {')
+    if cleanup:
+        buffer.write("\ncleanup:")
 
-    for output in output_list:
-        if output.allocate_memory:
-            buffer.write('\n    free(%s);' % output.name)
+    for name in record_names:
+        buffer.write("\n  release_spice_doubles(&%s_values);" % name)
 
-    buffer.write('\n    return NULL;')
-    buffer.write('\n  }\n')
+    if string_array:
+        buffer.write("\n  free(%s);" % string_array[0])
 
-    # loop through the output to build the value strings for each output if
-    # the return value is not being built up manually
-    if not manually_build_returnVal:
-        if output_list:
-            buffer.write('\n  /* put together the output buildvalue string */')
+    buffer.write('\n  if(failed) {')
 
-        for output in output_list:
-            if output.allocate_memory:
-                buffer.write(
-                    ('\n  make_buildvalue_tuple(buildvalue_string, ' +
-                    '"%s", %s);') % (output.py_string, output.name)
-                )
-            elif output.name != 'found':
-                buffer.write(
-                    '\n  strcat(buildvalue_string, "%s");' % output.py_string
-                )
+    for output in allocated:
+        buffer.write('\n    free(%s);' % output.name)
 
-        buffer.write('\n')
+    buffer.write('\n    return NULL;')
+    buffer.write('\n  }\n')
 
     # If the called function is a void, return PyNone, or else figure out what
     # to return.
@@ -522,31 +758,510 @@ def gen_wrapper(prototype, buffer):
             #debug('in automatic returnVal build')
             make_automatic_returnVal(buffer, output_list)
     elif prototype_obj.type == "void":
-        buffer.write("\n  Py_INCREF(Py_None);")
-        buffer.write("\n  return Py_None;")
+        buffer.write("\n  Py_RETURN_NONE;")
     elif prototype_obj.type == "SpiceBoolean":
         buffer.write("\n  if(result) { Py_RETURN_TRUE; } else { Py_RETURN_FALSE; }")
     elif prototype_obj.type in ("ConstSpiceChar", "SpiceDouble", "SpiceInt"):
-        buffer.write('\n  return Py_BuildValue("%s", result);' % prototype_obj.py_string)
+        write_return_value(buffer, [prototype_obj.py_string], ['result'])
     else:
         pass # for now; TODO: figure out what to do
 
     buffer.write("\n}");
 
-    # dig out the function name from the source file
-    doc = get_doc(prototype_obj.function_name)
+    # the function counting the calls, see pyspice.h
+    buffer.write('\nPYSPICE_STATS_WRAPPER(%s, "%s")' % \
+                 (python_function_name, python_function_name))
 
-    if not doc:
-        buffer.write('\nPyDoc_STRVAR(%s_doc, "");\n' % python_function_name)
-    else:
-        buffer.write('\nPyDoc_STRVAR(%s_doc, %s);\n' % (python_function_name, doc))
+    # only a summary of the documentation is compiled in, see write_docs()
+    doc = add_doc(prototype_obj.function_name, python_function_name)
+    buffer.write('\nPyDoc_STRVAR(%s_doc, %s);\n' % (python_function_name, doc))
 
     # add this functions definition to the module_defs list
-    module_defs.append('{"%s", spice_%s, METH_VARARGS, %s_doc},' % \
-                       (python_function_name, python_function_name, python_function_name))
+    module_defs[get_family(python_function_name)].append(
+        '{"%s", PYSPICE_METHOD(%s), %s, %s_doc},' % \
+        (python_function_name, python_function_name, method_flags,
+         python_function_name))
+
+    # functions taking an epoch also get an array-aware variant
+    vector_input = get_vector_input(prototype_obj, input_list, output_list)
+    if vector_input is not None:
+        gen_vector_wrapper(prototype_obj, python_function_name, input_list,
+                           output_list, vector_input, buffer)
 
     return buffer.getvalue()
 
+def gen_callback_wrapper(prototype_obj, buffer):
+    """
+    Generate the documentation and method table entry for a function
+    wrapped by hand in gfcallbacks.c.
+    """
+
+    python_function_name = prototype_obj.function_name.rsplit('_c',1)[0]
+    signature = callback_wrappers[prototype_obj.function_name]
+
+    if '=' in signature:
+        method_flags = 'METH_VARARGS | METH_KEYWORDS'
+    else:
+        method_flags = 'METH_VARARGS'
+
+    doc = add_doc(prototype_obj.function_name, python_function_name,
+                  '%s\n\n%s\n\n' % (signature, textwrap.fill(callback_notes, 72)))
+
+    buffer.write('\n/* %s */' % prototype_obj.function_name)
+    buffer.write('\nPyDoc_STRVAR(%s_doc, %s);\n' % (python_function_name, doc))
+
+    module_defs[get_family(python_function_name)].append(
+        '{"%s", (PyCFunction)spice_%s, %s, %s_doc},' % \
+        (python_function_name, python_function_name, method_flags,
+         python_function_name))
+
+def get_family(python_function_name):
+    """
+    Return the family module a wrapper is put in, see families.
+    """
+
+    for family, prefixes in families:
+        if python_function_name.startswith(prefixes):
+            return family
+
+    return 'misc'
+
+def get_vector_input(prototype_obj, input_list, output_list):
+    """
+    Return the input parameter a vectorized wrapper loops over, or None if
+    the function does not qualify for one.
+
+    The function qualifies if it takes a scalar double named in
+    vectorize_names and all of its results are fixed size doubles or
+    integers that can be stored one row per input value.
+    """
+
+    if prototype_obj.function_name.startswith('bodv'):
+        return None
+
+    if prototype_obj.type != 'void' and \
+            (prototype_obj.is_pointer or prototype_obj.type not in vector_output_types):
+        return None
+
+    if not output_list and prototype_obj.type == 'void':
+        return None
+
+    for output in output_list:
+        if output.type not in vector_output_types or output.allocate_memory:
+            return None
+
+        if output.is_array and '' in output.num_elements:
+            return None
+
+    for input in input_list:
+        if input.name in vectorize_names and input.type == 'SpiceDouble' and \
+                not input.is_array and not input.is_pointer:
+            return input
+
+    return None
+
+def get_array_format(type):
+    """
+    Return the C expressions for the buffer format and item size of a
+    SpiceArray holding values of the given type.
+    """
+
+    if type == 'SpiceDouble':
+        return '"d"', 'sizeof(SpiceDouble)'
+    elif type == 'SpiceChar':
+        return 'STRING_FORMAT', 'STRING_LEN'
+    else:
+        return 'PYSPICE_INT_FORMAT(%s)' % type, 'sizeof(%s)' % type
+
+def gen_vector_wrapper(prototype_obj, python_function_name, input_list,
+                       output_list, vector_input, buffer):
+    """
+    Generate an array-aware variant of a wrapper.
+
+    The variant takes the same arguments as the scalar wrapper, except that
+    vector_input may be any buffer or sequence of doubles.  The CSPICE
+    function is called once per value in C, writing its outputs straight
+    into preallocated SpiceArrays with one row per value, e.g. spkezr
+    returns an (N, 6) array of states and an (N,) array of light times.
+
+    The loop is written once, in vec_<name>(args, mask), and registered
+    twice: as <name>, raising on the first failure, and as _masked_<name>,
+    which resets the errors, fills the outputs of the failed values with NaN
+    (0 for integers and strings) and also returns a boolean mask and the
+    short error message of each value.
+    """
+
+    parse_tuple_string = ''
+    input_name_list = []
+    py_to_c_conversions = []
+    results = []
+
+    buffer.write(
+        "\n\n/* array-aware %s over %s */" % \
+        (prototype_obj.function_name, vector_input.name))
+    buffer.write(
+        "\nstatic PyObject * vec_%s(PyObject *args, int mask)\n{" % \
+        python_function_name)
+
+    buffer.write("\n  /* variables for inputs */")
+
+    for input in input_list:
+        if input is vector_input:
+            parse_tuple_string += 'O'
+            input_name_list.append('py_%s' % input.name)
+            buffer.write("\n  PyObject * py_%s = NULL;" % input.name)
+            buffer.write("\n  PySpiceDoubles %s;" % input.name)
+            continue
+
+        py_string, names = declare_input(input, buffer, py_to_c_conversions)
+        parse_tuple_string += py_string
+        input_name_list += names
+
+    # the function result, if any, is returned ahead of the outputs
+    if prototype_obj.type != 'void':
+        result = Container()
+        result.name = 'result'
+        result.type = prototype_obj.type
+        result.is_array = 0
+        result.num_elements = []
+        results.append(result)
+
+    results += output_list
+
+    buffer.write("\n\n  /* variables for outputs */")
+
+    for output in results:
+        dims = output.num_elements or []
+        row_size = 1
+        for count in dims:
+            row_size *= count
+
+        output.row_size = row_size
+
+        buffer.write("\n  PyObject * py_%s = NULL;" % output.name)
+        buffer.write("\n  Py_ssize_t %s_shape[%d] = {%s};" % \
+            (output.name, len(dims) + 1, ', '.join(['0'] + [str(x) for x in dims])))
+        buffer.write("\n  %s * %s = NULL;" % (output.type, output.name))
+
+    buffer.write("\n  PyObject * py_mask = NULL;")
+    buffer.write("\n  PyObject * py_codes = NULL;")
+
+    buffer.write("\n\n  Py_ssize_t i = 0, n = 0;")
+    buffer.write("\n  char failed = 0;\n")
+
+    method_flags = write_arg_parsing(
+        buffer, python_function_name, parse_tuple_string, input_name_list)
+
+    if py_to_c_conversions:
+        buffer.write('\n  %s' % '\n  '.join(py_to_c_conversions))
+
+    buffer.write(
+        '\n  PYSPICE_CHECK_RETURN_STATUS(get_spice_doubles(py_%s, &%s));' % \
+        (vector_input.name, vector_input.name))
+    buffer.write('\n  n = %s.count;\n' % vector_input.name)
+
+    # allocate the result arrays
+    for output in results:
+        format, itemsize = get_array_format(output.type)
+        buffer.write('\n  %s_shape[0] = n;' % output.name)
+        buffer.write(
+            '\n  py_%s = new_py_array(%s, %s, %d, %s_shape);' % \
+            (output.name, format, itemsize, len(output.num_elements or []) + 1,
+             output.name))
+
+    buffer.write('\n\n  if(mask) {')
+    buffer.write('\n    py_mask = new_py_array("?", 1, 1, &n);')
+    buffer.write(
+        '\n    py_codes = new_py_array(SPICE_SHORT_FORMAT, SPICE_SHORT_LEN, 1, &n);')
+    buffer.write('\n  }')
+
+    buffer.write('\n\n  if(%s || (mask && (!py_mask || !py_codes))) {' % \
+        ' || '.join(['!py_%s' % x.name for x in results]))
+    buffer.write('\n    failed = 1;')
+    buffer.write('\n  } else {')
+
+    for output in results:
+        buffer.write('\n    %s = (%s *)PYSPICE_ARRAY_DATA(py_%s);' % \
+            (output.name, output.type, output.name))
+
+    buffer.write('\n\n    if(mask) {')
+    buffer.write('\n      memset(PYSPICE_ARRAY_DATA(py_mask), 0, n);')
+    buffer.write(
+        '\n      memset(PYSPICE_ARRAY_DATA(py_codes), 0, n * SPICE_SHORT_LEN);')
+    buffer.write('\n    }')
+
+    # build the parameter list for calling the CSPICE function on row i
+    param_list = []
+    for input in input_list:
+        if input is vector_input:
+            param_list.append('%s.data[i]' % input.name)
+        else:
+            param_list.append(input.name)
+
+    for output in output_list:
+        pointer = '%s + i * %d' % (output.name, output.row_size)
+
+        # multi-dimensional outputs are passed as pointers to rows
+        dims = output.num_elements or []
+        if len(dims) > 1:
+            pointer = '(%s (*)%s)(%s)' % (
+                output.type, ''.join(['[%d]' % x for x in dims[1:]]), pointer)
+
+        param_list.append(pointer)
+
+    call = '%s(%s)' % (prototype_obj.function_name, ', '.join(param_list))
+    if prototype_obj.type != 'void':
+        call = 'result[i] = ' + call
+    call = 'PYSPICE_TIME_CSPICE(%s);' % call
+
+    buffer.write('\n\n    for(i = 0; i < n && !failed; ++ i) {')
+    buffer.write('\n      %s' % call)
+
+    buffer.write('\n\n      if(mask && failed_c()) {')
+    buffer.write('\n        pyspice_mask_error(py_mask, py_codes, i);')
+
+    for output in results:
+        row = '%s + i * %d' % (output.name, output.row_size)
+
+        if output.type == 'SpiceDouble':
+            buffer.write('\n        pyspice_fill_nan(%s, %d);' % \
+                (row, output.row_size))
+        else:
+            buffer.write('\n        memset(%s, 0, %d * sizeof(%s));' % \
+                (row, output.row_size, output.type))
+
+    buffer.write('\n        continue;')
+    buffer.write('\n      }')
+
+    buffer.write('\n\n      PYSPICE_CHECK_FAILED;')
+    buffer.write('\n    }')
+    buffer.write('\n  }\n')
+
+    buffer.write('\n  release_spice_doubles(&%s);\n' % vector_input.name)
+
+    buffer.write('\n  if(failed) {')
+    for output in results:
+        buffer.write('\n    Py_XDECREF(py_%s);' % output.name)
+    buffer.write('\n    Py_XDECREF(py_mask);')
+    buffer.write('\n    Py_XDECREF(py_codes);')
+    buffer.write('\n    return NULL;')
+    buffer.write('\n  }\n')
+
+    buffer.write('\n  if(mask) {')
+    buffer.write('\n    return Py_BuildValue("%s", %s, py_mask, py_codes);' % \
+        ('N' * (len(results) + 2), ', '.join(['py_%s' % x.name for x in results])))
+    buffer.write('\n  }\n')
+
+    if len(results) == 1:
+        buffer.write('\n  return py_%s;' % results[0].name)
+    else:
+        buffer.write('\n  return Py_BuildValue("%s", %s);' % \
+            ('N' * len(results), ', '.join(['py_%s' % x.name for x in results])))
+
+    buffer.write("\n}")
+
+    for prefix, mask in (('', 0), ('masked_', 1)):
+        buffer.write(
+            ("\n\nstatic PyObject * spice_vec_%s%s(PyObject *self, PyObject *args)" +
+             "\n{\n  return vec_%s(args, %d);\n}") % \
+            (prefix, python_function_name, python_function_name, mask))
+
+        buffer.write('\nPYSPICE_STATS_WRAPPER(vec_%s%s, "vec.%s%s")' % \
+                     (prefix, python_function_name, prefix, python_function_name))
+
+    buffer.write(
+        ('\nPyDoc_STRVAR(vec_%s_doc, "Array form of %s(): %s may be a sequence or ' +
+         'float64 buffer of values and the results are returned as arrays with ' +
+         'one row per value.");\n') % \
+        (python_function_name, python_function_name, vector_input.name))
+
+    for prefix in ('', 'masked_'):
+        vector_module_defs[get_family(python_function_name)].append(
+            '{"%s%s", PYSPICE_METHOD(vec_%s%s), %s, vec_%s_doc},' % \
+            (prefix and '_' + prefix, python_function_name, prefix,
+             python_function_name, method_flags, python_function_name))
+
+def declare_input(input, buffer, py_to_c_conversions):
+    """
+    Declare the variables for an input parameter.  Statements converting the
+    parsed Python objects into the C variables are added to the
+    py_to_c_conversions list.
+
+    Returns the PyArg_ParseTuple format for the input and the list of
+    variables to pass to PyArg_ParseTuple.
+    """
+
+    input_name = input.name
+
+    # fixed size double and integer arrays are parsed as a single object
+    # and copied in by get_spice_array(), which takes any buffer of the
+    # right type and size in one memcpy or falls back to nested sequences
+    if is_buffer_array(input):
+        spice_type = input.type.replace('Const', '', 1)
+        format, itemsize = get_array_format(spice_type)
+
+        buffer.write("\n  %s %s%s;" % (spice_type, input_name,
+            ''.join(['[%d]' % x for x in input.num_elements])))
+        buffer.write("\n  PyObject * py_%s = NULL;" % input_name)
+        buffer.write("\n  static const Py_ssize_t %s_shape[%d] = {%s};" % \
+            (input_name, len(input.num_elements),
+             ', '.join([str(x) for x in input.num_elements])))
+
+        py_to_c_conversions.append(
+            "PYSPICE_CHECK_RETURN_STATUS(get_spice_array(py_%s, %s, %s, %s, %d, %s_shape));" % \
+            (input_name, input_name, format, itemsize, len(input.num_elements),
+             input_name))
+
+        return 'O', ['py_%s' % input_name]
+
+    if input.is_pointer:
+        pointer_string = " * "
+    else:
+        pointer_string = " "
+
+    buffer.write("\n  %s%s%s" % (
+        input.reg_type, pointer_string, input_name))
+
+    if input.is_array:
+        for count in input.num_elements:
+            buffer.write("[%s]" % count)
+
+    buffer.write(";")
+
+    # if this input has a get_spice_fn function associated with it,
+    # declare a variable for the conversion
+    if input.get_spice_fn:
+        input_name = "py_%s" % input_name
+        buffer.write("\n  PyObject * %s = NULL;" % input_name)
+        py_to_c_conversions.append(
+            "PYSPICE_CHECK_RETURN_STATUS(%s = %s(%s));" % \
+            (input.name, input.get_spice_fn, input_name))
+
+    # if this is an array, put in the right amount of elements
+    # into the ParseTuple parameter list (one per element).
+    # Also, the list coming in can be 1D, 2D, or 3D.
+    if input.is_array:
+        return input.py_string, get_array_sizes(input.num_elements, input_name)
+    else:
+        return input.py_string, [input_name]
+
+def get_record_type(input, name=''):
+    """
+    Return the type of the pointer passed to CSPICE for an array of records,
+    e.g. "ConstSpiceDouble (*)[6]" for "states[][6]".  If name is given, a
+    declaration of a variable with that name is returned instead.
+    """
+
+    if len(input.num_elements) > 1:
+        return "%s (*%s)%s" % (input.type, name,
+            ''.join(['[%s]' % x for x in input.num_elements[1:]]))
+
+    return ("%s *%s" % (input.type, name)).strip()
+
+def write_record_conversions(buffer, input_list, records):
+    """
+    Write the code getting the arrays of records from their Python objects
+    and setting the record counts.  Arrays sharing a count must hold the
+    same number of records.  On failure the arrays already taken are
+    released.
+
+    Returns the names of the arrays, which have to be released with
+    release_spice_doubles() after the call.
+    """
+
+    names = []
+    input_types = dict([(input.name, input) for input in input_list])
+
+    for count_name, arrays in sorted(records.items()):
+        for index, (name, row_size) in enumerate(arrays):
+            # the first array sets the count, the others are checked against it
+            if index:
+                rows = '%s_rows' % name
+            else:
+                rows = count_name
+
+            release = ''.join(["\n    release_spice_doubles(&%s_values);" % x \
+                               for x in names])
+
+            buffer.write(
+                ("\n  if(!get_spice_rows(py_%s, %s, &%s_values, &%s)) {" +
+                 "%s\n    return NULL;\n  }") % \
+                (name, row_size, name, rows, release))
+
+            names.append(name)
+
+            if index:
+                release += "\n    release_spice_doubles(&%s_values);" % name
+
+                buffer.write(
+                    ("\n  if(%s != %s) {" +
+                     "\n    PyErr_SetString(PyExc_ValueError, " +
+                     "\"%s and %s must hold the same number of records\");" +
+                     "%s\n    return NULL;\n  }") % \
+                    (rows, count_name, arrays[0][0], name, release))
+
+            buffer.write("\n  %s = (%s)%s_values.data;" % \
+                (name, get_record_type(input_types[name]), name))
+
+        buffer.write('\n')
+
+    return names
+
+def write_arg_parsing(buffer, python_function_name, parse_tuple_string,
+                      input_name_list):
+    """
+    Write the code unpacking the Python arguments into the input variables
+    and return the calling convention to register the wrapper with.
+
+    When every input takes a single format character the arguments are
+    taken straight out of the args tuple and converted with the inline
+    get_spice_* converters from pyspice.h, skipping PyArg_ParseTuple's
+    format string interpretation.  Wrappers with a single input use METH_O,
+    in which case args is the argument itself rather than a tuple.  Inputs
+    that are expanded element by element (e.g. "(ddd)") still go through
+    PyArg_ParseTuple.
+    """
+
+    if len(parse_tuple_string) != len(input_name_list):
+        buffer.write(
+            ('\n  PYSPICE_CHECK_RETURN_STATUS(' +
+             'PyArg_ParseTuple(args, "%s", %s));') % \
+            (parse_tuple_string, "&" + ", &".join(input_name_list)))
+
+        return 'METH_VARARGS'
+
+    if len(input_name_list) == 1:
+        method_flags = 'METH_O'
+        arg_list = ['args']
+    else:
+        method_flags = 'METH_VARARGS'
+        arg_list = ['PyTuple_GET_ITEM(args, %d)' % x for x in range(len(input_name_list))]
+
+        buffer.write(
+            '\n  PYSPICE_CHECK_RETURN_STATUS(check_args(args, %d, "%s"));' % \
+            (len(input_name_list), python_function_name))
+
+    for py_string, name, arg in zip(parse_tuple_string, input_name_list, arg_list):
+        if py_string == 'O':
+            buffer.write('\n  %s = %s;' % (name, arg))
+        else:
+            buffer.write(
+                '\n  PYSPICE_CHECK_RETURN_STATUS(%s(%s, &%s));' % \
+                (arg_converters[py_string], arg, name))
+
+    return method_flags
+
+def is_buffer_array(param):
+    """
+    Check whether the given parameter is a fixed size double or integer
+    array that can be filled from a buffer.
+    """
+
+    if not param.is_array or '' in param.num_elements:
+        return False
+
+    return param.type in ('ConstSpiceDouble', 'SpiceDouble', 'ConstSpiceInt', 'SpiceInt')
+
 def get_array_sizes(list, name):
     """
     Expand the elements of an array for 1, 2, and 3D arrays
@@ -568,6 +1283,41 @@ def get_array_sizes(list, name):
 
     return t_list
 
+def get_py_object_code(py_string, value):
+    """
+    Return the C expression creating a Python object out of value, like
+    Py_BuildValue would for the single format character py_string.
+    """
+
+    if py_string == 'N':
+        return value
+    elif py_string == 'd':
+        return 'PyFloat_FromDouble(%s)' % value
+    elif py_string in ('i', 'l'):
+        return 'PyInt_FromLong(%s)' % value
+    elif py_string == 's':
+        return 'PyString_FromString(%s)' % value
+
+    raise ValueError('no conversion for format %r' % py_string)
+
+def write_return_value(buffer, py_strings, values, indent='\n  '):
+    """
+    Write the code returning a Python object made of values, the format
+    characters for which are given by py_strings.  A single value is
+    returned as is and several values are returned as a tuple, as with
+    Py_BuildValue.  The format string is put together here rather than at
+    run time so the C compiler sees a constant.
+    """
+
+    if not values:
+        buffer.write(indent + 'Py_RETURN_NONE;')
+    elif len(values) == 1:
+        buffer.write(indent + 'return %s;' % \
+                     get_py_object_code(py_strings[0], values[0]))
+    else:
+        buffer.write(indent + 'return Py_BuildValue("%s", %s);' % \
+                     (''.join(py_strings), ', '.join(values)))
+
 def make_automatic_returnVal(buffer, output_list):
     """
     The outputs parameters and their dimensions are defined so this function
@@ -576,7 +1326,7 @@ def make_automatic_returnVal(buffer, output_list):
 
     # put together the outputs
     t_list = []
-    buildvalue_string = ''
+    py_strings = []
 
     # Check_found is used to indicate whether a found variable was
     # passed along with other output variables.  check_found is set to
@@ -594,43 +1344,31 @@ def make_automatic_returnVal(buffer, output_list):
                     '\n  if(found) { Py_RETURN_TRUE; } ' +
                     'else { Py_RETURN_FALSE; }'
                 )
+                return
             else:
                 check_found = True
             continue
 
-        # If the output is an array, expand out all the elements in order
-        # to build a python tuple out of them (This seems sub-optimal, I
-        # have to read some more python C documentation).
+        # If the output is an array, let get_py_array() build a tuple or a
+        # SpiceArray out of it, depending on the array returns setting
         if output.is_array:
-            t_list += get_array_sizes(output.num_elements, output.name)
+            format, itemsize = get_array_format(output.type)
+            t_list.append('get_py_array(%s, %s, %s, %d, %s_shape)' % \
+                (output.name, format, itemsize, len(output.num_elements),
+                 output.name))
+            py_strings.append('N')
         elif(output.get_py_fn):
+            # the get_py_* functions return a new reference
             t_list.append('%s(&%s)' % (output.get_py_fn, output.name))
-        else:
+            py_strings.append('N')
+        elif output.py_string:
             t_list.append(output.name)
+            py_strings.append(output.py_string)
 
-        buildvalue_string += output.py_string
-
-    output_list_string = ", ".join(t_list)
-
-    if output_list_string:
-        if check_found:
-            buffer.write(
-                '\n  if(!found) {\n    return Py_None;\n  } else {\n    ')
-        else:
-            buffer.write('\n  ')
-
-        buffer.write(
-            'PyObject *returnVal = Py_BuildValue(buildvalue_string, %s);' % \
-            (output_list_string))
-
-        for output in output_list:
-            if output.allocate_memory:
-                buffer.write('\n  free(%s);' % output.name)
+    if check_found:
+        buffer.write('\n  if(!found) {\n    Py_RETURN_NONE;\n  }\n')
 
-        buffer.write('\n  return returnVal;');
-
-        if check_found:
-            buffer.write('\n  }\n')
+    write_return_value(buffer, py_strings, t_list)
 
 def make_manual_returnVal(buffer, output_list):
     """
@@ -640,31 +1378,45 @@ def make_manual_returnVal(buffer, output_list):
     this function can be used.
     """
 
-    buffer.write('\n  int i = 0;')
-    buffer.write('\n  PyObject *t = NULL;')
-    buffer.write(
-        '\n  PyObject *returnVal = PyTuple_New(%d);' % len(output_list))
+    t_list = []
+    py_strings = []
 
-    count = 0;
-    for count in range(len(output_list)):
-        output = output_list[count]
+    # the bodv* functions return the number of values in their first output,
+    # the other functions fill the whole array
+    if output_list[0].allocate_memory:
+        buffer.write('\n  Py_ssize_t shape[1] = {%s};' % \
+                     output_list[0].allocate_memory)
+    else:
+        buffer.write('\n  Py_ssize_t shape[1] = {%s};' % output_list[0].name)
 
-        if output.allocate_memory:
-            buffer.write('\n  t = PyTuple_New(%s);' % output_list[0].name)
-            buffer.write(
-                '\n  for(i = 0; i < %s; ++ i) {' % output_list[0].name
-            )
-            buffer.write(
-                '\n    PyTuple_SET_ITEM(t, i, Py_BuildValue("%s", %s[i]));' % \
-                (output.py_string, output.name)
-            )
-            buffer.write('\n  }')
-            buffer.write('\n  PyTuple_SET_ITEM(returnVal, %d, t);' % count)
+    # like in make_automatic_returnVal, None is returned if nothing was found
+    if 'found' in [x.name for x in output_list]:
+        buffer.write('\n  if(!found) {')
+
+        for output in output_list:
+            if output.allocate_memory:
+                buffer.write('\n    free(%s);' % output.name)
+
+        buffer.write('\n    Py_RETURN_NONE;\n  }\n')
+
+    for output in output_list:
+        if output.name == 'found':
+            continue
+        elif output.allocate_memory:
+            format, itemsize = get_array_format(output.type)
+            t_list.append('get_py_array(%s, %s, %s, 1, shape)' % \
+                (output.name, format, itemsize))
+            py_strings.append('N')
         else:
-            buffer.write(
-                '\n  PyTuple_SET_ITEM(returnVal, %d, Py_BuildValue("%s", %s));' % \
-                (count, output.py_string, output.name)
-            )
+            t_list.append(output.name)
+            py_strings.append(output.py_string)
+
+    buffer.write('\n  PyObject *returnVal = Py_BuildValue("%s", %s);' % \
+                 (''.join(py_strings), ', '.join(t_list)))
+
+    for output in output_list:
+        if output.allocate_memory:
+            buffer.write('\n  free(%s);' % output.name)
 
     buffer.write('\n  return returnVal;');
 
@@ -677,7 +1429,8 @@ def get_type(type):
     elif type in ('ConstSpiceDouble', 'SpiceDouble'):
         reg_type = 'double'
     elif type in ('ConstSpiceBoolean', 'SpiceBoolean'):
-        reg_type = 'char'
+        # PyArg_ParseTuple stores an int for the 'i' format
+        reg_type = 'int'
     elif type in ('ConstSpiceInt', 'SpiceInt'):
         # put a long for a spice int since they are long integers
         reg_type = 'long'
@@ -826,7 +1579,9 @@ def parse_param(param):
         #debug('is_array: %s' % str(param_obj.is_array))
         #debug('py_string: %s' % param_obj.py_string)
 
-        if param_obj.is_array:
+        # arrays with an unspecified dimension are handled as records, see
+        # record_inputs
+        if param_obj.is_array and '' not in param_obj.num_elements:
             param_obj.py_string = get_tuple_py_string(param_obj)
 
         return param_obj
@@ -894,22 +1649,7 @@ def remove_extra_spaces(string):
     strip out extra spaces in the given string
     """
 
-    string = string.strip()
-
-    last_char = ""
-
-    i = 0
-    while i < len(string):
-        s = string[i]
-
-        if s == " " and last_char == " ":
-            string = string[0:i] + string[i+1:]
-        else:
-            i += 1
-
-        last_char = s
-
-    return string
+    return re.sub(' {2,}', ' ', string.strip())
 
 def run_command(command, writer):
     """
@@ -947,37 +1687,92 @@ def run_command(command, writer):
 
     return command_handle.close()
 
-def main(cspice_toolkit):
-    global cspice_src
+def get_hash(*texts):
+    """
+    Return the hex digest of the given strings, along with the source of
+    this script so changing the generator invalidates what was cached.
+    """
 
-    parsing_prototype = False
-    curr_prototype = ''
-    module_methods = StringIO()
-    buffer = StringIO()
+    digest = hashlib.sha1(generator_source)
 
-    cspice_header = os.path.join(cspice_toolkit, 'include', 'SpiceUsr.h')
-    cspice_src = os.path.join(cspice_toolkit, 'src', 'cspice')
+    for text in texts:
+        digest.update('\0%d\0' % len(text))
+        digest.update(text)
 
-    if not os.path.exists(cspice_header):
-        sys.exit('Error: Unable to find %s' % cspice_header)
+    return digest.hexdigest()
 
-    if not os.path.exists(cspice_src):
-        sys.exit('Error: Unable to find %s' % cspice_header)
+def read_file(path):
+    """
+    Return the contents of the file at path, or an empty string if there is
+    no such file.
+    """
+
+    if not os.path.exists(path):
+        return ''
+
+    f = open(path, 'rb')
+    try:
+        return f.read()
+    finally:
+        f.close()
+
+generator_source = read_file(os.path.splitext(__file__)[0] + '.py')
+
+class WrapperCache(object):
+    """
+    Results of the generator kept in a directory, one pickle file per key.
+    Nothing is cached when directory is None.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def get(self, key):
+        if not self.directory:
+            return None
+
+        path = os.path.join(self.directory, key)
+        if not os.path.exists(path):
+            return None
+
+        try:
+            return cPickle.loads(read_file(path))
+        except (EOFError, ValueError, cPickle.UnpicklingError):
+            return None
+
+    def put(self, key, value):
+        if not self.directory:
+            return
+
+        # written under another name first, so concurrent builds sharing
+        # the directory never read a partial file
+        fd, path = tempfile.mkstemp(dir=self.directory)
+        f = os.fdopen(fd, 'wb')
+        try:
+            cPickle.dump(value, f, cPickle.HIGHEST_PROTOCOL)
+        finally:
+            f.close()
+
+        os.rename(path, os.path.join(self.directory, key))
+
+def get_prototypes(cspice_header):
+    """
+    Return the prototypes of the functions declared in the preprocessed
+    cspice header, one string per prototype.
+    """
+
+    prototypes = []
+    parsing_prototype = False
+    curr_prototype = ''
 
     # preprocess the header file
     output = StringIO()
     run_command('gcc -E %s' % cspice_header, output)
-    output.reset()
 
-    used_prototypes = 0
-    total_prototypes = 0;
-    line_no = 0
-    while 1:
-        input = output.readline()
-        line_no +=1
-        # #debug('line: {1}, input: {0}'.format(input,line_no))
-        if input == "":
-            break
+    for input in output.getvalue().split('\n'):
         input = input.strip()
 
         if input == "":
@@ -986,52 +1781,82 @@ def main(cspice_toolkit):
         elif not parsing_prototype and "(" not in input:
             continue
         if parsing_prototype:
-            # #debug("parse_adding: %s" % input)
+            curr_prototype += input
+        else:
+            first_word = input[0:input.index(" ")]
+            if first_word not in function_types:
+                continue
 
             curr_prototype += input
 
-            # #debug("curr_prototype now: %s" % curr_prototype)
+        # if the last character is a semi-colon, the prototype is complete,
+        # add it to the list and clear out the curr_prototype variable
+        if input.endswith(";"):
+            prototypes.append(curr_prototype)
+            curr_prototype = ""
+            parsing_prototype = False
+        else:
+            parsing_prototype = True
 
-            # if the last character is a semi-colon, the prototype is
-            # complete, pass it along to the wrapper generator and clear
-            # out the curr_prototype variable
-            if input.endswith(";"):
-                parsing_prototype = False
+    return prototypes
 
-                # gen_wrapper can return False, then don't count it as used
-                #debug('')
-                #debug('%s\n' % curr_prototype)
-                if gen_wrapper(curr_prototype, buffer):
-                    used_prototypes += 1
-                total_prototypes += 1
+def get_new_defs(defs, lengths):
+    """
+    Return (family, definitions) for the definitions added to the lists of
+    defs since their lengths were taken.
+    """
 
-                curr_prototype = ""
-            pass
-        else:
-            first_word = input[0:input.index(" ")]
-            # #debug('first_word: {0}'.format(first_word))
-            if first_word in function_types:
-                # #debug("adding %s" % input)
+    return [(x, y[lengths[x]:]) for x, y in sorted(defs.items())
+            if y[lengths[x]:]]
 
-                curr_prototype += input
+def gen_cached_wrapper(prototype, buffers, cache):
+    """
+    Write the wrapper of the prototype to the buffer of its family like
+    gen_wrapper(), taking it from the cache when neither the prototype nor
+    the source file of the function changed.  Returns whether the function
+    was wrapped.
+    """
 
-                # #debug("curr_prototype now: %s" % curr_prototype)
-            else:
-                continue
-            if input.endswith(";"):
-                # #debug("prototype to be wrapped: {0}".format(curr_prototype))
-                gen_wrapper(curr_prototype, buffer)
-                curr_prototype = ""
-            else:
-                parsing_prototype = True
+    function_name = parse_prototype(remove_extra_spaces(prototype)).function_name
+    src_file = os.path.join(cspice_src, '%s.c' % function_name)
+    key = get_hash(prototype, read_file(src_file))
 
-    sys.stderr.write("prototypes used: %d, total: %d\n" % (used_prototypes, total_prototypes))
-    # put together the methods array
-    for module_def in module_defs:
-        module_methods.write("\n  %s" % module_def)
+    entry = cache.get(key)
+
+    if entry is None:
+        # note what gen_wrapper adds to the method tables and documentation
+        lengths = dict([(x, len(y)) for x, y in module_defs.items()])
+        vector_lengths = dict([(x, len(y)) for x, y in vector_module_defs.items()])
+        documented = set(docs)
+
+        function_buffer = StringIO()
+        used = bool(gen_wrapper(prototype, function_buffer))
+
+        function_docs = [(x, docs[x]) for x in docs if x not in documented]
+
+        entry = (used, function_buffer.getvalue(),
+                 get_new_defs(module_defs, lengths),
+                 get_new_defs(vector_module_defs, vector_lengths),
+                 function_docs)
+
+        cache.put(key, entry)
+    else:
+        used, code, family_defs, vector_defs, function_docs = entry
+
+        for family, defs in family_defs:
+            module_defs[family].extend(defs)
 
-    # print out necessary boilerplate stuff
-    return """\
+        for family, defs in vector_defs:
+            vector_module_defs[family].extend(defs)
+
+        docs.update(function_docs)
+
+    python_function_name = function_name.rsplit('_c',1)[0]
+    buffers[get_family(python_function_name)].write(entry[1])
+
+    return entry[0]
+
+GENERATED_HEADER = """\
 /*
 THIS IS AUTOMATICALLY GENERATED CODE.  IF THERE IS AN ERROR, PLEASE
 MAKE ANY NECESSARY CHANGES IN THE PYTHON SCRIPT NAMED mkwrapper.py.
@@ -1042,21 +1867,227 @@ BLAH.  SEE FILE "LICENSE" FOR MORE INFO.
 */
 
 #include "pyspice.h"
+"""
+
+def get_source_name(family=None):
+    """
+    Return the name of the C file holding the wrappers of family, or of the
+    file registering the families if family is None.
+    """
+
+    if family is None:
+        return 'spicemodule.c'
+
+    return 'spicemodule_%s.c' % family
+
+def get_source_names():
+    """
+    Return the names of the C files written by write_sources().
+    """
+
+    return [get_source_name(x) for x in sorted(module_defs)] + \
+        [get_source_name()]
+
+def write_sources(sources, directory):
+    """
+    Write the (name, code) sources returned by main() to directory.  Files
+    that did not change are left alone, so their objects are not rebuilt.
+    Returns the names of the files written.
+    """
+
+    written = []
+
+    for name, code in sources:
+        path = os.path.join(directory, name)
+
+        if read_file(path) == code:
+            continue
+
+        f = open(path, 'wb')
+        f.write(code)
+        f.close()
+
+        written.append(name)
+
+    return written
+
+def main(cspice_toolkit):
+    global cspice_src
+
+    buffers = dict([(x, StringIO()) for x in module_defs])
 
+    cspice_header = os.path.join(cspice_toolkit, 'include', 'SpiceUsr.h')
+    cspice_src = os.path.join(cspice_toolkit, 'src', 'cspice')
+
+    if not os.path.exists(cspice_header):
+        sys.exit('Error: Unable to find %s' % cspice_header)
+
+    if not os.path.exists(cspice_src):
+        sys.exit('Error: Unable to find %s' % cspice_header)
+
+    cache = WrapperCache(cache_dir)
+
+    # the prototypes only change with the headers
+    include_dir = os.path.dirname(cspice_header)
+    headers = []
+    for name in sorted(os.listdir(include_dir)):
+        headers.extend((name, read_file(os.path.join(include_dir, name))))
+    headers_key = get_hash(*headers)
+
+    prototypes = cache.get(headers_key)
+    if prototypes is None:
+        prototypes = get_prototypes(cspice_header)
+        cache.put(headers_key, prototypes)
+
+    used_prototypes = 0
+    total_prototypes = 0
+    for prototype in prototypes:
+        # gen_wrapper can return False, then don't count it as used
+        if gen_cached_wrapper(prototype, buffers, cache):
+            used_prototypes += 1
+        total_prototypes += 1
+
+    sys.stderr.write("prototypes used: %d, total: %d\n" % (used_prototypes, total_prototypes))
+    sources = []
+
+    # each family goes in its own file, with its method arrays
+    family_entries = []
+    for family in sorted(module_defs):
+        buffer = buffers[family]
+
+        for name, defs in (('%s_methods' % family, module_defs[family]),
+                           ('%s_vec_methods' % family,
+                            vector_module_defs[family])):
+            buffer.write("\nPyMethodDef %s[] = {" % name)
+
+            for module_def in defs:
+                buffer.write("\n  %s" % module_def)
+
+            buffer.write("\n  {NULL, NULL},\n};\n")
+
+        sources.append((get_source_name(family),
+                        GENERATED_HEADER + buffer.getvalue()))
+
+        names = ' '.join([x.split('"')[1] for x in module_defs[family]])
+
+        # the _masked_ variants are reached through spice.vec
+        vec_names = [x.split('"')[1] for x in vector_module_defs[family]]
+        vec_names = ' '.join([x for x in vec_names if not x.startswith('_')])
+
+        family_entries.append('{"%s", %s_methods, %s_vec_methods, "%s", "%s"},' % \
+                              (family, family, family, names, vec_names))
+
+    declarations = ['extern PyMethodDef %s_methods[], %s_vec_methods[];' % \
+                    (x, x) for x in sorted(module_defs)]
+
+    # then the file registering them
+    sources.append((get_source_name(), GENERATED_HEADER + """\
 PyObject *SpiceException;
 
+/* the family modules, see spice/lazy.py */
 %s
+
+static struct {
+  const char *name;
+  PyMethodDef *methods;
+  PyMethodDef *vec_methods;
+  const char *functions;
+  const char *vec_functions;
+} families[] = {
+  %s
+  {NULL, NULL, NULL, NULL, NULL},
+};
+
+/*
+ * Return the family module name, or its module of array-aware variants
+ * when vec is set, creating it on the first call
+ */
+static PyObject * load_family(PyObject *args, int vec)
+{
+  char *name = NULL;
+  char full_name[64];
+  int i = 0;
+  PyObject *module = NULL;
+
+  PYSPICE_CHECK_RETURN_STATUS(get_spice_string(args, &name));
+
+  for(i = 0; families[i].name; ++ i) {
+    if(!strcmp(families[i].name, name)) {
+      break;
+    }
+  }
+
+  if(!families[i].name) {
+    PyErr_Format(PyExc_ValueError, "unknown family '%%s'", name);
+    return NULL;
+  }
+
+  PyOS_snprintf(full_name, sizeof(full_name),
+                vec ? "_spice._vec.%%s" : "_spice.%%s", name);
+  module = PyDict_GetItemString(PyImport_GetModuleDict(), full_name);
+
+  if(!module) {
+    /* registered in sys.modules, so it is only created once */
+    module = Py_InitModule(full_name, vec ? families[i].vec_methods :
+                                            families[i].methods);
+  }
+
+  Py_XINCREF(module);
+
+  return module;
+}
+
+static PyObject * spice_load_family(PyObject *self, PyObject *args)
+{
+  return load_family(args, 0);
+}
+
+static PyObject * spice_load_vec_family(PyObject *self, PyObject *args)
+{
+  return load_family(args, 1);
+}
+
+PyDoc_STRVAR(load_family_doc, "_load_family(name) -> module");
+PyDoc_STRVAR(load_vec_family_doc, "_load_vec_family(name) -> module");
+
 PyMethodDef methods[] = {
-%s
+  PYSPICE_METHODS
+  {"_load_family", spice_load_family, METH_O, load_family_doc},
+  {"_load_vec_family", spice_load_vec_family, METH_O, load_vec_family_doc},
   {NULL, NULL},
 };
 
+/* add a dictionary of the space separated function names of each family */
+static void add_family_names(PyObject *module, const char *name, int vec)
+{
+  PyObject *names = PyDict_New();
+  int i = 0;
+
+  for(i = 0; names && families[i].name; ++ i) {
+    PyObject *functions = PyString_FromString(
+      vec ? families[i].vec_functions : families[i].functions);
+
+    if(functions) {
+      PyDict_SetItemString(names, families[i].name, functions);
+      Py_DECREF(functions);
+    }
+  }
+
+  PyModule_AddObject(module, name, names);
+}
+
 void init_spice(PyObject *self)
 {
   PyObject *m = NULL;
 
   m = Py_InitModule("_spice", methods);
 
+  init_pyspice_types(m);
+
+  /* the family modules are created on first use, see spice/lazy.py */
+  add_family_names(m, "_families", 0);
+  add_family_names(m, "_vec_families", 1);
+
   /* Don't allow an exception to stop execution */
   erract_c("SET", 0, "RETURN");
   errdev_c("SET", 0, "NULL");
@@ -1066,7 +2097,9 @@ void init_spice(PyObject *self)
   Py_INCREF(SpiceException);
 
   PyModule_AddObject(m, "SpiceException", SpiceException);
-}""" % (buffer.getvalue(), module_methods.getvalue())
+}""" % ('\n'.join(declarations), '\n  '.join(family_entries))))
+
+    return sources
 
 if __name__ == '__main__':
     if sys.argv:
@@ -1074,4 +2107,13 @@ if __name__ == '__main__':
     else:
         sys.exit('Please provide the path to the unpacked cspice toolkit directory')
 
-    print main(cspice_toolkit)
+    sources = main(cspice_toolkit)
+
+    if len(sys.argv) > 3:
+        write_sources(sources, sys.argv[3])
+    else:
+        # the files are written so they also compile as one
+        print ''.join([code for name, code in sources])
+
+    if len(sys.argv) > 2:
+        write_docs(sys.argv[2])
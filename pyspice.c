@@ -10,19 +10,12 @@
  * $Id$
  */
 #include "pyspice.h"
+#include "pythread.h"
 
-void make_buildvalue_tuple(char *buf, const char *type, const int count)
-{
-    int i = 0;
-
-    strcat(buf, "(");
-
-    for(i = 0; i < count; ++ i) {
-        strcat(buf, type);
-    }
+#include <time.h>
 
-    strcat(buf, ")");
-}
+/* return array results as SpiceArrays instead of tuples */
+int pyspice_array_returns = 0;
 
 static PyObject * get_double_list(double *array, const int count)
 {
@@ -41,74 +34,362 @@ static PyObject * get_double_list(double *array, const int count)
 }
 
 /**
- * Create a Python Ellipse object from a SpiceEllipse object
+ * Make sure the args tuple passed to a wrapper holds count arguments
  */
-PyObject * get_py_ellipse(SpiceEllipse *spice_obj)
+int check_args(PyObject *args, Py_ssize_t count, const char *function_name)
 {
-    PyObject *py_obj = NULL;
-    PyObject *module = PyImport_ImportModule("spice");
+    if(PyTuple_GET_SIZE(args) != count) {
+        PyErr_Format(PyExc_TypeError, "%s() takes exactly %zd arguments (%zd given)",
+                     function_name, count, PyTuple_GET_SIZE(args));
+        return 0;
+    }
 
-    if(module) {
-        PyObject *py_cls = PyObject_GetAttrString(module, "Ellipse");
+    return 1;
+}
 
-        if(py_cls) {
-            py_obj = PyObject_CallObject(py_cls, NULL);
+/**
+ * Ellipse and Plane types
+ *
+ * These store the SpiceEllipse and SpicePlane structs inline, so going
+ * between the Python objects and the CSPICE structs is a struct copy.  The
+ * vector attributes are returned as new lists of floats and can be set from
+ * any sequence or buffer of three numbers.
+ */
 
-            if(py_obj) {
-                PyObject_SetAttrString(py_obj, "center", get_double_list(spice_obj->center, 3));
-                PyObject_SetAttrString(py_obj, "semi_major", get_double_list(spice_obj->semiMajor, 3));
-                PyObject_SetAttrString(py_obj, "semi_minor", get_double_list(spice_obj->semiMinor, 3));
-            }
+/* shape of the three element vectors in SpiceEllipse and SpicePlane */
+static const Py_ssize_t vector_shape[1] = {3};
+
+/**
+ * Get a three element vector stored at the offset given by closure
+ */
+static PyObject * get_struct_vector(PyObject *self, void *closure)
+{
+    return get_double_list((double *)((char *)self + (size_t)closure), 3);
+}
+
+static int set_struct_vector(PyObject *self, PyObject *value, void *closure)
+{
+    double vector[3];
+
+    if(!value) {
+        PyErr_SetString(PyExc_TypeError, "cannot delete this attribute");
+        return -1;
+    }
+
+    if(!get_spice_array(value, vector, "d", sizeof(double), 1, vector_shape)) {
+        return -1;
+    }
+
+    memcpy((char *)self + (size_t)closure, vector, sizeof(vector));
+
+    return 0;
+}
+
+#define ELLIPSE_OFFSET(member) \
+    ((void *)(offsetof(PySpiceEllipse, ellipse) + offsetof(SpiceEllipse, member)))
+
+static int ellipse_init(PySpiceEllipse *self, PyObject *args, PyObject *kwds)
+{
+    static char *kwlist[] = {"center", "semi_major", "semi_minor", NULL};
+    PyObject *vectors[3] = {NULL, NULL, NULL};
+    void *offsets[3] = {ELLIPSE_OFFSET(center), ELLIPSE_OFFSET(semiMajor),
+                        ELLIPSE_OFFSET(semiMinor)};
+    int i = 0;
+
+    if(!PyArg_ParseTupleAndKeywords(args, kwds, "|OOO:Ellipse", kwlist,
+                                    &vectors[0], &vectors[1], &vectors[2])) {
+        return -1;
+    }
+
+    for(i = 0; i < 3; ++ i) {
+        if(vectors[i] && vectors[i] != Py_None &&
+           set_struct_vector((PyObject *)self, vectors[i], offsets[i]) < 0) {
+            return -1;
         }
     }
 
-    return py_obj;
+    return 0;
 }
 
-PyObject * get_py_cell(SpiceCell *cell)
+static PyObject * ellipse_repr(PySpiceEllipse *self)
 {
-    PyObject *py_obj = NULL;
-    return py_obj;
+    PyObject *format = NULL, *values = NULL, *result = NULL;
+
+    values = Py_BuildValue("(NNN)",
+                           get_double_list(self->ellipse.center, 3),
+                           get_double_list(self->ellipse.semiMajor, 3),
+                           get_double_list(self->ellipse.semiMinor, 3));
+    format = PyString_FromString(
+        "<SpiceEllipse: center = %s, semi_major = %s, semi_minor = %s>");
+
+    if(values && format) {
+        result = PyString_Format(format, values);
+    }
+
+    Py_XDECREF(format);
+    Py_XDECREF(values);
+
+    return result;
 }
 
-PyObject * get_py_ekattdsc(SpiceEKAttDsc *spice_obj)
+static PyObject * ellipse_reduce(PySpiceEllipse *self)
 {
-    PyObject *py_obj = NULL;
-    return py_obj;
+    return Py_BuildValue("(O(NNN))", Py_TYPE(self),
+                         get_double_list(self->ellipse.center, 3),
+                         get_double_list(self->ellipse.semiMajor, 3),
+                         get_double_list(self->ellipse.semiMinor, 3));
 }
 
-PyObject * get_py_eksegsum(SpiceEKSegSum *spice_obj)
+static PyMethodDef ellipse_methods[] = {
+    {"__reduce__", (PyCFunction)ellipse_reduce, METH_NOARGS, NULL},
+    {NULL}
+};
+
+static PyGetSetDef ellipse_getset[] = {
+    {"center", get_struct_vector, set_struct_vector,
+     "Center of the ellipse.", ELLIPSE_OFFSET(center)},
+    {"semi_major", get_struct_vector, set_struct_vector,
+     "Semi-major axis of the ellipse.", ELLIPSE_OFFSET(semiMajor)},
+    {"semi_minor", get_struct_vector, set_struct_vector,
+     "Semi-minor axis of the ellipse.", ELLIPSE_OFFSET(semiMinor)},
+    {NULL}
+};
+
+PyTypeObject PySpiceEllipse_Type = {
+    PyVarObject_HEAD_INIT(NULL, 0)
+    "spice.Ellipse",                    /* tp_name */
+    sizeof(PySpiceEllipse),             /* tp_basicsize */
+    0,                                  /* tp_itemsize */
+    0,                                  /* tp_dealloc */
+    0,                                  /* tp_print */
+    0,                                  /* tp_getattr */
+    0,                                  /* tp_setattr */
+    0,                                  /* tp_compare */
+    (reprfunc)ellipse_repr,             /* tp_repr */
+    0,                                  /* tp_as_number */
+    0,                                  /* tp_as_sequence */
+    0,                                  /* tp_as_mapping */
+    0,                                  /* tp_hash */
+    0,                                  /* tp_call */
+    0,                                  /* tp_str */
+    0,                                  /* tp_getattro */
+    0,                                  /* tp_setattro */
+    0,                                  /* tp_as_buffer */
+    Py_TPFLAGS_DEFAULT | Py_TPFLAGS_BASETYPE, /* tp_flags */
+    "Ellipse(center=None, semi_major=None, semi_minor=None)\n\n"
+    "Class representing the C struct SpiceEllipse", /* tp_doc */
+    0,                                  /* tp_traverse */
+    0,                                  /* tp_clear */
+    0,                                  /* tp_richcompare */
+    0,                                  /* tp_weaklistoffset */
+    0,                                  /* tp_iter */
+    0,                                  /* tp_iternext */
+    ellipse_methods,                    /* tp_methods */
+    0,                                  /* tp_members */
+    ellipse_getset,                     /* tp_getset */
+    0,                                  /* tp_base */
+    0,                                  /* tp_dict */
+    0,                                  /* tp_descr_get */
+    0,                                  /* tp_descr_set */
+    0,                                  /* tp_dictoffset */
+    (initproc)ellipse_init,             /* tp_init */
+    0,                                  /* tp_alloc */
+    PyType_GenericNew,                  /* tp_new */
+};
+
+#define PLANE_OFFSET(member) \
+    ((void *)(offsetof(PySpicePlane, plane) + offsetof(SpicePlane, member)))
+
+static int plane_init(PySpicePlane *self, PyObject *args, PyObject *kwds)
 {
-    PyObject *py_obj = NULL;
+    static char *kwlist[] = {"normal", "constant", NULL};
+    PyObject *normal = NULL;
+
+    if(!PyArg_ParseTupleAndKeywords(args, kwds, "|Od:Plane", kwlist,
+                                    &normal, &self->plane.constant)) {
+        return -1;
+    }
+
+    if(normal && normal != Py_None &&
+       set_struct_vector((PyObject *)self, normal, PLANE_OFFSET(normal)) < 0) {
+        return -1;
+    }
+
+    return 0;
+}
+
+static PyObject * plane_str(PySpicePlane *self)
+{
+    PyObject *format = NULL, *values = NULL, *result = NULL;
+
+    values = Py_BuildValue("(dddd)", self->plane.normal[0],
+                           self->plane.normal[1], self->plane.normal[2],
+                           self->plane.constant);
+    format = PyString_FromString("<Plane: normal=%s, %s, %s; constant=%s>");
+
+    if(values && format) {
+        result = PyString_Format(format, values);
+    }
+
+    Py_XDECREF(format);
+    Py_XDECREF(values);
+
+    return result;
+}
+
+static PyObject * plane_get_constant(PySpicePlane *self, void *closure)
+{
+    return PyFloat_FromDouble(self->plane.constant);
+}
+
+static int plane_set_constant(PySpicePlane *self, PyObject *value, void *closure)
+{
+    double constant = 0.0;
+
+    if(!value) {
+        PyErr_SetString(PyExc_TypeError, "cannot delete this attribute");
+        return -1;
+    }
+
+    if(!get_spice_double(value, &constant)) {
+        return -1;
+    }
+
+    self->plane.constant = constant;
+
+    return 0;
+}
+
+static PyObject * plane_reduce(PySpicePlane *self)
+{
+    return Py_BuildValue("(O(Nd))", Py_TYPE(self),
+                         get_double_list(self->plane.normal, 3),
+                         self->plane.constant);
+}
+
+static PyMethodDef plane_methods[] = {
+    {"__reduce__", (PyCFunction)plane_reduce, METH_NOARGS, NULL},
+    {NULL}
+};
+
+static PyGetSetDef plane_getset[] = {
+    {"normal", get_struct_vector, set_struct_vector,
+     "Unit normal vector of the plane.", PLANE_OFFSET(normal)},
+    {"constant", (getter)plane_get_constant, (setter)plane_set_constant,
+     "Plane constant.", NULL},
+    {NULL}
+};
+
+PyTypeObject PySpicePlane_Type = {
+    PyVarObject_HEAD_INIT(NULL, 0)
+    "spice.Plane",                      /* tp_name */
+    sizeof(PySpicePlane),               /* tp_basicsize */
+    0,                                  /* tp_itemsize */
+    0,                                  /* tp_dealloc */
+    0,                                  /* tp_print */
+    0,                                  /* tp_getattr */
+    0,                                  /* tp_setattr */
+    0,                                  /* tp_compare */
+    0,                                  /* tp_repr */
+    0,                                  /* tp_as_number */
+    0,                                  /* tp_as_sequence */
+    0,                                  /* tp_as_mapping */
+    0,                                  /* tp_hash */
+    0,                                  /* tp_call */
+    (reprfunc)plane_str,                /* tp_str */
+    0,                                  /* tp_getattro */
+    0,                                  /* tp_setattro */
+    0,                                  /* tp_as_buffer */
+    Py_TPFLAGS_DEFAULT | Py_TPFLAGS_BASETYPE, /* tp_flags */
+    "Plane(normal=None, constant=0.0)\n\n"
+    "Class representing the C struct SpicePlane", /* tp_doc */
+    0,                                  /* tp_traverse */
+    0,                                  /* tp_clear */
+    0,                                  /* tp_richcompare */
+    0,                                  /* tp_weaklistoffset */
+    0,                                  /* tp_iter */
+    0,                                  /* tp_iternext */
+    plane_methods,                      /* tp_methods */
+    0,                                  /* tp_members */
+    plane_getset,                       /* tp_getset */
+    0,                                  /* tp_base */
+    0,                                  /* tp_dict */
+    0,                                  /* tp_descr_get */
+    0,                                  /* tp_descr_set */
+    0,                                  /* tp_dictoffset */
+    (initproc)plane_init,               /* tp_init */
+    0,                                  /* tp_alloc */
+    PyType_GenericNew,                  /* tp_new */
+};
+
+/**
+ * Create a Python Ellipse object from a SpiceEllipse object
+ */
+PyObject * get_py_ellipse(SpiceEllipse *spice_obj)
+{
+    PyObject *py_obj = PySpiceEllipse_Type.tp_alloc(&PySpiceEllipse_Type, 0);
+
+    if(py_obj) {
+        ((PySpiceEllipse *)py_obj)->ellipse = *spice_obj;
+    }
+
     return py_obj;
 }
 
+/**
+ * Create a Python Plane object from a SpicePlane object
+ */
 PyObject * get_py_plane(SpicePlane *spice_obj)
 {
-    PyObject *py_obj = NULL;
-    PyObject *module = PyImport_ImportModule("spice");
+    PyObject *py_obj = PySpicePlane_Type.tp_alloc(&PySpicePlane_Type, 0);
 
-    if(module) {
-        PyObject *py_cls = PyObject_GetAttrString(module, "Plane");
+    if(py_obj) {
+        ((PySpicePlane *)py_obj)->plane = *spice_obj;
+    }
 
-        if(py_cls) {
-            py_obj = PyObject_CallObject(py_cls, NULL);
+    return py_obj;
+}
 
-            if(py_obj) {
-                PyObject_SetAttrString(py_obj, "constant", PyFloat_FromDouble(spice_obj->constant));
-                PyObject_SetAttrString(py_obj, "normal", get_double_list(spice_obj->normal, 3));
-            }
-        }
+/**
+ * Get the SpiceEllipse stored in an Ellipse object.  The pointer is only
+ * valid as long as the object is alive.
+ */
+SpiceEllipse * get_spice_ellipse(PyObject *py_obj)
+{
+    if(!PyObject_TypeCheck(py_obj, &PySpiceEllipse_Type)) {
+        PyErr_Format(PyExc_TypeError, "expected an Ellipse, got %.200s",
+                     Py_TYPE(py_obj)->tp_name);
+        return NULL;
     }
 
-    return py_obj;
+    return &((PySpiceEllipse *)py_obj)->ellipse;
+}
+
+/**
+ * Get the SpicePlane stored in a Plane object.  The pointer is only valid
+ * as long as the object is alive.
+ */
+SpicePlane * get_spice_plane(PyObject *py_obj)
+{
+    if(!PyObject_TypeCheck(py_obj, &PySpicePlane_Type)) {
+        PyErr_Format(PyExc_TypeError, "expected a Plane, got %.200s",
+                     Py_TYPE(py_obj)->tp_name);
+        return NULL;
+    }
+
+    return &((PySpicePlane *)py_obj)->plane;
 }
 
+PyObject * get_py_ekattdsc(SpiceEKAttDsc *spice_obj)
+{
+    PyObject *py_obj = NULL;
+    return py_obj;
+}
 
-SpiceCell * get_spice_cell(PyObject *py_obj)
+PyObject * get_py_eksegsum(SpiceEKSegSum *spice_obj)
 {
-    SpiceCell *spice_obj = NULL;
-    return spice_obj;
+    PyObject *py_obj = NULL;
+    return py_obj;
 }
 
 SpiceEKAttDsc * get_spice_ekattdsc(PyObject *py_obj)
@@ -123,94 +404,1526 @@ SpiceEKSegSum * get_spice_eksegsum(PyObject *py_obj)
     return spice_obj;
 }
 
-SpicePlane * get_spice_plane(PyObject *py_obj)
+/**
+ * SpiceArray implementation
+ */
+
+/* keep the inline data of a SpiceArray aligned for doubles */
+#define SPICEARRAY_BASICSIZE ((sizeof(PySpiceArray) + 15) & ~((size_t)15))
+
+static Py_ssize_t get_array_count(int ndim, const Py_ssize_t *shape)
+{
+    int i = 0;
+    Py_ssize_t count = 1;
+
+    for(i = 0; i < ndim; ++ i) {
+        count *= shape[i];
+    }
+
+    return count;
+}
+
+static PyObject * make_py_array(PyObject *base, char *data, const char *format,
+                                Py_ssize_t itemsize, int ndim,
+                                const Py_ssize_t *shape)
 {
-    SpicePlane *spice_obj = malloc(sizeof(SpicePlane));
+    int i = 0;
+    Py_ssize_t count = get_array_count(ndim, shape);
+    Py_ssize_t inline_size = base ? 0 : count * itemsize;
+    PySpiceArray *array = NULL;
 
-    PyObject *l = NULL, *f = NULL;
+    if(ndim < 1 || ndim > PYSPICE_ARRAY_MAXDIM) {
+        PyErr_SetString(PyExc_ValueError, "unsupported number of dimensions");
+        return NULL;
+    }
 
-    /* set the constant variable in the spice_obj */
-    f = PyObject_GetAttrString(py_obj, "constant");
-    spice_obj->constant = PyFloat_AsDouble(f);
+    array = PyObject_NewVar(PySpiceArray, &PySpiceArray_Type, inline_size);
 
-    /* now set each element in the normal array */
-    l = PyObject_GetAttrString(py_obj, "normal");
+    if(!array) {
+        return NULL;
+    }
 
-    f = PyList_GetItem(l, 0);
-    spice_obj->normal[0] = PyFloat_AsDouble(f);
+    if(base) {
+        Py_INCREF(base);
+        array->data = data;
+    } else {
+        array->data = ((char *)array) + SPICEARRAY_BASICSIZE;
+    }
 
-    f = PyList_GetItem(l, 1);
-    spice_obj->normal[1] = PyFloat_AsDouble(f);
+    array->base = base;
+    array->ndim = ndim;
+    array->itemsize = itemsize;
 
-    f = PyList_GetItem(l, 2);
-    spice_obj->normal[2] = PyFloat_AsDouble(f);
+    strncpy(array->format, format, PYSPICE_FORMAT_LEN - 1);
+    array->format[PYSPICE_FORMAT_LEN - 1] = '\0';
 
-    return spice_obj;
+    for(i = ndim - 1; i >= 0; -- i) {
+        array->shape[i] = shape[i];
+        array->strides[i] = (i == ndim - 1) ? itemsize : array->strides[i + 1] * shape[i + 1];
+    }
+
+    return (PyObject *)array;
 }
 
-SpiceEllipse * get_spice_ellipse(PyObject *ellipse)
+/**
+ * Create a new SpiceArray of the given shape.  The contents are left
+ * uninitialized for the caller to fill in through PYSPICE_ARRAY_DATA.
+ */
+PyObject * new_py_array(const char *format, Py_ssize_t itemsize, int ndim,
+                        const Py_ssize_t *shape)
 {
-    char failed = 0, *sections[3] = {"center", "semi_major", "semi_minor"};
-    int i, j;
+    return make_py_array(NULL, NULL, format, itemsize, ndim, shape);
+}
 
-    SpiceEllipse *spice_ellipse = malloc(sizeof(SpiceEllipse));
+/**
+ * Convert a single array element at ptr to a Python object
+ */
+static PyObject * get_py_value(const char *format, Py_ssize_t itemsize, const char *ptr)
+{
+    char code = format[strlen(format) - 1];
 
-    double *ellipse_sections[3] = {spice_ellipse->center, spice_ellipse->semiMajor, spice_ellipse->semiMinor};
+    switch(code) {
+    case 'd':
+        return PyFloat_FromDouble(*(double *)ptr);
+    case '?':
+        return PyBool_FromLong(*ptr);
+    case 'i':
+        return PyInt_FromLong(*(int *)ptr);
+    case 'l':
+        return PyInt_FromLong(*(long *)ptr);
+    case 'q':
+        return PyLong_FromLongLong(*(PY_LONG_LONG *)ptr);
+    case 's': {
+        const char *end = memchr(ptr, '\0', itemsize);
+        return PyString_FromStringAndSize(ptr, end ? end - ptr : itemsize);
+    }
+    default:
+        PyErr_Format(PyExc_TypeError, "unsupported format '%s'", format);
+        return NULL;
+    }
+}
 
-    for(i = 0; i < 3; ++ i) {
-        PyObject *section = PyObject_GetAttrString(ellipse, sections[i]);
+/**
+ * Build (nested) tuples out of the C ordered array at data
+ */
+static PyObject * get_value_tuple(const char *data, const char *format,
+                                  Py_ssize_t itemsize, int ndim,
+                                  const Py_ssize_t *shape)
+{
+    Py_ssize_t i = 0, stride = itemsize * get_array_count(ndim - 1, shape + 1);
+    PyObject *tuple = PyTuple_New(shape[0]);
 
-        if(section) {
-            for(j = 0; j < 3; ++ j) {
-                ellipse_sections[i][j] = PyFloat_AS_DOUBLE(PyList_GET_ITEM(section, j));
-            }
+    if(!tuple) {
+        return NULL;
+    }
+
+    for(i = 0; i < shape[0]; ++ i) {
+        PyObject *item = NULL;
+
+        if(ndim == 1) {
+            item = get_py_value(format, itemsize, data + i * stride);
         } else {
-            failed = 1;
-            break;
+            item = get_value_tuple(data + i * stride, format, itemsize, ndim - 1, shape + 1);
+        }
+
+        if(!item) {
+            Py_DECREF(tuple);
+            return NULL;
         }
+
+        PyTuple_SET_ITEM(tuple, i, item);
+    }
+
+    return tuple;
+}
+
+/**
+ * Create a Python object for an array result of a SPICE function.  By
+ * default the result is a tuple (of tuples for 2D arrays); when array
+ * returns are turned on with set_array_returns() it is a SpiceArray copy of
+ * the data, which costs a single allocation regardless of its size.
+ */
+PyObject * get_py_array(const void *data, const char *format,
+                        Py_ssize_t itemsize, int ndim, const Py_ssize_t *shape)
+{
+    PyObject *array = NULL;
+
+    if(!pyspice_array_returns) {
+        return get_value_tuple((const char *)data, format, itemsize, ndim, shape);
     }
 
-    if(failed) {
-        free(spice_ellipse);
-        spice_ellipse = NULL;
+    array = new_py_array(format, itemsize, ndim, shape);
+
+    if(array) {
+        memcpy(PYSPICE_ARRAY_DATA(array), data, get_array_count(ndim, shape) * itemsize);
     }
 
-    return spice_ellipse;
+    return array;
 }
 
-PyObject * spice_berto(PyObject *self, PyObject *args)
+static void spicearray_dealloc(PySpiceArray *self)
 {
-    PyObject *py_ellipse = NULL;
+    Py_XDECREF(self->base);
+    PyObject_Del(self);
+}
 
-    PYSPICE_CHECK_RETURN_STATUS(PyArg_ParseTuple(args, "O", &py_ellipse));
+static Py_ssize_t spicearray_length(PySpiceArray *self)
+{
+    return self->shape[0];
+}
 
-    SpiceEllipse *spice_ellipse = get_spice_ellipse(py_ellipse);
+static PyObject * spicearray_item(PySpiceArray *self, Py_ssize_t i)
+{
+    char *ptr = NULL;
 
-    char *sections[3] = {"center", "semi_major", "semi_minor"};
-    double *ellipse_sections[3] = {spice_ellipse->center, spice_ellipse->semiMajor, spice_ellipse->semiMinor};
-    int i = 0, j = 0;
+    if(i < 0 || i >= self->shape[0]) {
+        PyErr_SetString(PyExc_IndexError, "SpiceArray index out of range");
+        return NULL;
+    }
 
-    for(i = 0; i < 3; ++ i) {
-        for(j = 0; j < 3; ++ j) {
-            printf ("%s[%d] = %f\n", sections[i], j, ellipse_sections[i][j]);
+    ptr = self->data + i * self->strides[0];
+
+    if(self->ndim == 1) {
+        return get_py_value(self->format, self->itemsize, ptr);
+    }
+
+    /* rows of a multi-dimensional array are views sharing the memory */
+    return make_py_array(self->base ? self->base : (PyObject *)self, ptr,
+                         self->format, self->itemsize, self->ndim - 1,
+                         self->shape + 1);
+}
+
+static PyObject * get_array_list(PySpiceArray *self, int dim, char *ptr)
+{
+    Py_ssize_t i = 0;
+    PyObject *list = PyList_New(self->shape[dim]);
+
+    if(!list) {
+        return NULL;
+    }
+
+    for(i = 0; i < self->shape[dim]; ++ i) {
+        PyObject *item = NULL;
+
+        if(dim == self->ndim - 1) {
+            item = get_py_value(self->format, self->itemsize, ptr + i * self->strides[dim]);
+        } else {
+            item = get_array_list(self, dim + 1, ptr + i * self->strides[dim]);
+        }
+
+        if(!item) {
+            Py_DECREF(list);
+            return NULL;
+        }
+
+        PyList_SET_ITEM(list, i, item);
+    }
+
+    return list;
+}
+
+static PyObject * spicearray_tolist(PySpiceArray *self)
+{
+    return get_array_list(self, 0, self->data);
+}
+
+static PyObject * spicearray_copy(PySpiceArray *self)
+{
+    PyObject *copy = new_py_array(self->format, self->itemsize, self->ndim, self->shape);
+
+    if(copy) {
+        memcpy(PYSPICE_ARRAY_DATA(copy), self->data,
+               get_array_count(self->ndim, self->shape) * self->itemsize);
+    }
+
+    return copy;
+}
+
+static PyObject * spicearray_repr(PySpiceArray *self)
+{
+    PyObject *list = NULL, *list_repr = NULL, *repr = NULL;
+
+    list = spicearray_tolist(self);
+
+    if(list) {
+        list_repr = PyObject_Repr(list);
+
+        if(list_repr) {
+            repr = PyString_FromFormat("SpiceArray(%s)", PyString_AS_STRING(list_repr));
+            Py_DECREF(list_repr);
+        }
+
+        Py_DECREF(list);
+    }
+
+    return repr;
+}
+
+static PyObject * spicearray_get_shape(PySpiceArray *self, void *closure)
+{
+    int i = 0;
+    PyObject *shape = PyTuple_New(self->ndim);
+
+    if(shape) {
+        for(i = 0; i < self->ndim; ++ i) {
+            PyTuple_SET_ITEM(shape, i, PyInt_FromSsize_t(self->shape[i]));
         }
     }
 
-    spice_ellipse->center[0] = 1;
-    spice_ellipse->center[1] = 2;
-    spice_ellipse->center[2] = 3;
-    spice_ellipse->semiMajor[0] = 4;
-    spice_ellipse->semiMajor[1] = 5;
-    spice_ellipse->semiMajor[2] = 6;
-    spice_ellipse->semiMinor[0] = 7;
-    spice_ellipse->semiMinor[1] = 8;
-    spice_ellipse->semiMinor[2] = 9;
+    return shape;
+}
+
+static PyObject * spicearray_get_ndim(PySpiceArray *self, void *closure)
+{
+    return PyInt_FromLong(self->ndim);
+}
+
+static int spicearray_getbuffer(PySpiceArray *self, Py_buffer *view, int flags)
+{
+    view->buf = self->data;
+    view->obj = (PyObject *)self;
+    view->len = get_array_count(self->ndim, self->shape) * self->itemsize;
+    view->readonly = 0;
+    view->itemsize = self->itemsize;
+    view->format = (flags & PyBUF_FORMAT) ? self->format : NULL;
+    view->ndim = self->ndim;
+    view->shape = (flags & PyBUF_ND) ? self->shape : NULL;
+    view->strides = ((flags & PyBUF_STRIDES) == PyBUF_STRIDES) ? self->strides : NULL;
+    view->suboffsets = NULL;
+    view->internal = NULL;
+
+    Py_INCREF(self);
+
+    return 0;
+}
+
+static PySequenceMethods spicearray_as_sequence = {
+    (lenfunc)spicearray_length,         /* sq_length */
+    0,                                  /* sq_concat */
+    0,                                  /* sq_repeat */
+    (ssizeargfunc)spicearray_item,      /* sq_item */
+};
+
+static PyBufferProcs spicearray_as_buffer = {
+    0, 0, 0, 0,
+    (getbufferproc)spicearray_getbuffer,
+    0,
+};
+
+static PyMethodDef spicearray_methods[] = {
+    {"tolist", (PyCFunction)spicearray_tolist, METH_NOARGS,
+     "Return the contents of the array as (nested) lists."},
+    {"copy", (PyCFunction)spicearray_copy, METH_NOARGS,
+     "Return a copy of the array holding its own data."},
+    {NULL, NULL},
+};
+
+static PyGetSetDef spicearray_getset[] = {
+    {"shape", (getter)spicearray_get_shape, NULL, "Tuple of array dimensions.", NULL},
+    {"ndim", (getter)spicearray_get_ndim, NULL, "Number of array dimensions.", NULL},
+    {NULL},
+};
+
+PyTypeObject PySpiceArray_Type = {
+    PyVarObject_HEAD_INIT(NULL, 0)
+    "_spice.SpiceArray",                /* tp_name */
+    SPICEARRAY_BASICSIZE,               /* tp_basicsize */
+    1,                                  /* tp_itemsize */
+    (destructor)spicearray_dealloc,     /* tp_dealloc */
+    0,                                  /* tp_print */
+    0,                                  /* tp_getattr */
+    0,                                  /* tp_setattr */
+    0,                                  /* tp_compare */
+    (reprfunc)spicearray_repr,          /* tp_repr */
+    0,                                  /* tp_as_number */
+    &spicearray_as_sequence,            /* tp_as_sequence */
+    0,                                  /* tp_as_mapping */
+    0,                                  /* tp_hash */
+    0,                                  /* tp_call */
+    0,                                  /* tp_str */
+    0,                                  /* tp_getattro */
+    0,                                  /* tp_setattro */
+    &spicearray_as_buffer,              /* tp_as_buffer */
+    Py_TPFLAGS_DEFAULT | Py_TPFLAGS_HAVE_NEWBUFFER, /* tp_flags */
+    "Contiguous array of SPICE values supporting the buffer protocol.", /* tp_doc */
+    0,                                  /* tp_traverse */
+    0,                                  /* tp_clear */
+    0,                                  /* tp_richcompare */
+    0,                                  /* tp_weaklistoffset */
+    0,                                  /* tp_iter */
+    0,                                  /* tp_iternext */
+    spicearray_methods,                 /* tp_methods */
+    0,                                  /* tp_members */
+    spicearray_getset,                  /* tp_getset */
+};
+
+/**
+ * Cell implementation
+ *
+ * A Cell holds a SpiceCell and the memory for its control area and
+ * elements in a single block, laid out like the arrays declared by the
+ * SPICE*_CELL macros.  CSPICE works on that memory directly and the
+ * elements are exposed to Python as SpiceArray views of it.  The size of a
+ * cell is fixed when it is created.
+ */
+
+/* keep the inline data of a Cell aligned for doubles */
+#define SPICECELL_BASICSIZE ((sizeof(PySpiceCell) + 15) & ~((size_t)15))
+
+#define PYSPICE_CELL_DATA(op) (((char *)(op)) + SPICECELL_BASICSIZE)
 
-    py_ellipse = get_py_ellipse(spice_ellipse);
+/* names of the cell types, indexed by SpiceCellDataType */
+static const char *cell_type_names[] = {"SPICE_CHR", "SPICE_DP", "SPICE_INT"};
+
+/**
+ * Get the size in bytes of one element of a cell
+ */
+static Py_ssize_t get_cell_itemsize(SpiceCellDataType dtype, SpiceInt length)
+{
+    switch(dtype) {
+    case SPICE_CHR:
+        return length;
+    case SPICE_DP:
+        return sizeof(SpiceDouble);
+    case SPICE_INT:
+        return sizeof(SpiceInt);
+    default:
+        return 0;
+    }
+}
+
+static void get_cell_format(PySpiceCell *self, char *format)
+{
+    switch(self->cell.dtype) {
+    case SPICE_CHR:
+        PyOS_snprintf(format, PYSPICE_FORMAT_LEN, "%lds", (long)self->cell.length);
+        break;
+    case SPICE_DP:
+        strcpy(format, "d");
+        break;
+    default:
+        strcpy(format, PYSPICE_INT_FORMAT(SpiceInt));
+        break;
+    }
+}
+
+static PySpiceCell * make_py_cell(PyTypeObject *type, SpiceCellDataType dtype,
+                                  SpiceInt size, SpiceInt length)
+{
+    Py_ssize_t itemsize = 0;
+    PySpiceCell *self = NULL;
+
+    if(dtype == SPICE_CHR) {
+        if(length < 2) {
+            PyErr_SetString(PyExc_ValueError,
+                            "the length of a character cell must be at least 2");
+            return NULL;
+        }
+    } else if(dtype == SPICE_DP || dtype == SPICE_INT) {
+        length = 0;
+    } else {
+        PyErr_SetString(PyExc_ValueError,
+                        "the cell type must be SPICE_CHR, SPICE_DP or SPICE_INT");
+        return NULL;
+    }
+
+    if(size < 0) {
+        PyErr_SetString(PyExc_ValueError, "the size of a cell must not be negative");
+        return NULL;
+    }
+
+    itemsize = get_cell_itemsize(dtype, length);
+
+    if(size > (PY_SSIZE_T_MAX - SPICECELL_BASICSIZE) / itemsize - SPICE_CELL_CTRLSZ) {
+        PyErr_NoMemory();
+        return NULL;
+    }
+
+    /* tp_alloc clears the memory; CSPICE sets up the control area */
+    self = (PySpiceCell *)type->tp_alloc(
+        type, SPICECELL_BASICSIZE - type->tp_basicsize +
+        (SPICE_CELL_CTRLSZ + size) * itemsize);
+
+    if(!self) {
+        return NULL;
+    }
+
+    self->capacity = size;
+    self->cell.dtype = dtype;
+    self->cell.length = length;
+    self->cell.size = size;
+    self->cell.card = 0;
+    self->cell.isSet = SPICETRUE;
+    self->cell.adjust = SPICEFALSE;
+    self->cell.init = SPICEFALSE;
+    self->cell.base = PYSPICE_CELL_DATA(self);
+    self->cell.data = PYSPICE_CELL_DATA(self) + SPICE_CELL_CTRLSZ * itemsize;
+
+    return self;
+}
+
+static PyObject * spicecell_new(PyTypeObject *type, PyObject *args, PyObject *kwds)
+{
+    static char *kwlist[] = {"dtype", "size", "length", NULL};
+    int dtype = 0;
+    long size = 0, length = 0;
+
+    if(!PyArg_ParseTupleAndKeywords(args, kwds, "il|l:Cell", kwlist,
+                                    &dtype, &size, &length)) {
+        return NULL;
+    }
+
+    return (PyObject *)make_py_cell(type, dtype, size, length);
+}
+
+static PyObject * spicecell_double(PyTypeObject *type, PyObject *args)
+{
+    long size = 0;
+
+    PYSPICE_CHECK_RETURN_STATUS(PyArg_ParseTuple(args, "l:double", &size));
+
+    return (PyObject *)make_py_cell(type, SPICE_DP, size, 0);
+}
+
+static PyObject * spicecell_int(PyTypeObject *type, PyObject *args)
+{
+    long size = 0;
+
+    PYSPICE_CHECK_RETURN_STATUS(PyArg_ParseTuple(args, "l:int", &size));
+
+    return (PyObject *)make_py_cell(type, SPICE_INT, size, 0);
+}
+
+static PyObject * spicecell_char(PyTypeObject *type, PyObject *args)
+{
+    long size = 0, length = 0;
+
+    PYSPICE_CHECK_RETURN_STATUS(PyArg_ParseTuple(args, "ll:char", &size, &length));
+
+    return (PyObject *)make_py_cell(type, SPICE_CHR, size, length);
+}
+
+static Py_ssize_t spicecell_length(PySpiceCell *self)
+{
+    return self->cell.card;
+}
+
+static PyObject * spicecell_item(PySpiceCell *self, Py_ssize_t i)
+{
+    char format[PYSPICE_FORMAT_LEN];
+    Py_ssize_t itemsize = get_cell_itemsize(self->cell.dtype, self->cell.length);
+
+    if(i < 0 || i >= self->cell.card) {
+        PyErr_SetString(PyExc_IndexError, "Cell index out of range");
+        return NULL;
+    }
+
+    get_cell_format(self, format);
+
+    return get_py_value(format, itemsize, (char *)self->cell.data + i * itemsize);
+}
+
+static PyObject * spicecell_repr(PySpiceCell *self)
+{
+    return PyString_FromFormat("<Cell %s: size = %ld, card = %ld>",
+                               cell_type_names[self->cell.dtype], (long)self->cell.size,
+                               (long)self->cell.card);
+}
+
+/**
+ * Get a SpiceArray sharing the memory of the elements in the cell
+ */
+static PyObject * spicecell_get_data(PySpiceCell *self, void *closure)
+{
+    char format[PYSPICE_FORMAT_LEN];
+    Py_ssize_t shape[1] = {self->cell.card};
+
+    get_cell_format(self, format);
+
+    return make_py_array((PyObject *)self, self->cell.data, format,
+                         get_cell_itemsize(self->cell.dtype, self->cell.length),
+                         1, shape);
+}
+
+/**
+ * Get a SpiceArray of (left, right) rows sharing the memory of a window
+ */
+static PyObject * spicecell_get_intervals(PySpiceCell *self, void *closure)
+{
+    Py_ssize_t shape[2] = {self->cell.card / 2, 2};
+
+    if(self->cell.dtype != SPICE_DP) {
+        PyErr_SetString(PyExc_TypeError, "only double precision cells are windows");
+        return NULL;
+    }
+
+    return make_py_array((PyObject *)self, self->cell.data, "d",
+                         sizeof(SpiceDouble), 2, shape);
+}
+
+static PyObject * spicecell_get_int(PySpiceCell *self, void *closure)
+{
+    return PyInt_FromLong(*(SpiceInt *)((char *)self + (size_t)closure));
+}
+
+static PyObject * spicecell_get_dtype(PySpiceCell *self, void *closure)
+{
+    return PyInt_FromLong(self->cell.dtype);
+}
+
+static PyObject * spicecell_get_is_set(PySpiceCell *self, void *closure)
+{
+    return PyBool_FromLong(self->cell.isSet);
+}
+
+#define CELL_OFFSET(member) \
+    ((void *)(offsetof(PySpiceCell, cell) + offsetof(SpiceCell, member)))
+
+static PySequenceMethods spicecell_as_sequence = {
+    (lenfunc)spicecell_length,          /* sq_length */
+    0,                                  /* sq_concat */
+    0,                                  /* sq_repeat */
+    (ssizeargfunc)spicecell_item,       /* sq_item */
+};
+
+static PyMethodDef spicecell_methods[] = {
+    {"double", (PyCFunction)spicecell_double, METH_VARARGS | METH_CLASS,
+     "double(size) -> Cell\n\nCreate a double precision cell, e.g. a window."},
+    {"int", (PyCFunction)spicecell_int, METH_VARARGS | METH_CLASS,
+     "int(size) -> Cell\n\nCreate an integer cell."},
+    {"char", (PyCFunction)spicecell_char, METH_VARARGS | METH_CLASS,
+     "char(size, length) -> Cell\n\n"
+     "Create a character cell holding strings of up to length - 1 characters."},
+    {NULL, NULL},
+};
+
+static PyGetSetDef spicecell_getset[] = {
+    {"dtype", (getter)spicecell_get_dtype, NULL,
+     "Type of the elements: SPICE_CHR, SPICE_DP or SPICE_INT.", NULL},
+    {"length", (getter)spicecell_get_int, NULL,
+     "Length of the strings in a character cell.", CELL_OFFSET(length)},
+    {"size", (getter)spicecell_get_int, NULL,
+     "Maximum number of elements.", CELL_OFFSET(size)},
+    {"card", (getter)spicecell_get_int, NULL,
+     "Number of elements in the cell.", CELL_OFFSET(card)},
+    {"isSet", (getter)spicecell_get_is_set, NULL,
+     "Whether the cell is a SPICE set.", NULL},
+    {"data", (getter)spicecell_get_data, NULL,
+     "SpiceArray view of the elements in the cell.", NULL},
+    {"intervals", (getter)spicecell_get_intervals, NULL,
+     "SpiceArray view of the (left, right) intervals in a window.", NULL},
+    {NULL},
+};
+
+PyTypeObject PySpiceCell_Type = {
+    PyVarObject_HEAD_INIT(NULL, 0)
+    "spice.Cell",                       /* tp_name */
+    sizeof(PySpiceCell),                /* tp_basicsize */
+    1,                                  /* tp_itemsize */
+    0,                                  /* tp_dealloc */
+    0,                                  /* tp_print */
+    0,                                  /* tp_getattr */
+    0,                                  /* tp_setattr */
+    0,                                  /* tp_compare */
+    (reprfunc)spicecell_repr,           /* tp_repr */
+    0,                                  /* tp_as_number */
+    &spicecell_as_sequence,             /* tp_as_sequence */
+    0,                                  /* tp_as_mapping */
+    0,                                  /* tp_hash */
+    0,                                  /* tp_call */
+    0,                                  /* tp_str */
+    0,                                  /* tp_getattro */
+    0,                                  /* tp_setattro */
+    0,                                  /* tp_as_buffer */
+    Py_TPFLAGS_DEFAULT,                 /* tp_flags */
+    "Cell(dtype, size, length=0)\n\n"
+    "SPICE cell holding up to size elements of type dtype (Cell.SPICE_CHR,\n"
+    "Cell.SPICE_DP or Cell.SPICE_INT).  length is the string length for\n"
+    "character cells.  Cells are passed to the wrapped functions, which\n"
+    "update them in place.", /* tp_doc */
+    0,                                  /* tp_traverse */
+    0,                                  /* tp_clear */
+    0,                                  /* tp_richcompare */
+    0,                                  /* tp_weaklistoffset */
+    0,                                  /* tp_iter */
+    0,                                  /* tp_iternext */
+    spicecell_methods,                  /* tp_methods */
+    0,                                  /* tp_members */
+    spicecell_getset,                   /* tp_getset */
+    0,                                  /* tp_base */
+    0,                                  /* tp_dict */
+    0,                                  /* tp_descr_get */
+    0,                                  /* tp_descr_set */
+    0,                                  /* tp_dictoffset */
+    0,                                  /* tp_init */
+    0,                                  /* tp_alloc */
+    spicecell_new,                      /* tp_new */
+};
+
+/**
+ * Create a Python Cell holding a copy of a SpiceCell
+ */
+PyObject * get_py_cell(SpiceCell *cell)
+{
+    PySpiceCell *self = make_py_cell(&PySpiceCell_Type, cell->dtype,
+                                     cell->size, cell->length);
+
+    if(self) {
+        memcpy(self->cell.base, cell->base,
+               (SPICE_CELL_CTRLSZ + cell->size) *
+               get_cell_itemsize(cell->dtype, cell->length));
+
+        self->cell.card = cell->card;
+        self->cell.isSet = cell->isSet;
+        self->cell.adjust = cell->adjust;
+        self->cell.init = cell->init;
+    }
+
+    return (PyObject *)self;
+}
+
+/**
+ * Get the SpiceCell stored in a Cell object.  The pointer is only valid as
+ * long as the object is alive.
+ */
+SpiceCell * get_spice_cell(PyObject *py_obj)
+{
+    if(!PyObject_TypeCheck(py_obj, &PySpiceCell_Type)) {
+        PyErr_Format(PyExc_TypeError, "expected a Cell, got %.200s",
+                     Py_TYPE(py_obj)->tp_name);
+        return NULL;
+    }
+
+    return &((PySpiceCell *)py_obj)->cell;
+}
+
+/**
+ * Make sure a cell passed to a function setting its size (e.g. ssize_c) has
+ * room for size elements
+ */
+int check_spice_cell_size(SpiceCell *cell, long size)
+{
+    PySpiceCell *self = (PySpiceCell *)((char *)cell - offsetof(PySpiceCell, cell));
+
+    if(size > self->capacity) {
+        PyErr_Format(PyExc_ValueError,
+                     "the size of the cell is limited to %ld elements",
+                     (long)self->capacity);
+        return 0;
+    }
+
+    return 1;
+}
+
+/**
+ * Check whether a buffer format string describes a single native value of
+ * the type given by code, e.g. "d" or "<d" on a little endian machine
+ */
+static int is_native_format(const char *format, const char *code)
+{
+    if(!format) {
+        return 0;
+    }
+
+    /* skip the byte order character if it matches the native order */
+    if(*format == '@' || *format == '=') {
+        ++ format;
+    } else if(*format == '<' || *format == '>') {
+        const int one = 1;
+        char little_endian = *(char *)&one;
+
+        if((*format == '<') != little_endian) {
+            return 0;
+        }
+
+        ++ format;
+    }
+
+    return strcmp(format, code) == 0;
+}
+
+/**
+ * Store a Python number at ptr as the C type described by format
+ */
+static int set_spice_value(PyObject *py_obj, const char *format, char *ptr)
+{
+    double d = 0.0;
+    long l = 0;
+
+    if(*format == 'd') {
+        d = PyFloat_AsDouble(py_obj);
+
+        if(d == -1.0 && PyErr_Occurred()) {
+            return 0;
+        }
+
+        *(double *)ptr = d;
+    } else {
+        l = PyInt_AsLong(py_obj);
+
+        if(l == -1 && PyErr_Occurred()) {
+            return 0;
+        }
+
+        if(*format == 'i') {
+            *(int *)ptr = (int)l;
+        } else if(*format == 'l') {
+            *(long *)ptr = l;
+        } else {
+            *(PY_LONG_LONG *)ptr = l;
+        }
+    }
+
+    return 1;
+}
+
+/**
+ * Copy (nested) sequences of numbers into the C ordered array at data
+ */
+static int get_sequence_values(PyObject *py_obj, char *data, const char *format,
+                               Py_ssize_t itemsize, int ndim,
+                               const Py_ssize_t *shape)
+{
+    int status = 1;
+    Py_ssize_t i = 0, stride = itemsize * get_array_count(ndim - 1, shape + 1);
+    PyObject *seq = PySequence_Fast(py_obj, "expected a sequence or buffer of numbers");
+
+    if(!seq) {
+        return 0;
+    }
+
+    if(PySequence_Fast_GET_SIZE(seq) != shape[0]) {
+        PyErr_Format(PyExc_ValueError, "expected a sequence of length %zd, got %zd",
+                     shape[0], PySequence_Fast_GET_SIZE(seq));
+        Py_DECREF(seq);
+        return 0;
+    }
+
+    for(i = 0; i < shape[0] && status; ++ i) {
+        PyObject *item = PySequence_Fast_GET_ITEM(seq, i);
+
+        if(ndim == 1) {
+            status = set_spice_value(item, format, data + i * stride);
+        } else {
+            status = get_sequence_values(item, data + i * stride, format, itemsize, ndim - 1, shape + 1);
+        }
+    }
+
+    Py_DECREF(seq);
+
+    return status;
+}
+
+/**
+ * Fill the fixed size C array at data from the given object.  A C
+ * contiguous buffer holding exactly the right number of values of the
+ * right type (a numpy array, SpiceArray, etc.) is copied with one memcpy;
+ * anything else is read as (nested) sequences of numbers.  Returns 1 on
+ * success and 0 with a Python exception set on failure.
+ */
+int get_spice_array(PyObject *py_obj, void *data, const char *format,
+                    Py_ssize_t itemsize, int ndim, const Py_ssize_t *shape)
+{
+    Py_buffer view;
+    Py_ssize_t len = get_array_count(ndim, shape) * itemsize;
+
+    if(PyObject_CheckBuffer(py_obj)) {
+        if(PyObject_GetBuffer(py_obj, &view, PyBUF_C_CONTIGUOUS | PyBUF_FORMAT) == 0) {
+            int i = 0, matches = is_native_format(view.format, format) &&
+                view.itemsize == itemsize && view.len == len;
+
+            /* multi-dimensional buffers must also have the same shape */
+            if(matches && view.ndim > 1) {
+                matches = view.ndim == ndim;
+
+                for(i = 0; matches && i < ndim; ++ i) {
+                    matches = view.shape[i] == shape[i];
+                }
+            }
+
+            if(matches) {
+                memcpy(data, view.buf, len);
+            }
+
+            PyBuffer_Release(&view);
+
+            if(matches) {
+                return 1;
+            }
+        } else {
+            PyErr_Clear();
+        }
+    }
+
+    return get_sequence_values(py_obj, (char *)data, format, itemsize, ndim, shape);
+}
+
+/**
+ * Append the numbers in a (nested) sequence to the memory of values, which
+ * grows as needed.  Nested sequences are flattened up to depth more
+ * levels; anything below that must be a number.
+ */
+static int read_sequence_doubles(PyObject *py_obj, PySpiceDoubles *values,
+                                 int depth)
+{
+    Py_ssize_t i = 0, size = 0;
+    PyObject *seq = PySequence_Fast(py_obj, "expected a sequence or buffer of floats");
+
+    if(!seq) {
+        return 0;
+    }
+
+    size = PySequence_Fast_GET_SIZE(seq);
+
+    for(i = 0; i < size; ++ i) {
+        PyObject *item = PySequence_Fast_GET_ITEM(seq, i);
+        double value = 0.0;
+
+        /*
+         * rows of a multi-dimensional array are flattened in C order.
+         * Strings are left out, a one character string is its own item.
+         */
+        if(depth > 0 && PySequence_Check(item) && !PyString_Check(item) &&
+           !PyUnicode_Check(item)) {
+            if(!read_sequence_doubles(item, values, depth - 1)) {
+                Py_DECREF(seq);
+                return 0;
+            }
+
+            continue;
+        }
+
+        value = PyFloat_AsDouble(item);
+
+        if(value == -1.0 && PyErr_Occurred()) {
+            Py_DECREF(seq);
+            return 0;
+        }
+
+        if(values->count == values->capacity) {
+            Py_ssize_t capacity = values->count + size - i;
+            double *data = NULL;
+
+            if(capacity < 2 * values->capacity) {
+                capacity = 2 * values->capacity;
+            }
+
+            data = (double *)realloc(values->data, sizeof(double) * capacity);
+
+            if(!data) {
+                Py_DECREF(seq);
+                PyErr_NoMemory();
+                return 0;
+            }
+
+            values->data = data;
+            values->capacity = capacity;
+        }
+
+        values->data[values->count ++] = value;
+    }
+
+    Py_DECREF(seq);
+
+    return 1;
+}
+
+/**
+ * Get a contiguous array of doubles from the given object.  C contiguous
+ * float64 buffers (numpy arrays, SpiceArray, etc.) are used in place; any
+ * other (nested) sequence of numbers is copied into temporary memory.
+ * Returns 1 on success and 0 with a Python exception set on failure.
+ */
+int get_spice_doubles(PyObject *py_obj, PySpiceDoubles *values)
+{
+    values->data = NULL;
+    values->count = 0;
+    values->capacity = 0;
+    values->has_view = 0;
+
+    if(PyObject_CheckBuffer(py_obj)) {
+        if(PyObject_GetBuffer(py_obj, &values->view, PyBUF_C_CONTIGUOUS | PyBUF_FORMAT) == 0) {
+            if(is_native_format(values->view.format, "d") && values->view.itemsize == sizeof(double)) {
+                values->data = (double *)values->view.buf;
+                values->count = values->view.len / sizeof(double);
+                values->has_view = 1;
+
+                return 1;
+            }
+
+            PyBuffer_Release(&values->view);
+        }
+
+        PyErr_Clear();
+    }
+
+    if(!read_sequence_doubles(py_obj, values, PYSPICE_ARRAY_MAXDIM - 1)) {
+        release_spice_doubles(values);
+        return 0;
+    }
+
+    return 1;
+}
+
+/**
+ * Get a contiguous array of records of row_size doubles, e.g. an (N, 6)
+ * array of states, like get_spice_doubles().  The number of records is
+ * stored in rows.
+ */
+int get_spice_rows(PyObject *py_obj, Py_ssize_t row_size, PySpiceDoubles *values,
+                   long *rows)
+{
+    if(!get_spice_doubles(py_obj, values)) {
+        return 0;
+    }
+
+    if(row_size < 1 || values->count % row_size) {
+        PyErr_Format(PyExc_ValueError,
+                     "expected records of %zd values, got %zd values in total",
+                     row_size, values->count);
+        release_spice_doubles(values);
+        return 0;
+    }
+
+    *rows = (long)(values->count / row_size);
+
+    return 1;
+}
+
+void release_spice_doubles(PySpiceDoubles *values)
+{
+    if(values->has_view) {
+        PyBuffer_Release(&values->view);
+    } else {
+        free(values->data);
+    }
+
+    values->data = NULL;
+    values->has_view = 0;
+}
+
+/**
+ * Copy a sequence of strings into a newly allocated array of count strings
+ * of length characters each, as taken by pcpool_c.  The length leaves room
+ * for the terminating NUL of the longest string.  The array has to be freed
+ * by the caller.
+ */
+int get_spice_strings(PyObject *py_obj, char **data, long *count, long *length)
+{
+    Py_ssize_t i = 0, size = 0, longest = 0;
+    char *value = NULL;
+    PyObject *seq = PySequence_Fast(py_obj, "expected a sequence of strings");
+
+    if(!seq) {
+        return 0;
+    }
+
+    size = PySequence_Fast_GET_SIZE(seq);
+
+    for(i = 0; i < size; ++ i) {
+        if(!get_spice_string(PySequence_Fast_GET_ITEM(seq, i), &value)) {
+            Py_DECREF(seq);
+            return 0;
+        }
+
+        if((Py_ssize_t)strlen(value) > longest) {
+            longest = strlen(value);
+        }
+    }
+
+    *data = calloc(size ? size : 1, longest + 1);
+
+    if(!*data) {
+        Py_DECREF(seq);
+        PyErr_NoMemory();
+        return 0;
+    }
+
+    for(i = 0; i < size; ++ i) {
+        get_spice_string(PySequence_Fast_GET_ITEM(seq, i), &value);
+        strcpy(*data + i * (longest + 1), value);
+    }
+
+    Py_DECREF(seq);
+
+    *count = (long)size;
+    *length = (long)(longest + 1);
+
+    return 1;
+}
+
+/**
+ * Ready the extension types and add them to the given module
+ */
+void init_pyspice_types(PyObject *module)
+{
+    static const SpiceCellDataType cell_types[] = {SPICE_CHR, SPICE_DP, SPICE_INT};
+    int i = 0;
+
+    if(PyType_Ready(&PySpiceArray_Type) < 0) {
+        return;
+    }
+
+    Py_INCREF(&PySpiceArray_Type);
+    PyModule_AddObject(module, "SpiceArray", (PyObject *)&PySpiceArray_Type);
+
+    if(PyType_Ready(&PySpiceEllipse_Type) < 0) {
+        return;
+    }
+
+    Py_INCREF(&PySpiceEllipse_Type);
+    PyModule_AddObject(module, "Ellipse", (PyObject *)&PySpiceEllipse_Type);
+
+    if(PyType_Ready(&PySpicePlane_Type) < 0) {
+        return;
+    }
+
+    Py_INCREF(&PySpicePlane_Type);
+    PyModule_AddObject(module, "Plane", (PyObject *)&PySpicePlane_Type);
+
+    if(PyType_Ready(&PySpiceCell_Type) < 0) {
+        return;
+    }
+
+    for(i = 0; i < 3; ++ i) {
+        PyObject *value = PyInt_FromLong(cell_types[i]);
+
+        if(!value) {
+            return;
+        }
+
+        PyDict_SetItemString(PySpiceCell_Type.tp_dict, cell_type_names[i], value);
+        Py_DECREF(value);
+    }
+
+    Py_INCREF(&PySpiceCell_Type);
+    PyModule_AddObject(module, "Cell", (PyObject *)&PySpiceCell_Type);
+}
+
+char set_array_returns_doc[] = PyDoc_STR(
+"set_array_returns(enabled) -> previous setting\n\n"
+"Choose how fixed size array results (e.g. the matrix from pxform or the\n"
+"state from spkezr) are returned.  By default they are tuples of floats.\n"
+"When enabled they are returned as SpiceArray objects holding the values\n"
+"in a single contiguous buffer; numpy.asarray() and memoryview() can use\n"
+"them without copying.");
+
+PyObject * spice_set_array_returns(PyObject *self, PyObject *args)
+{
+    int enabled = 0, previous = pyspice_array_returns;
+
+    PYSPICE_CHECK_RETURN_STATUS(PyArg_ParseTuple(args, "i", &enabled));
+
+    pyspice_array_returns = enabled;
+
+    return PyBool_FromLong(previous);
+}
+
+/**
+ * The details of the last PYSPICE_ERROR_HISTORY SPICE errors, copied
+ * before reset_c() clears them.  They are only turned into strings when an
+ * exception asks for them, see spice/errors.py.
+ */
+typedef struct {
+    unsigned long id;
+    char message[SPICE_DETAIL_LEN];
+    char trace[SPICE_TRACE_LEN];
+} PySpiceError;
+
+static PySpiceError error_history[PYSPICE_ERROR_HISTORY];
+static unsigned long error_count = 0;
+
+/* the SpiceException subclass of each short error message */
+static PyObject *error_classes = NULL;
+
+/**
+ * Return a borrowed reference to the class of the errors with the given
+ * short message, e.g. _spice.SPKINSUFFDATA for "SPICE(SPKINSUFFDATA)",
+ * creating it on first use.
+ */
+static PyObject * get_error_class(const char *short_message)
+{
+    char name[SPICE_SHORT_LEN + 8];
+    const char *start = strchr(short_message, '(');
+    const char *end = strrchr(short_message, ')');
+    PyObject *error_class = NULL;
+
+    if(!error_classes && !(error_classes = PyDict_New())) {
+        return NULL;
+    }
+
+    error_class = PyDict_GetItemString(error_classes, short_message);
+    if(error_class) {
+        return error_class;
+    }
+
+    if(!start || !end || end - start < 2 || end - start > SPICE_SHORT_LEN) {
+        return SpiceException;
+    }
+
+    PyOS_snprintf(name, sizeof(name), "_spice.%.*s", (int)(end - start - 1),
+                  start + 1);
+
+    error_class = PyErr_NewException(name, SpiceException, NULL);
+    if(!error_class) {
+        return NULL;
+    }
+
+    if(PyDict_SetItemString(error_classes, short_message, error_class)) {
+        Py_DECREF(error_class);
+        return NULL;
+    }
+
+    /* the dictionary keeps it alive */
+    Py_DECREF(error_class);
+
+    return error_class;
+}
+
+/**
+ * Set the Python exception for the current SPICE error and reset the
+ * error.  The exception is an instance of the class of the short message,
+ * with (short message, id) as arguments, the id leading to the details in
+ * error_history.
+ */
+void pyspice_set_error(void)
+{
+    char short_message[SPICE_SHORT_LEN];
+    PySpiceError *error = NULL;
+    PyObject *error_class = NULL, *args = NULL;
+
+    error_count ++;
+    error = error_history + error_count % PYSPICE_ERROR_HISTORY;
+    error->id = error_count;
+
+    getmsg_c("short", SPICE_SHORT_LEN, short_message);
+    getmsg_c("long", SPICE_DETAIL_LEN, error->message);
+    qcktrc_c(SPICE_TRACE_LEN, error->trace);
+
+    reset_c();
+
+    error_class = get_error_class(short_message);
+    if(!error_class) {
+        return;
+    }
+
+    args = Py_BuildValue("(sk)", short_message, error->id);
+    if(args) {
+        PyErr_SetObject(error_class, args);
+        Py_DECREF(args);
+    }
+}
+
+/**
+ * Record the SPICE error of element i of an array call made with
+ * errors="mask" in the mask and codes arrays, and reset it so the call
+ * goes on with the next element.  Unlike pyspice_set_error() the long
+ * message and the traceback are not kept.
+ */
+void pyspice_mask_error(PyObject *mask, PyObject *codes, Py_ssize_t i)
+{
+    PYSPICE_ARRAY_DATA(mask)[i] = 1;
+
+    getmsg_c("short", SPICE_SHORT_LEN,
+             PYSPICE_ARRAY_DATA(codes) + i * SPICE_SHORT_LEN);
+
+    reset_c();
+}
+
+/* return the class of the errors named "SPICE(NAME)" or "NAME" */
+PyObject * spice_error_class(PyObject *self, PyObject *args)
+{
+    char *name = NULL;
+    char short_message[SPICE_SHORT_LEN];
+    PyObject *error_class = NULL;
+
+    PYSPICE_CHECK_RETURN_STATUS(PyArg_ParseTuple(args, "s", &name));
+
+    if(!strncmp(name, "SPICE(", 6)) {
+        PyOS_snprintf(short_message, sizeof(short_message), "%s", name);
+    } else {
+        PyOS_snprintf(short_message, sizeof(short_message), "SPICE(%s)", name);
+    }
+
+    error_class = get_error_class(short_message);
+
+    Py_XINCREF(error_class);
+
+    return error_class;
+}
+
+/* return (long message, traceback) of an error, or None if not kept */
+PyObject * spice_error_detail(PyObject *self, PyObject *args)
+{
+    unsigned long id = 0;
+    PySpiceError *error = NULL;
+
+    PYSPICE_CHECK_RETURN_STATUS(PyArg_ParseTuple(args, "k", &id));
+
+    error = error_history + id % PYSPICE_ERROR_HISTORY;
+
+    if(!id || error->id != id) {
+        Py_RETURN_NONE;
+    }
+
+    return Py_BuildValue("(ss)", error->message, error->trace);
+}
+
+/* the wrappers called since the extension was loaded, see pyspice.h */
+static PySpiceStats *pyspice_stats = NULL;
+
+/**
+ * The ring of the calls recorded while tracing.  trace_written counts all
+ * the events written since the last drain, the older ones being
+ * overwritten once it passes trace_capacity.  The wrappers run with the
+ * GIL held, so the ring needs no lock.
+ */
+static PySpiceTraceEvent *trace_events = NULL;
+static Py_ssize_t trace_capacity = 0;
+static Py_ssize_t trace_written = 0;
+static char tracing = 0;
+
+#ifdef PYSPICE_STATS
+
+PySpiceStats *pyspice_current_stats = NULL;
+
+double pyspice_time(void)
+{
+    struct timespec now;
+
+    clock_gettime(CLOCK_MONOTONIC, &now);
+
+    return now.tv_sec + now.tv_nsec * 1e-9;
+}
+
+/**
+ * Call the wrapper function, counting the call in stats.  The time spent
+ * in CSPICE is added to stats by PYSPICE_TIME_CSPICE, and the rest of the
+ * time of the call is counted as conversion time.
+ */
+PyObject * pyspice_timed_call(PySpiceStats *stats, PyCFunction function,
+                              PyObject *self, PyObject *args)
+{
+    /* wrappers can be called from the callbacks of other wrappers */
+    PySpiceStats *outer = pyspice_current_stats;
+    double cspice_time = stats->cspice_time, start = 0, end = 0;
+    PyObject *result = NULL;
+
+    if(!stats->registered) {
+        stats->next = pyspice_stats;
+        stats->registered = 1;
+        pyspice_stats = stats;
+    }
+
+    pyspice_current_stats = stats;
+
+    start = pyspice_time();
+    result = function(self, args);
+    end = pyspice_time();
+
+    stats->conversion_time += end - start - (stats->cspice_time - cspice_time);
+
+    pyspice_current_stats = outer;
+
+    stats->calls ++;
+    if(!result) {
+        stats->errors ++;
+    }
+
+    if(tracing) {
+        PySpiceTraceEvent *event = trace_events + trace_written % trace_capacity;
+
+        event->name = stats->name;
+        event->start = start;
+        event->duration = end - start;
+        event->thread = PyThread_get_thread_ident();
+        event->error = !result;
+
+        trace_written ++;
+    }
+
+    return result;
+}
+
+#endif
+
+char stats_doc[] = PyDoc_STR(
+"stats() -> {name: {'calls', 'errors', 'cspice_time', 'conversion_time'}}\n\n"
+"Return the call statistics of the wrappers called so far: the number of\n"
+"calls, the number of calls that raised an exception, and the seconds\n"
+"spent in CSPICE and in converting the arguments and results.  The\n"
+"statistics are only kept when the extension is built with PYSPICE_STATS\n"
+"set, otherwise the dictionary is empty.");
+
+PyObject * spice_stats(PyObject *self, PyObject *args)
+{
+    PyObject *stats = PyDict_New(), *value = NULL;
+    PySpiceStats *item = NULL;
+
+    for(item = pyspice_stats; stats && item; item = item->next) {
+        value = Py_BuildValue("{s:k,s:k,s:d,s:d}",
+                              "calls", item->calls,
+                              "errors", item->errors,
+                              "cspice_time", item->cspice_time,
+                              "conversion_time", item->conversion_time);
+
+        if(!value || PyDict_SetItemString(stats, item->name, value)) {
+            Py_XDECREF(value);
+            Py_DECREF(stats);
+            return NULL;
+        }
+
+        Py_DECREF(value);
+    }
+
+    return stats;
+}
+
+char reset_stats_doc[] = PyDoc_STR(
+"reset_stats()\n\n"
+"Set the call statistics returned by stats() back to zero.");
+
+PyObject * spice_reset_stats(PyObject *self, PyObject *args)
+{
+    PySpiceStats *item = NULL;
+
+    for(item = pyspice_stats; item; item = item->next) {
+        item->calls = item->errors = 0;
+        item->cspice_time = item->conversion_time = 0;
+    }
+
+    Py_RETURN_NONE;
+}
+
+/* start recording the calls into a new ring of capacity events */
+PyObject * spice_trace_start(PyObject *self, PyObject *args)
+{
+    Py_ssize_t capacity = 0;
+
+    PYSPICE_CHECK_RETURN_STATUS(PyArg_ParseTuple(args, "n", &capacity));
+
+#ifdef PYSPICE_STATS
+    {
+        PySpiceTraceEvent *events = NULL;
+
+        if(capacity < 1) {
+            PyErr_SetString(PyExc_ValueError, "the capacity must be positive");
+            return NULL;
+        }
+
+        events = PyMem_New(PySpiceTraceEvent, capacity);
+        if(!events) {
+            return PyErr_NoMemory();
+        }
+
+        PyMem_Free(trace_events);
+
+        trace_events = events;
+        trace_capacity = capacity;
+        trace_written = 0;
+        tracing = 1;
+
+        Py_RETURN_NONE;
+    }
+#else
+    PyErr_SetString(PyExc_RuntimeError,
+                    "tracing needs the extension built with PYSPICE_STATS set");
+    return NULL;
+#endif
+}
+
+/* stop recording, the recorded calls can still be drained */
+PyObject * spice_trace_stop(PyObject *self, PyObject *args)
+{
+    tracing = 0;
+
+    Py_RETURN_NONE;
+}
+
+/**
+ * Return ([(name, start, duration, thread, error)], dropped) for the calls
+ * recorded since the last drain, oldest first, and the number of older
+ * ones that were overwritten.  The ring is emptied.
+ */
+PyObject * spice_trace_drain(PyObject *self, PyObject *args)
+{
+    Py_ssize_t count = trace_written, first = 0, i = 0;
+    PyObject *events = NULL;
+
+    if(count > trace_capacity) {
+        first = count - trace_capacity;
+        count = trace_capacity;
+    }
+
+    events = PyList_New(count);
+    if(!events) {
+        return NULL;
+    }
+
+    for(i = 0; i < count; ++ i) {
+        PySpiceTraceEvent *event = trace_events + (first + i) % trace_capacity;
+        PyObject *item = Py_BuildValue("(sddlN)", event->name, event->start,
+                                       event->duration, event->thread,
+                                       PyBool_FromLong(event->error));
+
+        if(!item) {
+            Py_DECREF(events);
+            return NULL;
+        }
+
+        PyList_SET_ITEM(events, i, item);
+    }
+
+    trace_written = 0;
+
+    return Py_BuildValue("(Nn)", events, first);
+}
+
+/* the clock of the recorded start times, in seconds */
+PyObject * spice_trace_clock(PyObject *self, PyObject *args)
+{
+#ifdef PYSPICE_STATS
+    return PyFloat_FromDouble(pyspice_time());
+#else
+    PyErr_SetString(PyExc_RuntimeError,
+                    "tracing needs the extension built with PYSPICE_STATS set");
+    return NULL;
+#endif
+}
+
+PyObject * spice_berto(PyObject *self, PyObject *args)
+{
+    PyObject *py_ellipse = NULL;
+
+    PYSPICE_CHECK_RETURN_STATUS(PyArg_ParseTuple(args, "O", &py_ellipse));
+
+    SpiceEllipse *spice_ellipse = get_spice_ellipse(py_ellipse);
+
+    PYSPICE_CHECK_RETURN_STATUS(spice_ellipse);
+
+    SpiceEllipse copy = *spice_ellipse;
+
+    char *sections[3] = {"center", "semi_major", "semi_minor"};
+    double *ellipse_sections[3] = {copy.center, copy.semiMajor, copy.semiMinor};
+    int i = 0, j = 0;
+
+    for(i = 0; i < 3; ++ i) {
+        for(j = 0; j < 3; ++ j) {
+            printf ("%s[%d] = %f\n", sections[i], j, ellipse_sections[i][j]);
+        }
+    }
 
-    free(spice_ellipse);
+    copy.center[0] = 1;
+    copy.center[1] = 2;
+    copy.center[2] = 3;
+    copy.semiMajor[0] = 4;
+    copy.semiMajor[1] = 5;
+    copy.semiMajor[2] = 6;
+    copy.semiMinor[0] = 7;
+    copy.semiMinor[1] = 8;
+    copy.semiMinor[2] = 9;
 
-    return py_ellipse;
+    return get_py_ellipse(&copy);
 }
 
 PyObject * spice_test(PyObject *self, PyObject *args)
@@ -222,8 +1935,7 @@ PyObject * spice_test(PyObject *self, PyObject *args)
 
     plane = get_spice_plane(py_obj);
 
-    PyObject *py_obj2 = get_py_plane(plane);
-    free(plane);
+    PYSPICE_CHECK_RETURN_STATUS(plane);
 
-    return py_obj2;
+    return get_py_plane(plane);
 }
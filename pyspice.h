@@ -16,12 +16,85 @@
 #define __PYSPICE_H__ 1
 
 extern PyObject *SpiceException;
+extern int pyspice_array_returns;
 
 #define STRING_LEN 255
+/* buffer format of the STRING_LEN character strings of array outputs */
+#define STRING_FORMAT "255s"
 #define SPICE_DETAIL_LEN 1840
 
+/* largest number of dimensions a SpiceArray can have */
+#define PYSPICE_ARRAY_MAXDIM 3
+
+/* room for a buffer protocol format string, e.g. "d" or "41s" */
+#define PYSPICE_FORMAT_LEN 16
+
+/* buffer protocol format code matching the size of an integer type */
+#define PYSPICE_INT_FORMAT(type)                                        \
+  (sizeof(type) == sizeof(int) ? "i" : (sizeof(type) == sizeof(long) ? "l" : "q"))
+
+/**
+ * A contiguous, C ordered array of SPICE values.  The data either follows
+ * the object in memory or belongs to the object referenced by base.  The
+ * array is exported through the buffer protocol so numpy.asarray() and
+ * memoryview() can use it without copying.
+ */
+typedef struct {
+    PyObject_VAR_HEAD
+    char *data;
+    PyObject *base;
+    int ndim;
+    Py_ssize_t itemsize;
+    Py_ssize_t shape[PYSPICE_ARRAY_MAXDIM];
+    Py_ssize_t strides[PYSPICE_ARRAY_MAXDIM];
+    char format[PYSPICE_FORMAT_LEN];
+} PySpiceArray;
+
+extern PyTypeObject PySpiceArray_Type;
+
+#define PYSPICE_ARRAY_DATA(op) (((PySpiceArray *)(op))->data)
+
+/**
+ * Doubles borrowed from a buffer object or copied out of a sequence; see
+ * get_spice_doubles() and release_spice_doubles().
+ */
+typedef struct {
+    Py_buffer view;
+    double *data;
+    Py_ssize_t count;
+    Py_ssize_t capacity;
+    char has_view;
+} PySpiceDoubles;
+
+/**
+ * Python objects holding a SpiceEllipse or a SpicePlane
+ */
+typedef struct {
+    PyObject_HEAD
+    SpiceEllipse ellipse;
+} PySpiceEllipse;
+
+typedef struct {
+    PyObject_HEAD
+    SpicePlane plane;
+} PySpicePlane;
+
+/**
+ * Python object holding a SpiceCell, followed by the memory for the control
+ * area and the elements of the cell
+ */
+typedef struct {
+    PyObject_VAR_HEAD
+    SpiceCell cell;
+    SpiceInt capacity;
+} PySpiceCell;
+
+extern PyTypeObject PySpiceCell_Type;
+extern PyTypeObject PySpiceEllipse_Type;
+extern PyTypeObject PySpicePlane_Type;
+
 #define PYSPICE_CHECK_RETURN_STATUS(status) {                           \
-    if(!status) {                                                       \
+    if(!(status)) {                                                     \
       return NULL;                                                      \
     }                                                                   \
   }
@@ -30,34 +103,96 @@ extern PyObject *SpiceException;
     PyErr_SetString(SpiceException, detail);                            \
   }
 
-/* Stuff for getting the short error message
-#define SPICE_MESSAGE_LEN 25
-char *spice_msg = NULL;                                                 \
-spice_msg = (char *)malloc(sizeof(char) * SPICE_MESSAGE_LEN);           \
-getmsg_c("short", SPICE_MESSAGE_LEN, spice_msg);                        \
-free(spice_msg);                                                        \
-*/
+/* short error messages are at most 25 characters */
+#define SPICE_SHORT_LEN 26
+#define SPICE_SHORT_FORMAT "26s"
+#define SPICE_TRACE_LEN 1024
+
+/* the number of recent errors whose details an exception can still read */
+#define PYSPICE_ERROR_HISTORY 16
 
+void pyspice_set_error(void);
+void pyspice_mask_error(PyObject *mask, PyObject *codes, Py_ssize_t i);
+
+/**
+ * Raise the SPICE error of a failed call, see pyspice_set_error().  Only
+ * the short message is turned into a Python object, the long message and
+ * the traceback are read from the history when they are asked for.
+ */
 #define PYSPICE_CHECK_FAILED {                                          \
-    /* variables for exception handling */                              \
-    char *spice_detail = NULL;                                          \
-                                                                        \
     /* check if the function call failed */                             \
     if(failed_c()) {                                                    \
-      spice_detail = (char *)malloc(sizeof(char) * SPICE_DETAIL_LEN);   \
-                                                                        \
-      getmsg_c("long", SPICE_DETAIL_LEN, spice_detail);                 \
-                                                                        \
-      reset_c();                                                        \
-                                                                        \
-      PYSPICE_MAKE_EXCEPTION(spice_detail);                             \
-                                                                        \
-      free(spice_detail);                                               \
+      pyspice_set_error();                                              \
                                                                         \
       failed = 1;                                                       \
     }                                                                   \
   }
 
+/* fill the outputs of an element that failed in an errors="mask" call */
+Py_LOCAL_INLINE(void) pyspice_fill_nan(double *values, Py_ssize_t count)
+{
+    Py_ssize_t i = 0;
+
+    for(i = 0; i < count; ++ i) {
+        values[i] = Py_NAN;
+    }
+}
+
+/**
+ * Argument converters used by the generated wrappers in place of
+ * PyArg_ParseTuple.  Each one handles the exact builtin type inline and
+ * falls back to PyArg_Parse for everything else, so the accepted types and
+ * error messages are the same as with PyArg_ParseTuple.  They return
+ * 1 on success and 0 with a Python exception set on failure.
+ */
+Py_LOCAL_INLINE(int) get_spice_double(PyObject *py_obj, double *value)
+{
+    if(PyFloat_CheckExact(py_obj)) {
+        *value = PyFloat_AS_DOUBLE(py_obj);
+        return 1;
+    }
+
+    return PyArg_Parse(py_obj, "d", value);
+}
+
+Py_LOCAL_INLINE(int) get_spice_long(PyObject *py_obj, long *value)
+{
+    if(PyInt_CheckExact(py_obj)) {
+        *value = PyInt_AS_LONG(py_obj);
+        return 1;
+    }
+
+    return PyArg_Parse(py_obj, "l", value);
+}
+
+Py_LOCAL_INLINE(int) get_spice_int(PyObject *py_obj, int *value)
+{
+    if(PyInt_CheckExact(py_obj)) {
+        long l = PyInt_AS_LONG(py_obj);
+
+        if(l >= INT_MIN && l <= INT_MAX) {
+            *value = (int)l;
+            return 1;
+        }
+    }
+
+    return PyArg_Parse(py_obj, "i", value);
+}
+
+Py_LOCAL_INLINE(int) get_spice_string(PyObject *py_obj, char **value)
+{
+    if(PyString_CheckExact(py_obj)) {
+        *value = PyString_AS_STRING(py_obj);
+
+        /* CSPICE would silently truncate at an embedded NUL */
+        if(strlen(*value) == (size_t)PyString_GET_SIZE(py_obj)) {
+            return 1;
+        }
+    }
+
+    return PyArg_Parse(py_obj, "s", value);
+}
+
 /* Functions defined in the implementation file */
 PyObject * get_py_ellipse(SpiceEllipse *spice_obj);
 PyObject * get_py_cell(SpiceCell *cell);
@@ -69,6 +204,117 @@ SpiceEKAttDsc * get_spice_ekattdsc(PyObject *py_obj);
 SpiceEKSegSum * get_spice_eksegsum(PyObject *py_obj);
 SpicePlane * get_spice_plane(PyObject *py_obj);
 SpiceEllipse * get_spice_ellipse(PyObject *ellipse);
+int check_spice_cell_size(SpiceCell *cell, long size);
+
+int check_args(PyObject *args, Py_ssize_t count, const char *function_name);
+PyObject * new_py_array(const char *format, Py_ssize_t itemsize, int ndim,
+                        const Py_ssize_t *shape);
+PyObject * get_py_array(const void *data, const char *format,
+                        Py_ssize_t itemsize, int ndim, const Py_ssize_t *shape);
+int get_spice_array(PyObject *py_obj, void *data, const char *format,
+                    Py_ssize_t itemsize, int ndim, const Py_ssize_t *shape);
+int get_spice_doubles(PyObject *py_obj, PySpiceDoubles *values);
+int get_spice_rows(PyObject *py_obj, Py_ssize_t row_size, PySpiceDoubles *values,
+                   long *rows);
+void release_spice_doubles(PySpiceDoubles *values);
+int get_spice_strings(PyObject *py_obj, char **data, long *count, long *length);
+void init_pyspice_types(PyObject *module);
+
+/* Module level functions */
+PyObject * spice_set_array_returns(PyObject *self, PyObject *args);
+PyObject * spice_stats(PyObject *self, PyObject *args);
+PyObject * spice_reset_stats(PyObject *self, PyObject *args);
+PyObject * spice_trace_start(PyObject *self, PyObject *args);
+PyObject * spice_trace_stop(PyObject *self, PyObject *args);
+PyObject * spice_trace_drain(PyObject *self, PyObject *args);
+PyObject * spice_trace_clock(PyObject *self, PyObject *args);
+PyObject * spice_error_class(PyObject *self, PyObject *args);
+PyObject * spice_error_detail(PyObject *self, PyObject *args);
+
+/* Wrappers of the functions taking callbacks, see gfcallbacks.c */
+PyObject * spice_gfevnt(PyObject *self, PyObject *args, PyObject *kwds);
+PyObject * spice_gffove(PyObject *self, PyObject *args, PyObject *kwds);
+PyObject * spice_gfocce(PyObject *self, PyObject *args, PyObject *kwds);
+PyObject * spice_gfuds(PyObject *self, PyObject *args, PyObject *kwds);
+PyObject * spice_uddc(PyObject *self, PyObject *args);
+PyObject * spice_uddf(PyObject *self, PyObject *args);
+
+extern char set_array_returns_doc[];
+extern char stats_doc[];
+extern char reset_stats_doc[];
+
+/* Hand written entries for the generated method table */
+#define PYSPICE_METHODS                                                 \
+  {"set_array_returns", spice_set_array_returns, METH_VARARGS, set_array_returns_doc}, \
+  {"stats", spice_stats, METH_NOARGS, stats_doc},                       \
+  {"reset_stats", spice_reset_stats, METH_NOARGS, reset_stats_doc}, \
+  {"_trace_start", spice_trace_start, METH_VARARGS, NULL},              \
+  {"_trace_stop", spice_trace_stop, METH_NOARGS, NULL},                 \
+  {"_trace_drain", spice_trace_drain, METH_NOARGS, NULL},               \
+  {"_trace_clock", spice_trace_clock, METH_NOARGS, NULL},              \
+  {"_error_class", spice_error_class, METH_VARARGS, NULL},              \
+  {"_error_detail", spice_error_detail, METH_VARARGS, NULL},
+
+/**
+ * Call statistics of a generated wrapper.  They are only kept when the
+ * extension is compiled with PYSPICE_STATS defined, otherwise the macros
+ * below leave the wrappers as they are.  A wrapper is added to the list
+ * read by spice.stats() on its first call.
+ */
+typedef struct PySpiceStats {
+    const char *name;
+    unsigned long calls;
+    unsigned long errors;
+    double cspice_time;
+    double conversion_time;
+    char registered;
+    struct PySpiceStats *next;
+} PySpiceStats;
+
+/* a call recorded while tracing, see spice/tracing.py */
+typedef struct {
+    const char *name;
+    double start;
+    double duration;
+    long thread;
+    char error;
+} PySpiceTraceEvent;
+
+#ifdef PYSPICE_STATS
+
+extern PySpiceStats *pyspice_current_stats;
+
+double pyspice_time(void);
+PyObject * pyspice_timed_call(PySpiceStats *stats, PyCFunction function,
+                              PyObject *self, PyObject *args);
+
+/* define stats_<name>, which calls spice_<name> and counts the call */
+#define PYSPICE_STATS_WRAPPER(name, label)                              \
+  static PySpiceStats name##_stats = {label};                           \
+  static PyObject * stats_##name(PyObject *self, PyObject *args)        \
+  {                                                                     \
+    return pyspice_timed_call(&name##_stats, spice_##name, self, args); \
+  }
+
+/* the function of a wrapper in the method tables */
+#define PYSPICE_METHOD(name) stats_##name
+
+/* run call, adding the time it takes to the CSPICE time of the wrapper */
+#define PYSPICE_TIME_CSPICE(call) {                                     \
+    double pyspice_start = pyspice_time();                              \
+                                                                        \
+    call;                                                               \
+                                                                        \
+    pyspice_current_stats->cspice_time += pyspice_time() - pyspice_start; \
+  }
+
+#else
+
+#define PYSPICE_STATS_WRAPPER(name, label)
+#define PYSPICE_METHOD(name) spice_##name
+#define PYSPICE_TIME_CSPICE(call) { call; }
+
+#endif
 
 /* Some test code */
 PyObject * spice_berto(PyObject *self, PyObject *args);
@@ -1,10 +1,15 @@
 # Released under the BSD license, see LICENSE for details
 
+import hashlib
 import os
+import shutil
 import sys
 
+from distutils.command.build_ext import build_ext
 from distutils.core import setup, Extension
-from shutil import copy
+from distutils.dep_util import newer_group
+from multiprocessing import cpu_count
+from multiprocessing.pool import ThreadPool
 from subprocess import PIPE, Popen
 
 APP_NAME = os.path.basename(os.getcwd())
@@ -13,6 +18,10 @@ SHARE_DIR = os.path.join('share', 'spicedoc')
 SPICE_MODULE_C = 'spicemodule.c'
 ROOT_DIR = os.path.dirname(__file__)
 MODULE_PATH = os.path.join(ROOT_DIR, SPICE_MODULE_C)
+DOCS_PATH = os.path.join(ROOT_DIR, 'spice', 'docs.zip')
+
+# number of C files compiled at once
+BUILD_JOBS = int(os.environ.get('PYSPICE_JOBS', cpu_count()))
 
 CSPICE_SRC = os.environ.get('CSPICE_SRC', os.path.join(ROOT_DIR, 'cspice'))
 
@@ -22,50 +31,295 @@ if not os.path.exists(CSPICE_SRC):
                'variable CSPICE_SRC') % (CSPICE_SRC,)
     sys.exit(message)
 
+# the flags added to the compile and link commands of both cspice and the
+# extension by each build profile.  pgo builds like release, runs
+# benchmarks/workload.py and builds again with the profiles it wrote.
+BUILD_PROFILES = {
+    'default': ([], []),
+    'release': (['-O3', '-flto'], ['-O3', '-flto']),
+    'pgo': (['-O3', '-flto'], ['-O3', '-flto']),
+}
+
+BUILD_PROFILE = os.environ.get('PYSPICE_PROFILE', 'default')
+
+if BUILD_PROFILE not in BUILD_PROFILES:
+    sys.exit('Unknown build profile %s, expected one of %s' % \
+             (BUILD_PROFILE, ', '.join(sorted(BUILD_PROFILES))))
+
+PROFILE_CFLAGS, PROFILE_LDFLAGS = BUILD_PROFILES[BUILD_PROFILE]
+
+# keep the call statistics returned by spice.stats(), see pyspice.h
+BUILD_STATS = os.environ.get('PYSPICE_STATS', '') not in ('', '0')
+
+# objects built with other options are kept in their own directory
+BUILD_VARIANT = BUILD_PROFILE + (BUILD_STATS and '-stats' or '')
+
+# where the pgo profile writes the profiles of the workload
+PGO_DIR = os.path.abspath(os.path.join(ROOT_DIR, 'build', 'pgo'))
+PGO_WORKLOAD = os.path.join(ROOT_DIR, 'benchmarks', 'workload.py')
+
+# the extension only links the cspice library, see build_cspice()
+CSPICE_LIB = os.path.join(CSPICE_SRC, 'lib', 'cspice.a')
+CSPICE_CC = os.environ.get('CC', 'cc')
+CSPICE_CFLAGS = os.environ.get('CSPICE_CFLAGS',
+                               '-ansi -O2 -fPIC -DNON_UNIX_STDIO').split() + \
+    PROFILE_CFLAGS
+
+# the lto objects need the archiver that runs the compiler plugin
+CSPICE_AR = os.environ.get('AR', '-flto' in PROFILE_CFLAGS and 'gcc-ar' or 'ar')
+
+# compiled cspice objects, named by the hash of their source and flags
+CSPICE_OBJECTS = os.environ.get('CSPICE_OBJECTS',
+                                os.path.join(ROOT_DIR, 'build', 'cspice'))
+
 # check to see if the lib files are named lib*
 remove_files = []
 
 class LibError(Exception): pass
 
-def build_cspice():
-    libfile_path = os.path.join(CSPICE_SRC, 'lib', 'cspice.a')
-    if os.path.exists(libfile_path):
+def read_file(path):
+    f = open(path, 'rb')
+    try:
+        return f.read()
+    finally:
+        f.close()
+
+def get_cspice_objects(flags):
+    """
+    Return (source, object) for the files of the cspice library, the object
+    being the one in CSPICE_OBJECTS for the current compiler and flags.
+    """
+    src_dir = os.path.join(CSPICE_SRC, 'src', 'cspice')
+    include_dir = os.path.join(CSPICE_SRC, 'include')
+
+    # a change to any header or flag changes the name of every object
+    digest = hashlib.sha1(' '.join([CSPICE_CC] + flags))
+    for directory in (include_dir, src_dir):
+        for name in sorted(os.listdir(directory)):
+            if name.endswith('.h'):
+                digest.update(read_file(os.path.join(directory, name)))
+
+    # and so do the profiles an optimized build uses
+    if [x for x in flags if x.startswith('-fprofile-use')]:
+        for directory, dirs, files in sorted(os.walk(PGO_DIR)):
+            for name in sorted(files):
+                digest.update(read_file(os.path.join(directory, name)))
+
+    objects = []
+    for name in sorted(os.listdir(src_dir)):
+        if name.endswith('.c'):
+            source = os.path.join(src_dir, name)
+            key = digest.copy()
+            key.update(read_file(source))
+
+            objects.append((source, os.path.join(CSPICE_OBJECTS,
+                                                 '%s.o' % key.hexdigest())))
+
+    return objects
+
+def compile_cspice_object(args):
+    source, object_path, flags = args
+    include_dir = os.path.join(CSPICE_SRC, 'include')
+
+    # compiled under another name, so an interrupted build leaves no
+    # object.  the name only depends on the source, as the profiles of a
+    # pgo build are found by the name of the object.
+    name = os.path.splitext(os.path.basename(source))[0] + '.o'
+    path = os.path.join(CSPICE_OBJECTS, 'tmp', name)
+
+    command = [CSPICE_CC] + flags + \
+        ['-I%s' % include_dir, '-c', source, '-o', path]
+    status = Popen(command).wait()
+
+    if status != 0:
+        if os.path.exists(path):
+            os.remove(path)
+        raise LibError('Unable to compile %s' % (source,))
+
+    os.rename(path, object_path)
+
+def build_cspice(flags=CSPICE_CFLAGS):
+    """
+    Build the cspice library from the sources in src/cspice, BUILD_JOBS
+    files at a time.  The support library and the executables of the
+    toolkit are not built.  Objects already in CSPICE_OBJECTS are not
+    compiled again, so changing the flags back and forth is cheap.
+
+    A library that came with the toolkit is used as it is, unless
+    CSPICE_CFLAGS is set or a build profile other than default is used.
+    """
+    flags_path = CSPICE_LIB + '.flags'
+    command = ' '.join([CSPICE_CC] + flags)
+    objects = None
+
+    if os.path.exists(flags_path):
+        # the profiles of a pgo build change without the flags changing
+        objects = get_cspice_objects(flags)
+        built = read_file(flags_path) == command + '\n' + \
+            os.path.basename(objects[-1][1])
+    else:
+        built = 'CSPICE_CFLAGS' not in os.environ and \
+            BUILD_PROFILE == 'default'
+
+    if os.path.exists(CSPICE_LIB) and built:
         return
 
-    curr_dir = os.getcwd()
-    try:
-        os.chdir(CSPICE_SRC)
-        makeall = Popen('/bin/csh makeall.csh', shell=True)
-        status = os.waitpid(makeall.pid, 0)[1]
+    if not os.path.isdir(os.path.join(CSPICE_OBJECTS, 'tmp')):
+        os.makedirs(os.path.join(CSPICE_OBJECTS, 'tmp'))
 
-        if status != 0:
-            sys.stderr.write('warning: cspice build exit status: %d' % status)
+    objects = objects or get_cspice_objects(flags)
+    missing = [x + (flags,) for x in objects if not os.path.exists(x[1])]
+
+    print 'compiling %d of %d cspice files' % (len(missing), len(objects))
+
+    pool = ThreadPool(max(BUILD_JOBS, 1))
+    try:
+        pool.map(compile_cspice_object, missing)
     finally:
-        os.chdir(curr_dir)
+        pool.close()
+
+    if not os.path.isdir(os.path.dirname(CSPICE_LIB)):
+        os.makedirs(os.path.dirname(CSPICE_LIB))
+
+    # the archive is put together again from scratch
+    path = CSPICE_LIB + '.tmp'
+    if os.path.exists(path):
+        os.remove(path)
+
+    status = Popen([CSPICE_AR, 'crs', path] + [x[1] for x in objects]).wait()
+    if status != 0:
+        raise LibError('Unable to create %s' % (CSPICE_LIB,))
+
+    os.rename(path, CSPICE_LIB)
+
+    f = open(flags_path, 'wb')
+    f.write(command + '\n' + os.path.basename(objects[-1][1]))
+    f.close()
 
 def find_libs():
-    for libfile in ('cspice.a', 'csupport.a'):
+    for libfile in ('cspice.a',):
         libfile_path = os.path.join(CSPICE_SRC, 'lib', libfile)
         lib_libfile_path = os.path.join(CSPICE_SRC, 'lib', 'lib' + libfile)
 
-        if not os.path.exists(lib_libfile_path):
+        # copied again when a pgo build rebuilt the library
+        if lib_libfile_path in remove_files or \
+           not os.path.exists(lib_libfile_path):
             if not os.path.exists(libfile_path):
                 sys.exit('unable to find %s' % (libfile_path,))
 
             try:
-                copy(libfile_path, lib_libfile_path)
-                remove_files.append(lib_libfile_path)
+                shutil.copy(libfile_path, lib_libfile_path)
+                if lib_libfile_path not in remove_files:
+                    remove_files.append(lib_libfile_path)
             except:
                 raise LibError('Unable to copy %s to %s' % (libfile_path,
                                                             lib_libfile_path))
 
 def make_spice_module():
-    if not os.path.exists(MODULE_PATH):
-        import mkwrapper
-        print 'making wrapper'
-        f = open(MODULE_PATH, 'wb')
-        f.write(mkwrapper.main(CSPICE_SRC))
-        f.close()
+    import mkwrapper
+
+    paths = [os.path.join(ROOT_DIR, x) for x in mkwrapper.get_source_names()]
+
+    # generated on every build, since the wrappers depend on the toolkit as
+    # well as on mkwrapper.py.  Unchanged functions are taken from the cache
+    # of earlier builds and the generated files are only rewritten when
+    # their code changed, so only the families touched by a change are
+    # compiled again.
+    print 'making wrapper'
+    if not mkwrapper.cache_dir:
+        mkwrapper.cache_dir = os.path.join(ROOT_DIR, 'build', 'mkwrapper')
+
+    sources = mkwrapper.main(CSPICE_SRC)
+    for name in mkwrapper.write_sources(sources, ROOT_DIR or '.'):
+        print 'wrote %s' % name
+
+    mkwrapper.write_docs(DOCS_PATH)
+
+    return paths
+
+class parallel_build_ext(build_ext):
+    """
+    Compile the C files of the extension BUILD_JOBS at a time, skipping the
+    ones whose object is newer than the file and the headers.
+    """
+
+    def finalize_options(self):
+        build_ext.finalize_options(self)
+
+        self.build_temp = os.path.join(self.build_temp, BUILD_VARIANT)
+
+    def build_extension(self, ext):
+        compile = self.compiler.compile
+
+        def compile_source(args):
+            source, output_dir, kwargs = args
+            depends = [source] + list(kwargs.get('depends') or [])
+            objects = self.compiler.object_filenames([source],
+                                                     output_dir=output_dir)
+
+            if self.force or newer_group(depends, objects[0]):
+                return compile([source], output_dir, **kwargs)
+
+            return objects
+
+        def parallel_compile(sources, output_dir=None, **kwargs):
+            # made up front, the compile calls would race to make them
+            for path in self.compiler.object_filenames(sources,
+                                                       output_dir=output_dir):
+                self.mkpath(os.path.dirname(path))
+
+            pool = ThreadPool(max(BUILD_JOBS, 1))
+            try:
+                objects = pool.map(compile_source,
+                                   [(x, output_dir, kwargs) for x in sources])
+            finally:
+                pool.close()
+
+            return sum(objects, [])
+
+        self.compiler.compile = parallel_compile
+        try:
+            build_ext.build_extension(self, ext)
+        finally:
+            del self.compiler.compile
+
+    def run(self):
+        if BUILD_PROFILE != 'pgo':
+            return build_ext.run(self)
+
+        # built once writing profiles while the workload runs, and again
+        # using them
+        if os.path.isdir(PGO_DIR):
+            shutil.rmtree(PGO_DIR)
+
+        self.build_profile(['-fprofile-generate=%s' % PGO_DIR])
+        self.run_workload()
+
+        self.build_profile(['-fprofile-use=%s' % PGO_DIR,
+                            '-fprofile-correction', '-Wno-missing-profile'])
+
+    def build_profile(self, flags):
+        build_cspice(CSPICE_CFLAGS + flags)
+        find_libs()
+
+        for ext in self.extensions:
+            ext.extra_compile_args = PROFILE_CFLAGS + flags
+            ext.extra_link_args = PROFILE_LDFLAGS + flags
+
+        self.force = True
+        build_ext.run(self)
+
+    def run_workload(self):
+        ext_dir = os.path.dirname(os.path.abspath(self.get_ext_fullpath('_spice')))
+        env = dict(os.environ)
+        env['PYTHONPATH'] = os.pathsep.join([ext_dir,
+                                             os.path.abspath(ROOT_DIR)])
+
+        print 'running %s' % PGO_WORKLOAD
+        status = Popen([sys.executable, PGO_WORKLOAD], env=env).wait()
+
+        if status != 0:
+            raise LibError('The workload failed with status %d' % status)
 
 def cleanup():
     for path in remove_files:
@@ -81,14 +335,18 @@ def set_build_paths():
 
 try:
     build_cspice()
-    make_spice_module()
+    wrapper_sources = make_spice_module()
     find_libs()
     set_build_paths()
 
     module1 = Extension(
         '_spice',
-        sources = ['pyspice.c', 'spicemodule.c'],
+        sources = ['pyspice.c', 'gfcallbacks.c'] + wrapper_sources,
+        depends = ['pyspice.h'],
         libraries = ['cspice'],
+        define_macros = BUILD_STATS and [('PYSPICE_STATS', '1')] or [],
+        extra_compile_args = PROFILE_CFLAGS,
+        extra_link_args = PROFILE_LDFLAGS,
     )
 
     setup(
@@ -96,7 +354,9 @@ try:
         version = '1.0',
         description = 'Spice Wrapper Module',
         packages = ['spice'],
-        ext_modules = [module1]
+        package_data = {'spice': ['docs.zip']},
+        ext_modules = [module1],
+        cmdclass = {'build_ext': parallel_build_ext},
     )
 finally:
     cleanup()
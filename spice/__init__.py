@@ -1,4 +1,64 @@
 # Released under the BSD license, see LICENSE for details
 
-from misc import *
+import sys as _sys, types as _types
+
+import _spice
+
 from objects import *
+from docs import doc
+
+# state queries go through the optional cache, and the functions changing
+# the kernels flush it
+from cache import spkezr, spkpos, furnsh, unload, kclear, spklef, spkuef, \
+    cklpf, ckupf, pcklof, pckuof, ldpool, lmpool, clpool, pdpool, pipool, \
+    pcpool, dvpool, boddef, set_array_returns
+
+import cache
+import errors
+
+from lazy import families as _families, wrappers as _wrappers
+
+# submodules imported on first use, vec and writers import numpy
+_submodules = ('snapshot', 'tracing', 'vec', 'writers')
+
+
+class _Package(_types.ModuleType):
+    """
+    The spice package.  The wrapped functions are not imported up front,
+    they are looked up in their family module of _spice on first use, see
+    lazy.py.  The same goes for the submodules in _submodules.
+    """
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+
+        if name in _submodules:
+            __import__('%s.%s' % (__name__, name))
+            return self.__dict__[name]
+
+        try:
+            value = getattr(_wrappers, name)
+        except AttributeError:
+            raise AttributeError("'module' object has no attribute '%s'" % name)
+
+        setattr(self, name, value)
+
+        return value
+
+    def __dir__(self):
+        return sorted(set(self.__dict__) | set(_families) | set(_submodules))
+
+
+# from spice import * imports every function, which creates all the families
+__all__ = sorted(set(_families) | set(_submodules) |
+                 set([x for x in dir(_spice) if not x.startswith('_')]) |
+                 set([x for x in globals() if not x.startswith('_')]))
+
+_package = _Package(__name__, __doc__)
+_package.__dict__.update(globals())
+
+# python 2 clears the globals of a module when it is deleted, and the
+# functions of this module still use them
+_package._module = _sys.modules[__name__]
+_sys.modules[__name__] = _package
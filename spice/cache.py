@@ -0,0 +1,201 @@
+# Released under the BSD license, see LICENSE for details
+
+"""
+Optional cache for repeated spkezr and spkpos queries.
+
+The cache is off by default.  Once turned on with enable(), spkezr and
+spkpos look up their arguments in a least recently used cache before
+calling CSPICE, which saves the light time iterations for queries that are
+asked again:
+
+  spice.cache.enable(4096)
+  state, lt = spice.spkezr('MARS', et, 'J2000', 'LT+S', 'EARTH')
+  print spice.cache.info()
+
+The functions changing the loaded kernels or the kernel pool (furnsh,
+unload, kclear, the SPK, CK and PCK load and unload functions, ldpool,
+lmpool, clpool, ...) are wrapped to flush the cache, so a cached result is
+never older than the kernels it was computed from.  This includes the CK
+and PCK data and the frame definitions, which change the results in the
+frames they define.
+Results are only cached when CSPICE did not signal an error.
+
+The cache can be used from several threads.  When array returns are turned
+on every caller gets its own copy of the cached SpiceArray objects, so they
+can be modified in place.
+"""
+
+import threading
+from collections import namedtuple
+
+# the wrappers are looked up by family, see lazy.py
+from lazy import wrappers as _spice
+
+CacheInfo = namedtuple('CacheInfo', 'hits misses maxsize currsize')
+
+# the results are kept in a dictionary and in a circular doubly linked list
+# of [previous, next, key, result] links, ordered from the least to the most
+# recently used.  _root is the sentinel link of the list.
+_results = {}
+_root = []
+_root[:] = [_root, _root, None, None]
+_maxsize = 0
+_hits = 0
+_misses = 0
+
+# guards the list, the dictionary and the counters, which are shared by all
+# threads.  _generation counts the flushes, so a result computed while the
+# kernels changed is not stored.
+_lock = threading.RLock()
+_generation = 0
+
+
+def enable(maxsize=1024):
+    """
+    Turn the cache on, keeping at most maxsize results.  Calling it again
+    changes the size, dropping the least recently used results if needed.
+    """
+    global _maxsize
+
+    if maxsize < 1:
+        raise ValueError('maxsize must be positive')
+
+    with _lock:
+        _maxsize = maxsize
+
+        while len(_results) > _maxsize:
+            _remove_oldest()
+
+
+def disable():
+    """Turn the cache off and drop the cached results."""
+    global _maxsize
+
+    with _lock:
+        _maxsize = 0
+        _flush()
+
+
+def clear():
+    """Drop the cached results and reset the hit and miss counters."""
+    global _hits, _misses
+
+    with _lock:
+        _flush()
+        _hits = _misses = 0
+
+
+def info():
+    """Return a CacheInfo tuple with the hits, misses and sizes."""
+    with _lock:
+        return CacheInfo(_hits, _misses, _maxsize, len(_results))
+
+
+def _flush():
+    global _generation
+
+    with _lock:
+        _results.clear()
+        _root[:] = [_root, _root, None, None]
+        _generation += 1
+
+
+def _remove_oldest():
+    oldest = _root[1]
+    _root[1] = oldest[1]
+    oldest[1][0] = _root
+    del _results[oldest[2]]
+
+
+def _copy(result):
+    # SpiceArray objects are writable, the other items are immutable
+    return tuple(item.copy() if isinstance(item, _spice.SpiceArray) else item
+                 for item in result)
+
+
+def _make_cached(name):
+    # the wrappers are looked up when called, so their family module is only
+    # created when they are used
+    def wrapper(*args):
+        global _hits, _misses
+
+        if not _maxsize:
+            return getattr(_spice, name)(*args)
+
+        key = (name,) + args
+
+        try:
+            hash(key)
+        except TypeError:
+            # unhashable arguments, e.g. a list for et
+            return getattr(_spice, name)(*args)
+
+        with _lock:
+            link = _results.get(key)
+
+            if link is not None:
+                # move the link to the most recently used end
+                previous, next = link[0], link[1]
+                previous[1] = next
+                next[0] = previous
+                last = _root[0]
+                last[1] = _root[0] = link
+                link[0] = last
+                link[1] = _root
+                _hits += 1
+                result = link[3]
+            else:
+                generation = _generation
+
+        # the cached result itself is never handed out
+        if link is not None:
+            return _copy(result)
+
+        # the lock is not held while CSPICE computes the result
+        result = getattr(_spice, name)(*args)
+
+        with _lock:
+            _misses += 1
+
+            # another thread may have stored the key, flushed or turned the
+            # cache off in the meantime
+            if (generation == _generation and _maxsize and
+                    key not in _results):
+                if len(_results) >= _maxsize:
+                    _remove_oldest()
+
+                last = _root[0]
+                last[1] = _root[0] = _results[key] = \
+                    [last, _root, key, _copy(result)]
+
+        return result
+
+    wrapper.__name__ = name
+
+    return wrapper
+
+
+def _make_flushing(name):
+    def wrapper(*args):
+        try:
+            return getattr(_spice, name)(*args)
+        finally:
+            _flush()
+
+    wrapper.__name__ = name
+
+    return wrapper
+
+
+spkezr = _make_cached('spkezr')
+spkpos = _make_cached('spkpos')
+
+# everything that can change the result of a state query, including the
+# orientation data and frame definitions used by the frame conversions
+for _name in ('furnsh', 'unload', 'kclear', 'spklef', 'spkuef', 'cklpf',
+              'ckupf', 'pcklof', 'pckuof', 'ldpool', 'lmpool', 'clpool',
+              'pdpool', 'pipool', 'pcpool', 'dvpool', 'boddef',
+              'set_array_returns'):
+    globals()[_name] = _make_flushing(_name)
+
+del _name
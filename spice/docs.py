@@ -0,0 +1,45 @@
+# Released under the BSD license, see LICENSE for details
+
+"""
+Full documentation of the wrapped CSPICE functions.
+
+The docstrings compiled into the _spice module only hold a summary of each
+function, so the module stays small and imports quickly.  The sections of
+the CSPICE headers are kept in the docs.zip archive written by mkwrapper.py
+next to this file, and doc() reads the one asked for when it is needed:
+
+  print spice.doc('utc2et')
+  print spice.doc(spice.vec.spkezr)
+"""
+
+import os, zipfile
+
+_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'docs.zip')
+
+# opened on the first call to doc()
+_archive = None
+
+
+def doc(function):
+    """
+    Return the documentation of a spice function, given by name or as the
+    function itself.  The docstring is returned for functions that have no
+    documentation in the archive.
+    """
+    global _archive
+
+    if isinstance(function, basestring):
+        name, docstring = function, ''
+    else:
+        name, docstring = function.__name__, function.__doc__ or ''
+
+    if _archive is None:
+        if not os.path.exists(_PATH):
+            return docstring
+
+        _archive = zipfile.ZipFile(_PATH)
+
+    try:
+        return _archive.read(name)
+    except KeyError:
+        return docstring
@@ -0,0 +1,119 @@
+# Released under the BSD license, see LICENSE for details
+
+"""
+The exceptions raised for SPICE errors.
+
+A call that fails raises a subclass of SpiceException named after the short
+SPICE error message, so expected errors can be caught by kind:
+
+  try:
+      state, lt = spice.spkezr(target, et, 'J2000', 'NONE', 'EARTH')
+  except spice.errors.SPKINSUFFDATA:
+      state = None
+
+The classes are created on first use, by the extension when the error
+happens or here when they are looked up, and the same name always gives
+the same class.
+
+The long message and the SPICE traceback are only turned into strings when
+the exception is printed or its long_message or spice_traceback is read,
+so catching an expected error in a loop stays cheap.  The extension keeps
+the details of the last few errors only (PYSPICE_ERROR_HISTORY in
+pyspice.h); for older exceptions they are None.
+"""
+
+import sys as _sys, types as _types
+
+import _spice
+from _spice import SpiceException
+
+
+def get(short_message):
+    """
+    Return the class of the errors with the given short message, e.g.
+    'SPICE(SPKINSUFFDATA)' or 'SPKINSUFFDATA'.
+    """
+    return _spice._error_class(short_message)
+
+
+def _get_id(error):
+    # the id of the details of an error raised by the extension, or None
+    if len(error.args) == 2 and isinstance(error.args[1], (int, long)):
+        return error.args[1]
+
+    return None
+
+
+def _get_detail(error):
+    # (long message, traceback), read from the extension once
+    try:
+        return error._detail
+    except AttributeError:
+        pass
+
+    error_id = _get_id(error)
+    error._detail = error_id and _spice._error_detail(error_id)
+
+    return error._detail
+
+
+def _get_short(error):
+    if _get_id(error) is None:
+        return None
+
+    return error.args[0]
+
+
+def _get_long_message(error):
+    detail = _get_detail(error)
+    return detail and detail[0]
+
+
+def _get_traceback(error):
+    detail = _get_detail(error)
+    return detail and detail[1]
+
+
+def _str(error):
+    if _get_id(error) is None:
+        return Exception.__str__(error)
+
+    message = _get_long_message(error)
+    if message is None:
+        return error.args[0]
+
+    return '%s -- %s' % (error.args[0], message)
+
+
+SpiceException.short = property(_get_short, doc=
+    "The short SPICE error message, e.g. 'SPICE(SPKINSUFFDATA)'.")
+SpiceException.long_message = property(_get_long_message, doc=
+    'The long SPICE error message.')
+SpiceException.spice_traceback = property(_get_traceback, doc=
+    'The CSPICE call traceback at the time of the error.')
+SpiceException.__str__ = _str
+
+
+class _Errors(_types.ModuleType):
+    """
+    The errors module.  Its upper case attributes are the error classes,
+    created on first use.
+    """
+
+    def __getattr__(self, name):
+        if name.startswith('_') or name != name.upper():
+            raise AttributeError(name)
+
+        value = get(name)
+        setattr(self, name, value)
+
+        return value
+
+
+_errors = _Errors(__name__, __doc__)
+_errors.__dict__.update(globals())
+
+# python 2 clears the globals of a module when it is deleted, and the
+# functions of this module still use them
+_errors._module = _sys.modules[__name__]
+_sys.modules[__name__] = _errors
@@ -0,0 +1,52 @@
+# Released under the BSD license, see LICENSE for details
+
+"""
+Lazy lookup of the wrapped functions.
+
+mkwrapper.py splits the wrappers into family modules of the _spice
+extension (time, spk, ck, frames, gf, ek, dsk, pool and misc).  A family
+module and its function objects are only created when one of its functions
+is first looked up, so importing spice stays cheap for programs using a
+few functions:
+
+  from lazy import wrappers as _spice
+
+  et = _spice.str2et(utc)      # creates the time family only
+
+The spice package resolves its attributes through wrappers as well.
+"""
+
+import _spice
+
+# the family of each wrapped function
+families = {}
+
+for _family, _names in _spice._families.items():
+    for _name in _names.split():
+        families[_name] = _family
+
+del _family, _names, _name
+
+
+class Wrappers(object):
+    """
+    Attribute access to the wrapped functions, and to the other contents of
+    _spice.  Looked up attributes are kept on the instance, so only the
+    first lookup of a function goes through __getattr__.
+    """
+
+    def __getattr__(self, name):
+        if name in families:
+            value = getattr(_spice._load_family(families[name]), name)
+        else:
+            value = getattr(_spice, name)
+
+        setattr(self, name, value)
+
+        return value
+
+    def __dir__(self):
+        return sorted(set(families) | set(dir(_spice)))
+
+
+wrappers = Wrappers()
@@ -1,3 +0,0 @@
-# Released under the BSD license, see LICENSE for details
-
-from _spice import *
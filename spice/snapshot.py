@@ -0,0 +1,185 @@
+# Released under the BSD license, see LICENSE for details
+
+"""
+Save the kernel pool to a binary snapshot and restore it without parsing
+the text kernels again.
+
+Loading a meta-kernel parses every text kernel it lists, which can take
+seconds.  A process that loaded its kernels can save the resulting kernel
+pool, and other processes restore it with one pdpool or pcpool call per
+variable:
+
+  spice.furnsh('mission.tm')
+  spice.snapshot.save('mission.snapshot')
+
+  # in a worker
+  spice.snapshot.restore('mission.snapshot')
+
+load() does both, restoring the snapshot when it is current and loading
+the kernel and saving a new snapshot otherwise:
+
+  spice.snapshot.load('mission.tm', 'mission.snapshot')
+
+The snapshot records the size and modification time of the loaded text
+kernels and meta-kernels, and restore() raises a ValueError when one of
+them changed since the snapshot was saved.  The binary kernels (SPK, CK,
+...) loaded at the time are loaded again by restore() with furnsh, in the
+same order.  The restored text kernels are not known to the kernel
+manager, so they cannot be unloaded one by one; clpool or kclear removes
+their variables.
+"""
+
+import array, cPickle, os
+
+# the wrappers are looked up by family, see lazy.py
+from lazy import wrappers as _spice
+import cache
+
+# changed whenever the layout of the snapshot files changes
+_VERSION = 1
+
+# number of values or names read from the kernel pool at once
+_POOL_ROOM = 1000
+
+_TEXT_TYPES = ('TEXT', 'META')
+
+
+def _read_pool(function, name):
+    # all the values of a variable, or None if function does not find it
+    values = []
+
+    while True:
+        found = function(name, len(values), _POOL_ROOM)
+
+        if found is None:
+            return values or None
+
+        values.extend(found[1])
+
+        if found[0] < _POOL_ROOM:
+            return values
+
+
+def _get_stamp(path):
+    try:
+        info = os.stat(path)
+    except OSError:
+        return None
+
+    return info.st_size, info.st_mtime
+
+
+def _get_kernels():
+    # (path, type) of the loaded kernels in load order
+    kernels = []
+
+    for i in range(_spice.ktotal('ALL')):
+        path, kind = _spice.kdata(i, 'ALL')[:2]
+        kernels.append((os.path.abspath(path), kind.strip()))
+
+    return kernels
+
+
+def save(path):
+    """
+    Save the kernel pool and the list of loaded kernels to the file at
+    path.
+    """
+    numbers = []
+    strings = []
+
+    for name in _read_pool(_spice.gnpool, '*') or []:
+        values = _read_pool(_spice.gdpool, name)
+
+        if values is None:
+            strings.append((name, _read_pool(_spice.gcpool, name)))
+        else:
+            numbers.append((name, array.array('d', values)))
+
+    kernels = []
+    binary = []
+
+    for kernel, kind in _get_kernels():
+        if kind in _TEXT_TYPES:
+            kernels.append((kernel, _get_stamp(kernel)))
+        else:
+            binary.append(kernel)
+
+    with open(path, 'wb') as f:
+        # the kernels come first so is_current() does not read the pool
+        cPickle.dump((_VERSION, kernels), f, cPickle.HIGHEST_PROTOCOL)
+        cPickle.dump((binary, numbers, strings), f, cPickle.HIGHEST_PROTOCOL)
+
+
+def _read_header(f):
+    version, kernels = cPickle.load(f)
+
+    if version != _VERSION:
+        raise ValueError('the snapshot has version %r instead of %r' % \
+                         (version, _VERSION))
+
+    return kernels
+
+
+def _get_changed(kernels):
+    # the first kernel that changed since the snapshot, or None
+    for kernel, stamp in kernels:
+        if _get_stamp(kernel) != stamp:
+            return kernel
+
+    return None
+
+
+def is_current(path):
+    """
+    Return whether the snapshot at path exists and none of the text kernels
+    it was saved from changed since.
+    """
+    try:
+        with open(path, 'rb') as f:
+            kernels = _read_header(f)
+    except (IOError, EOFError, ValueError, cPickle.UnpicklingError):
+        return False
+
+    return _get_changed(kernels) is None
+
+
+def restore(path, check=True):
+    """
+    Add the kernel pool variables saved at path to the kernel pool and load
+    the binary kernels that were loaded when it was saved.  Unless check is
+    False, a ValueError is raised if one of the text kernels changed since.
+    """
+    with open(path, 'rb') as f:
+        kernels = _read_header(f)
+
+        if check:
+            changed = _get_changed(kernels)
+
+            if changed is not None:
+                raise ValueError('%s changed since the snapshot was saved' % \
+                                 changed)
+
+        binary, numbers, strings = cPickle.load(f)
+
+    # the cache versions of the pool functions flush cached states
+    for name, values in numbers:
+        cache.pdpool(name, values)
+
+    for name, values in strings:
+        cache.pcpool(name, values)
+
+    for kernel in binary:
+        cache.furnsh(kernel)
+
+
+def load(kernel, path):
+    """
+    Restore the snapshot at path if it is current, otherwise load kernel
+    with furnsh and save a new snapshot at path.
+    """
+    if is_current(path):
+        restore(path, check=False)
+    else:
+        cache.furnsh(kernel)
+        save(path)
@@ -0,0 +1,321 @@
+# Released under the BSD license, see LICENSE for details
+
+"""
+Evaluate SPK type 2 and 3 (Chebyshev) data with numpy.
+
+An Ephemeris reads the Chebyshev records covering a time span from the
+loaded SPK files once and then computes geometric states for whole arrays
+of epochs, without going back to CSPICE:
+
+  mars = spice.spkcheb.Ephemeris('MARS', 'EARTH', first, last)
+  states = mars.state(ets)            # (N, 6), like spkgeo
+  positions = mars.position(ets)      # (N, 3)
+
+The records are evaluated with the same recurrences and record selection
+as CSPICE, so the results agree with spkgeo to round-off.  When the target
+and center are not in the same segment the states are combined through
+their common center, the way spkgeo does it.
+
+All the segments involved must be of type 2 or 3 and use the same inertial
+frame, which is the frame of the results (see the frame attribute).  At
+each epoch the segment used is the one of highest priority there, as in
+spkgeo, which takes the segment start times from the SPK files loaded with
+furnsh.  The kernels must not be unloaded while the Ephemeris is used,
+since it is not notified of it.
+"""
+
+import numpy
+
+# the wrappers are looked up by family, see lazy.py
+from lazy import wrappers as _spice
+
+# number of epochs evaluated at once
+_BLOCK_SIZE = 4096
+
+
+def _get_code(body):
+    if isinstance(body, basestring):
+        return _spice.bods2c(body)
+
+    return body
+
+
+def _is_same_segment(found, other):
+    # the descriptors are SpiceArray objects, which do not compare, when
+    # array returns are turned on
+    return found[0] == other[0] and tuple(found[1]) == tuple(other[1])
+
+
+def _get_descriptors(handle):
+    # dafgs and dafus are not wrapped, so the summary records are read
+    # directly: the next record, the previous record and the number of
+    # summaries, followed by the summaries
+    nd, ni, ifname, recno = _spice.dafrfr(handle)[:4]
+    size = nd + (ni + 1) // 2
+
+    while recno:
+        next, previous, count = _spice.dafgsr(handle, recno, 1, 3)
+        count = int(count)
+
+        if count:
+            words = tuple(_spice.dafgsr(handle, recno, 4, 3 + count * size))
+
+            for i in range(0, count * size, size):
+                yield words[i:i + size]
+
+        recno = int(next)
+
+
+def _get_starts(body):
+    # the start times of all the loaded segments for body, where a segment of
+    # higher priority than the one in use can take over
+    starts = set()
+
+    for i in range(_spice.ktotal('SPK')):
+        handle = _spice.kdata(i, 'SPK')[3]
+
+        for descr in _get_descriptors(handle):
+            values = _spice.spkuds(descr)
+
+            if values[0] == body:
+                starts.add(values[4])
+
+    return numpy.array(sorted(starts))
+
+
+class _Segment(object):
+    """The records of one SPK segment covering [first, last]."""
+
+    def __init__(self, handle, descr, first, last):
+        (body, self.center, self.frame, self.type, seg_first, seg_last,
+         begin, end) = _spice.spkuds(descr)
+
+        if self.type not in (2, 3):
+            raise ValueError('SPK segment for body %d has type %d, only '
+                             'types 2 and 3 can be evaluated' % \
+                             (body, self.type))
+
+        self.first = max(first, seg_first)
+        self.last = min(last, seg_last)
+
+        self.init, self.intlen, rsize, count = \
+            _spice.dafgda(handle, end - 3, end)
+        self.count = int(count)
+        rsize = int(rsize)
+
+        # only the records covering the span are read
+        self.offset = int(self._get_index(self.first))
+        stop = int(self._get_index(self.last)) + 1
+
+        data = _spice.dafgda(handle, begin + self.offset * rsize,
+                             begin + stop * rsize - 1)
+        records = numpy.array(data, dtype=float).reshape(stop - self.offset,
+                                                         rsize)
+
+        components = 3 if self.type == 2 else 6
+        self.mid = records[:, 0]
+        self.radius = records[:, 1]
+        self.coefficients = records[:, 2:].reshape(
+            len(records), components, (rsize - 2) // components)
+
+    def _get_index(self, ets):
+        # same record selection as SPKR02 and SPKR03, the last record also
+        # covers the end of the segment
+        index = numpy.floor((ets - self.init) / self.intlen).astype(int)
+
+        return numpy.clip(index, 0, self.count - 1)
+
+    def evaluate(self, ets, velocity):
+        index = self._get_index(ets) - self.offset
+
+        coefficients = self.coefficients[index]
+        radius = self.radius[index][:, None]
+        s = ((ets - self.mid[index]) / self.radius[index])[:, None]
+        s2 = 2.0 * s
+
+        if self.type == 3:
+            # CHBVAL on the position and velocity coefficients
+            w0 = w1 = 0.0
+
+            for j in range(coefficients.shape[2] - 1, 0, -1):
+                w0, w1 = coefficients[:, :, j] + (s2 * w0 - w1), w0
+
+            state = s * w0 - w1 + coefficients[:, :, 0]
+
+            return state if velocity else state[:, :3]
+
+        # CHBINT on the position coefficients
+        w0 = w1 = dw0 = dw1 = 0.0
+
+        for j in range(coefficients.shape[2] - 1, 0, -1):
+            w0, w1 = coefficients[:, :, j] + (s2 * w0 - w1), w0
+            dw0, dw1 = w1 * 2.0 + dw0 * s2 - dw1, dw0
+
+        position = coefficients[:, :, 0] + (s * w0 - w1)
+
+        if not velocity:
+            return position
+
+        return numpy.hstack((position, (w0 + s * dw0 - dw1) / radius))
+
+
+class _Link(object):
+    """The segments giving the state of body relative to its center."""
+
+    def __init__(self, body, first, last):
+        self.body = body
+        self.segments = []
+
+        starts = _get_starts(body)
+        et = first
+        found = _spice.spksfs(body, et)
+
+        while True:
+            if found is None:
+                raise ValueError('no SPK segment for body %d at %r' % \
+                                 (body, et))
+
+            # the piece ends where a segment of higher priority starts
+            end = min(last, _spice.spkuds(found[1])[5])
+
+            for start in starts[(starts > et) & (starts <= end)]:
+                other = _spice.spksfs(body, start)
+
+                if other is not None and not _is_same_segment(other, found):
+                    end = start
+                    break
+
+            segment = _Segment(found[0], found[1], et, end)
+
+            if self.segments and segment.center != self.segments[0].center:
+                raise ValueError('the center of body %d changes over the '
+                                 'time span' % body)
+
+            self.segments.append(segment)
+
+            if segment.last >= last:
+                break
+
+            # the next segment starts at the end of this one if it has a
+            # higher priority there, and right after it otherwise
+            et = segment.last
+            previous, found = found, _spice.spksfs(body, et)
+
+            if found is not None and _is_same_segment(found, previous):
+                et = numpy.nextafter(et, numpy.inf)
+                found = _spice.spksfs(body, et)
+
+        self.center = self.segments[0].center
+        self.starts = numpy.array([x.first for x in self.segments[1:]])
+
+    def evaluate(self, ets, velocity):
+        if len(self.segments) == 1:
+            return self.segments[0].evaluate(ets, velocity)
+
+        result = numpy.empty((len(ets), 6 if velocity else 3))
+        which = numpy.searchsorted(self.starts, ets, side='right')
+
+        for i, segment in enumerate(self.segments):
+            mask = which == i
+
+            if mask.any():
+                result[mask] = segment.evaluate(ets[mask], velocity)
+
+        return result
+
+
+def _add_states(links, ets, velocity):
+    total = 0.0
+
+    for i, link in enumerate(links):
+        state = link.evaluate(ets, velocity)
+        total = total + state if i else state
+
+    return total
+
+
+class Ephemeris(object):
+    """
+    Geometric states of target relative to center for epochs within
+    [first, last].  Bodies can be given by name or NAIF ID.
+    """
+
+    def __init__(self, target, center, first, last):
+        if first > last:
+            raise ValueError('first must not be after last')
+
+        self.target = _get_code(target)
+        self.center = _get_code(center)
+        self.first = first
+        self.last = last
+
+        self._links = {}
+        target_chain = self._get_chain(self.target)
+        center_chain = self._get_chain(self.center)
+
+        # the paths from the target and the center to their first common
+        # center, found the same way as in SPKGEO
+        target_nodes = [self.target] + [x.center for x in target_chain]
+        center_nodes = [self.center] + [x.center for x in center_chain]
+
+        for i, node in enumerate(center_nodes):
+            if node in target_nodes:
+                self.added = target_chain[:target_nodes.index(node)]
+                self.subtracted = center_chain[:i]
+                break
+        else:
+            raise ValueError('no SPK data connects bodies %d and %d' % \
+                             (self.target, self.center))
+
+        frames = set([segment.frame for link in self.added + self.subtracted
+                      for segment in link.segments])
+
+        if len(frames) > 1:
+            raise ValueError('the SPK segments use different frames')
+
+        self.frame = _spice.frmnam(frames.pop()) if frames else 'J2000'
+
+    def _get_chain(self, body):
+        # the links from body towards the solar system barycenter, as far as
+        # there is data at the start of the span
+        chain = []
+
+        while body != 0 and _spice.spksfs(body, self.first) is not None:
+            if body not in self._links:
+                self._links[body] = _Link(body, self.first, self.last)
+
+            chain.append(self._links[body])
+            body = self._links[body].center
+
+        return chain
+
+    def _evaluate(self, ets, velocity):
+        ets = numpy.asarray(ets, dtype=float)
+        scalar = ets.ndim == 0
+        ets = numpy.atleast_1d(ets)
+
+        if ets.size and (ets.min() < self.first or ets.max() > self.last):
+            raise ValueError('epochs outside of [%r, %r]' % \
+                             (self.first, self.last))
+
+        result = numpy.empty((len(ets), 6 if velocity else 3))
+
+        # blocks of epochs keep the gathered coefficients in the cache
+        for start in range(0, len(ets), _BLOCK_SIZE):
+            block = ets[start:start + _BLOCK_SIZE]
+
+            # summed in the same order as SPKGEO
+            target = _add_states(self.added, block, velocity)
+            center = _add_states(self.subtracted, block, velocity)
+
+            result[start:start + _BLOCK_SIZE] = target - center
+
+        return result[0] if scalar else result
+
+    def state(self, ets):
+        """Return the (N, 6) states at the epochs ets."""
+        return self._evaluate(ets, True)
+
+    def position(self, ets):
+        """Return the (N, 3) positions at the epochs ets."""
+        return self._evaluate(ets, False)
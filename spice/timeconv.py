@@ -0,0 +1,398 @@
+# Released under the BSD license, see LICENSE for details
+
+"""
+Convert arrays of UTC times to and from ephemeris time with numpy.
+
+A TimeConverter reads the leap seconds and the TDB constants from the
+kernel pool once, so a leapseconds kernel must be loaded first:
+
+  spice.furnsh('naif0012.tls')
+  times = spice.timeconv.TimeConverter()
+
+  ets = times.str2et(['2017-01-01T00:00:00.5', '2017-001T12:00:00'])
+  strings = times.et2utc(ets, 'ISOC', 3)
+  ets = times.datetime2et(numpy.array(['2017-01-01T00:00'], 'datetime64[ns]'))
+
+The string conversions handle the ISOC, ISOD and C formats of et2utc, which
+are also the formats str2et accepts here.  The conversions use the same
+constants and formulas as CSPICE, in the same order: the seconds of the
+day, with their fraction, are added once to the whole seconds from J2000
+and TAI-UTC, then DELTA_T_A and the periodic TDB term are added as in
+UNITIM.  The strings of et2utc are the same as those of spice.et2utc, and
+the results of str2et are within two units in the last place (ULP) of
+those of spice.str2et.  They can only differ by the rounding of the sine
+functions of numpy and of the C library, and by the conversion of the
+decimal seconds to a double.
+
+datetime64 values and unix times have no leap seconds, so the times within
+a leap second are converted to the first instant of the following day.
+The converter is not notified when the kernel pool changes, so it has to be
+created again after loading another leapseconds kernel.
+"""
+
+import numpy
+
+# the wrappers are looked up by family, see lazy.py
+from lazy import wrappers as _spice
+
+# the pictures of the supported string formats, the fields are the year
+# (YYYY), the month (MM or MON), the day of the month (DD), the day of the
+# year (DOY), the hour (HH), the minutes (MN) and the seconds (SC), which
+# may be followed by a fraction
+_FORMATS = {
+    'ISOC': 'YYYY-MM-DDTHH:MN:SC',
+    'ISOD': 'YYYY-DOYTHH:MN:SC',
+    'C': 'YYYY MON DD HH:MN:SC',
+}
+
+_MONTHS = numpy.array([[ord(c) for c in name] for name in
+                       ('JAN', 'FEB', 'MAR', 'APR', 'MAY', 'JUN',
+                        'JUL', 'AUG', 'SEP', 'OCT', 'NOV', 'DEC')])
+
+# days from 1970-01-01 to 2000-01-01
+_UNIX_DAYS = 10957
+
+# number of values read from the kernel pool at once
+_POOL_ROOM = 100
+
+
+def _get_pool(name):
+    values = []
+
+    while True:
+        found = _spice.gdpool(name, sum([len(x) for x in values]), _POOL_ROOM)
+
+        if found is None:
+            if values:
+                break
+
+            raise ValueError('%s is not in the kernel pool, a leapseconds '
+                             'kernel has to be loaded' % name)
+
+        values.append(numpy.asarray(found[1], dtype=float))
+
+        if found[0] < _POOL_ROOM:
+            break
+
+    return numpy.concatenate(values)
+
+
+def _days_from_civil(year, month, day):
+    # days from 2000-01-01 in the proleptic gregorian calendar
+    year = year - (month <= 2)
+    era = year // 400
+    yoe = year - era * 400
+    doy = (153 * ((month + 9) % 12) + 2) // 5 + day - 1
+    doe = yoe * 365 + yoe // 4 - yoe // 100 + doy
+
+    return era * 146097 + doe - 730425
+
+
+def _civil_from_days(days):
+    # the inverse of _days_from_civil
+    days = days + 730425
+    era = days // 146097
+    doe = days - era * 146097
+    yoe = (doe - doe // 1460 + doe // 36524 - doe // 146096) // 365
+    doy = doe - (365 * yoe + yoe // 4 - yoe // 100)
+    mp = (5 * doy + 2) // 153
+    day = doy - (153 * mp + 2) // 5 + 1
+    month = numpy.where(mp < 10, mp + 3, mp - 9)
+
+    return yoe + era * 400 + (month <= 2), month, day
+
+
+def _get_codes(strings):
+    # the (N, width) character codes of a string array
+    if strings.dtype.kind == 'S':
+        code_type = numpy.uint8
+    elif strings.dtype.kind == 'U':
+        code_type = numpy.uint32
+    else:
+        raise TypeError('times must be strings')
+
+    strings = numpy.ascontiguousarray(strings.reshape(-1))
+    width = strings.dtype.itemsize // numpy.dtype(code_type).itemsize
+
+    return strings.view(code_type).reshape(len(strings), width)
+
+
+def _get_number(codes, column, width):
+    number = 0
+    valid = True
+
+    for i in range(column, column + width):
+        digit = codes[:, i].astype(numpy.int64) - ord('0')
+        valid = valid & (digit >= 0) & (digit <= 9)
+        number = number * 10 + digit
+
+    return number, valid
+
+
+def _put_number(chars, column, width, number):
+    for i in range(column + width - 1, column - 1, -1):
+        chars[:, i] = ord('0') + number % 10
+        number = number // 10
+
+
+class TimeConverter(object):
+    """
+    Conversions between UTC and ephemeris time (TDB) for arrays of times,
+    using the leapseconds kernel loaded when the converter is created.
+    """
+
+    def __init__(self):
+        self.delta_t_a = _get_pool('DELTET/DELTA_T_A')[0]
+        self.k = _get_pool('DELTET/K')[0]
+        self.eb = _get_pool('DELTET/EB')[0]
+        self.m0, self.m1 = _get_pool('DELTET/M')[:2]
+
+        # DELTA_AT holds pairs of TAI-UTC and the UTC epoch from which it
+        # applies, which is the start of a day
+        table = _get_pool('DELTET/DELTA_AT').reshape(-1, 2)
+        self._deltas = numpy.rint(table[:, 0]).astype(numpy.int64)
+        self._days = numpy.rint((table[:, 1] + 43200.0) / 86400.0).astype(
+            numpy.int64)
+
+        # the UTC and TAI seconds past J2000 at which each TAI-UTC applies
+        self._epochs = (self._days * 86400 - 43200).astype(float)
+        self._starts = self._epochs + self._deltas
+
+    def _get_day_length(self, days):
+        # the days before a leap second have 86401 seconds
+        return 86400 + numpy.isin(days + 1, self._days[1:])
+
+    def _utc_to_et(self, days, seconds):
+        # days from 2000-01-01 and the seconds of the day, which are past
+        # 86400 within a leap second
+        index = numpy.searchsorted(self._days, days, side='right') - 1
+        deltas = self._deltas[numpy.maximum(index, 0)]
+
+        # the seconds of the day are added to the exact whole seconds from
+        # J2000 to the start of the day in TAI, like TTRANS does
+        tai = (days * 86400 - 43200 + deltas).astype(float) + seconds
+        tdt = tai + self.delta_t_a
+        m = self.m0 + self.m1 * tdt
+
+        return tdt + self.k * numpy.sin(m + self.eb * numpy.sin(m))
+
+    def _et_to_utc(self, ets):
+        # the days from 2000-01-01 and the seconds of the day, which are at
+        # least 86400 within a leap second
+        tdt = ets
+
+        # same fixed point iteration as UNITIM
+        for i in range(3):
+            m = self.m0 + self.m1 * tdt
+            tdt = ets - self.k * numpy.sin(m + self.eb * numpy.sin(m))
+
+        tai = tdt - self.delta_t_a
+        index = numpy.maximum(
+            numpy.searchsorted(self._starts, tai, side='right') - 1, 0)
+        utc = tai - self._deltas[index]
+
+        days = numpy.floor((utc + 43200.0) / 86400.0).astype(numpy.int64)
+        seconds = utc - (days * 86400 - 43200)
+
+        # the second before the next TAI-UTC applies is a leap second, which
+        # belongs to the previous day
+        following = numpy.minimum(index + 1, len(self._days) - 1)
+        leap = (index + 1 < len(self._days)) & \
+            (utc >= self._epochs[following])
+        days = days - leap
+        seconds = seconds + 86400 * leap
+
+        return days, seconds
+
+    def _round(self, ets, scale):
+        # the days and the seconds of the day in units of 1 / scale seconds
+        days, seconds = self._et_to_utc(numpy.asarray(ets, dtype=float))
+        units = numpy.floor(seconds * scale + 0.5).astype(numpy.int64)
+
+        length = self._get_day_length(days) * scale
+        following = units >= length
+
+        return days + following, units - length * following
+
+    def str2et(self, strings):
+        """
+        Return the ephemeris times of UTC strings in the ISOC, ISOD or C
+        format of et2utc, e.g. '2017-01-01T12:00:00.5', '2017-001T12:00:00'
+        or '2017 JAN 01 12:00:00.5'.
+        """
+
+        strings = numpy.asarray(strings)
+        codes = _get_codes(strings)
+        ets = numpy.empty(len(codes))
+        done = numpy.zeros(len(codes), dtype=bool)
+
+        for picture in _FORMATS.values():
+            if codes.shape[1] < len(picture):
+                continue
+
+            # the separators decide which format a string has
+            selected = ~done
+
+            for i, c in enumerate(picture):
+                if not c.isalpha():
+                    selected &= codes[:, i] == ord(c)
+
+            if selected.any():
+                ets[selected] = self._parse(strings.reshape(-1)[selected],
+                                            picture)
+                done |= selected
+
+        if not done.all():
+            raise ValueError("'%s' is not in a supported format" % \
+                             strings.reshape(-1)[~done][0])
+
+        return ets.reshape(strings.shape)[()]
+
+    def _parse(self, strings, picture):
+        codes = _get_codes(strings)
+        year, valid = _get_number(codes, picture.index('YYYY'), 4)
+        hour, valid_hour = _get_number(codes, picture.index('HH'), 2)
+        minute, valid_minute = _get_number(codes, picture.index('MN'), 2)
+        valid &= valid_hour & valid_minute & (hour < 24) & (minute < 60)
+
+        if 'DOY' in picture:
+            doy, valid_doy = _get_number(codes, picture.index('DOY'), 3)
+            days = _days_from_civil(year, 1, 1) + doy - 1
+            valid &= valid_doy & (doy >= 1) & \
+                (doy <= _days_from_civil(year + 1, 1, 1) -
+                 _days_from_civil(year, 1, 1))
+        else:
+            if 'MON' in picture:
+                column = picture.index('MON')
+                names = codes[:, column:column + 3].astype(numpy.int64)
+                # upper case letters
+                names -= 32 * ((names >= ord('a')) & (names <= ord('z')))
+                matches = (names[:, None, :] == _MONTHS).all(axis=2)
+                month = matches.argmax(axis=1) + 1
+                valid &= matches.any(axis=1)
+            else:
+                month, valid_month = _get_number(codes, picture.index('MM'),
+                                                 2)
+                valid &= valid_month & (month >= 1) & (month <= 12)
+
+            day, valid_day = _get_number(codes, picture.index('DD'), 2)
+            days = _days_from_civil(year, month, day)
+            valid &= valid_day & (day >= 1) & \
+                (day <= _days_from_civil(year + month // 12, month % 12 + 1,
+                                         1) - _days_from_civil(year, month, 1))
+
+        # the seconds with their fraction, only followed by padding
+        column = picture.index('SC')
+        whole, valid_seconds = _get_number(codes, column, 2)
+        rest = codes[:, column + 2:]
+        valid &= valid_seconds
+        valid &= ((rest[:, :1] == ord('.')) | (rest[:, :1] == 0)).all(axis=1)
+        valid &= (((rest[:, 1:] >= ord('0')) & (rest[:, 1:] <= ord('9'))) |
+                  (rest[:, 1:] == 0)).all(axis=1)
+
+        # leap seconds end the last minute of a day
+        valid &= (whole < 60) | ((whole == 60) & (hour == 23) & (minute == 59))
+
+        if not valid.all():
+            raise ValueError("'%s' is not a valid time" % strings[~valid][0])
+
+        # the seconds are read as one number, as TPARTV does, and added to
+        # the hours and minutes in seconds
+        seconds = numpy.ascontiguousarray(codes[:, column:]).view(
+            strings.dtype.kind + str(codes.shape[1] - column))[:, 0]
+        seconds = (hour * 3600 + minute * 60).astype(float) + \
+            seconds.astype(float)
+
+        return self._utc_to_et(days, seconds)
+
+    def et2utc(self, ets, format, prec):
+        """
+        Return the UTC strings of ephemeris times in the ISOC, ISOD or C
+        format, with prec decimals (0 to 9) for the seconds.
+        """
+
+        if format not in _FORMATS:
+            raise ValueError('format must be one of %s' % \
+                             ', '.join(sorted(_FORMATS)))
+
+        if not 0 <= prec <= 9:
+            raise ValueError('prec must be between 0 and 9')
+
+        ets = numpy.asarray(ets, dtype=float)
+        scale = 10 ** prec
+        days, units = self._round(ets.reshape(-1), scale)
+        year, month, day = _civil_from_days(days)
+
+        # within a leap second the seconds count past 59
+        seconds = units // scale
+        hour = numpy.minimum(seconds // 3600, 23)
+        minute = numpy.minimum((seconds - hour * 3600) // 60, 59)
+        seconds = seconds - hour * 3600 - minute * 60
+
+        picture = _FORMATS[format]
+        if prec:
+            picture += '.' + '0' * prec
+
+        chars = numpy.empty((len(days), len(picture)), dtype=numpy.uint8)
+        chars[:] = [ord(c) for c in picture]
+
+        _put_number(chars, picture.index('YYYY'), 4, year)
+        _put_number(chars, picture.index('HH'), 2, hour)
+        _put_number(chars, picture.index('MN'), 2, minute)
+        _put_number(chars, picture.index('SC'), 2, seconds)
+
+        if prec:
+            _put_number(chars, len(picture) - prec, prec, units % scale)
+
+        if 'DOY' in picture:
+            _put_number(chars, picture.index('DOY'), 3,
+                        days - _days_from_civil(year, 1, 1) + 1)
+        else:
+            if 'MON' in picture:
+                column = picture.index('MON')
+                chars[:, column:column + 3] = _MONTHS[month - 1]
+            else:
+                _put_number(chars, picture.index('MM'), 2, month)
+
+            _put_number(chars, picture.index('DD'), 2, day)
+
+        return chars.view('S%d' % len(picture)).reshape(ets.shape)[()]
+
+    def datetime2et(self, times):
+        """Return the ephemeris times of UTC datetime64 values."""
+        times = numpy.asarray(times, dtype='datetime64[ns]')
+        ns = times.view(numpy.int64)
+
+        days = ns // 86400000000000
+        ns = ns - days * 86400000000000
+        ets = self._utc_to_et(days - _UNIX_DAYS, ns / 1e9)
+
+        return numpy.where(numpy.isnat(times), numpy.nan, ets)[()]
+
+    def et2datetime(self, ets):
+        """Return the ephemeris times as UTC datetime64[ns] values."""
+        ets = numpy.asarray(ets, dtype=float)
+        days, units = self._round(ets, 1000000000)
+
+        # datetime64 has no leap seconds
+        leap = units >= 86400000000000
+        days = days + leap
+        units = units * ~leap
+
+        ns = (days + _UNIX_DAYS) * 86400000000000 + units
+
+        return ns.view('datetime64[ns]')[()]
+
+    def unix2et(self, times):
+        """Return the ephemeris times of unix times in seconds."""
+        times = numpy.asarray(times, dtype=float)
+        days = numpy.floor(times / 86400.0).astype(numpy.int64)
+
+        return self._utc_to_et(days - _UNIX_DAYS, times - days * 86400.0)[()]
+
+    def et2unix(self, ets):
+        """Return the ephemeris times as unix times in seconds."""
+        days, seconds = self._et_to_utc(numpy.asarray(ets, dtype=float))
+
+        return ((days + _UNIX_DAYS) * 86400.0 +
+                numpy.minimum(seconds, 86400.0))[()]
@@ -0,0 +1,90 @@
+# Released under the BSD license, see LICENSE for details
+
+"""
+Timelines of the calls to the wrapped functions, in the Chrome trace event
+format read by chrome://tracing and Perfetto.
+
+Tracing needs the extension built with PYSPICE_STATS set, see spice.stats().
+Every call made while tracing is recorded with its start, duration, thread
+and whether it raised, in a ring buffer of fixed size in the extension:
+
+  spice.tracing.start()
+  handle_request()
+  spice.tracing.write('request.json')
+
+The oldest calls are overwritten when more than capacity calls are made
+between two drains.  The timestamps are microseconds of time.time(), so
+the events line up with application spans recorded on the same clock.
+"""
+
+import json, os, time
+
+import _spice
+
+# the number of calls kept by default
+CAPACITY = 65536
+
+
+def start(capacity=CAPACITY):
+    """
+    Start recording calls, in a new buffer of capacity calls.
+    """
+    _spice._trace_start(capacity)
+
+
+def stop():
+    """
+    Stop recording calls.  The calls recorded so far can still be drained.
+    """
+    _spice._trace_stop()
+
+
+def drain():
+    """
+    Return the calls recorded since the last drain as Chrome trace events,
+    oldest first, and empty the buffer.  If calls were overwritten, the
+    first event is an instant event saying how many.
+    """
+    # the offset from the clock of the extension to time.time()
+    offset = time.time() - _spice._trace_clock()
+    records, dropped = _spice._trace_drain()
+    pid = os.getpid()
+    events = []
+
+    if dropped:
+        first = records[0][1] + offset if records else time.time()
+
+        events.append({
+            'name': 'spice trace dropped %d calls' % dropped,
+            'ph': 'i',
+            's': 'p',
+            'ts': first * 1e6,
+            'pid': pid,
+            'tid': 0,
+        })
+
+    for name, start, duration, thread, error in records:
+        events.append({
+            'name': name,
+            'cat': 'spice',
+            'ph': 'X',
+            'ts': (start + offset) * 1e6,
+            'dur': duration * 1e6,
+            'pid': pid,
+            'tid': thread,
+            'args': {'error': error},
+        })
+
+    return events
+
+
+def write(path, events=None):
+    """
+    Write events, by default those returned by drain(), to the JSON trace
+    file at path.
+    """
+    if events is None:
+        events = drain()
+
+    with open(path, 'w') as f:
+        json.dump({'traceEvents': events, 'displayTimeUnit': 'ns'}, f)
@@ -0,0 +1,108 @@
+# Released under the BSD license, see LICENSE for details
+
+"""
+Array-aware variants of the spice functions that take an epoch.
+
+Each function takes the same arguments as its counterpart in the spice
+module, except that the epoch (et or sclkdp) may be a sequence or any
+float64 buffer such as a numpy array.  The loop over the epochs runs in C
+and every output comes back as an array with one row per epoch, e.g.:
+
+  states, lts = spice.vec.spkezr('MARS', ets, 'J2000', 'NONE', 'EARTH')
+
+returns an (N, 6) array of states and an (N,) array of light times.
+
+The outputs are numpy arrays sharing the memory CSPICE wrote into when
+numpy is installed, and SpiceArray buffers otherwise.
+
+By default the first epoch whose call fails raises its SpiceException and
+the results of the other epochs are lost.  With errors="mask" the error is
+reset and the call goes on with the next epoch:
+
+  states, lts, failed, codes = spice.vec.spkezr(
+      'MARS', ets, 'J2000', 'NONE', 'EARTH', errors='mask')
+
+The outputs of the failed epochs are NaN (0 for integer and string
+outputs), and two arrays follow them: a boolean mask that is True for the
+failed epochs and the short error message of each epoch, e.g.
+'SPICE(SPKINSUFFDATA)', or an empty string where the call succeeded.
+
+Like the functions of the spice package, the array functions of a family
+are only created when one of them is first looked up, see lazy.py.
+"""
+
+import sys as _sys, types as _types
+
+import _spice
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def _make_function(name, function, masked):
+    def wrapper(*args, **kwargs):
+        errors = kwargs.pop('errors', 'raise')
+
+        if kwargs:
+            raise TypeError("%s() got an unexpected keyword argument '%s'" % \
+                            (name, kwargs.keys()[0]))
+
+        if errors == 'raise':
+            result = function(*args)
+        elif errors == 'mask':
+            result = masked(*args)
+        else:
+            raise ValueError("errors must be 'raise' or 'mask', not %r" % errors)
+
+        if numpy is None:
+            return result
+        elif isinstance(result, tuple):
+            return tuple([numpy.asarray(x) for x in result])
+        else:
+            return numpy.asarray(result)
+
+    wrapper.__name__ = name
+    wrapper.__doc__ = function.__doc__
+
+    return wrapper
+
+
+# the family of each array function
+_families = {}
+
+for _family, _names in _spice._vec_families.items():
+    for _name in _names.split():
+        _families[_name] = _family
+
+del _family, _names, _name
+
+
+class _Vec(_types.ModuleType):
+    """
+    The vec module.  The array functions are wrapped on first use.
+    """
+
+    def __getattr__(self, name):
+        if name not in _families:
+            raise AttributeError("'module' object has no attribute '%s'" % name)
+
+        module = _spice._load_vec_family(_families[name])
+        value = _make_function(name, getattr(module, name),
+                               getattr(module, '_masked_' + name))
+        setattr(self, name, value)
+
+        return value
+
+    def __dir__(self):
+        return sorted(set(self.__dict__) | set(_families))
+
+
+_vec = _Vec(__name__, __doc__)
+_vec.__dict__.update(globals())
+
+# python 2 clears the globals of a module when it is deleted, and the
+# functions of this module still use them
+_vec._module = _sys.modules[__name__]
+_sys.modules[__name__] = _vec
@@ -0,0 +1,128 @@
+# Released under the BSD license, see LICENSE for details
+
+"""
+Helpers for writing kernels from data that does not fit in memory.
+
+The spkw* functions take their records as (N, 6) state and (N,) epoch
+arrays, so a whole trajectory can be written at once from numpy arrays.
+When the trajectory comes from a propagator one piece at a time, the
+helpers below write consecutive segments as the pieces arrive and only
+ever hold the current piece plus a few records carried over from the
+previous one.
+"""
+
+# the wrappers are looked up by family, see lazy.py
+from lazy import wrappers as _spice
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def _concatenate(head, tail):
+    if head is None:
+        return tail
+    elif numpy is not None and (isinstance(head, numpy.ndarray) or
+                                isinstance(tail, numpy.ndarray)):
+        return numpy.concatenate((head, tail))
+    else:
+        return list(head) + list(tail)
+
+
+def write_spk_segments(handle, body, center, frame, segid, degree, chunks,
+                       writer=None):
+    """
+    Write (epochs, states) pieces from chunks into consecutive SPK segments.
+
+    chunks is any iterable, typically a generator, of (epochs, states)
+    pairs in increasing time order.  writer is spkw13 by default and may be
+    any writer taking the same arguments, such as spkw09.
+
+    Each segment stops a few records before the end of the data it was
+    given and the next segment starts there, so the segments cover the
+    whole trajectory without gaps and every interpolation window is
+    centered on real records.  Returns the number of segments written.
+    """
+    if writer is None:
+        writer = _spice.spkw13
+
+    pad = degree // 2 + 1
+    epochs = states = start = None
+    count = 0
+
+    for chunk_epochs, chunk_states in chunks:
+        epochs = _concatenate(epochs, chunk_epochs)
+        states = _concatenate(states, chunk_states)
+
+        if len(epochs) < 2 * pad + 2:
+            continue
+
+        end = len(epochs) - pad - 1
+        first = epochs[0] if start is None else start
+
+        writer(handle, body, center, frame, first, epochs[end], segid, degree,
+               states, epochs)
+
+        start = epochs[end]
+        epochs = epochs[end - pad:]
+        states = states[end - pad:]
+        count += 1
+
+    if epochs is not None and (start is None or epochs[-1] > start):
+        first = epochs[0] if start is None else start
+
+        writer(handle, body, center, frame, first, epochs[-1], segid, degree,
+               states, epochs)
+
+        count += 1
+
+    return count
+
+
+def _interval_starts(sclkdp, gap):
+    if gap is None:
+        return [sclkdp[0]]
+    elif numpy is not None and isinstance(sclkdp, numpy.ndarray):
+        return numpy.concatenate((sclkdp[:1],
+                                  sclkdp[1:][numpy.diff(sclkdp) > gap]))
+    else:
+        return [sclkdp[0]] + [b for a, b in zip(sclkdp, sclkdp[1:])
+                              if b - a > gap]
+
+
+def write_ck_segments(handle, inst, ref, avflag, segid, chunks, gap=None):
+    """
+    Write (sclkdp, quats, avvs) pieces from chunks into consecutive type 3
+    CK segments.
+
+    chunks is any iterable, typically a generator, of telemetry pieces in
+    increasing clock order: (N,) encoded SCLK, (N, 4) quaternions and
+    (N, 3) angular velocities, as taken by ckw03.  The last record of each
+    piece is repeated at the start of the next segment, so pointing can be
+    interpolated across the segment boundaries.
+
+    If gap is given, a new interpolation interval starts wherever two
+    records are more than gap ticks apart, and no record is carried across
+    such a gap.  Otherwise every segment is a single interval.  Returns the
+    number of segments written.
+    """
+    last = None
+    count = 0
+
+    for sclkdp, quats, avvs in chunks:
+        if not len(sclkdp):
+            continue
+
+        if last is not None and (gap is None or sclkdp[0] - last[0] <= gap):
+            sclkdp = _concatenate([last[0]], sclkdp)
+            quats = _concatenate([last[1]], quats)
+            avvs = _concatenate([last[2]], avvs)
+
+        _spice.ckw03(handle, sclkdp[0], sclkdp[-1], inst, ref, avflag, segid,
+                     sclkdp, quats, avvs, _interval_starts(sclkdp, gap))
+
+        last = (sclkdp[-1], tuple(quats[-1]), tuple(avvs[-1]))
+        count += 1
+
+    return count
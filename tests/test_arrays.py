@@ -0,0 +1,57 @@
+# Released under the BSD license, see LICENSE for details
+
+import unittest
+
+import spice
+
+class ArrayReturnsTestCase(unittest.TestCase):
+    def tearDown(self):
+        spice.set_array_returns(False)
+
+    def test_tuple_returns(self):
+        rotation = spice.pxform('J2000', 'ECLIPJ2000', 0.0)
+
+        self.assertTrue(isinstance(rotation, tuple))
+        self.assertEqual(len(rotation), 3)
+        self.assertTrue(isinstance(rotation[0], tuple))
+
+    def test_array_returns(self):
+        expected = spice.pxform('J2000', 'ECLIPJ2000', 0.0)
+
+        self.assertFalse(spice.set_array_returns(True))
+
+        rotation = spice.pxform('J2000', 'ECLIPJ2000', 0.0)
+
+        self.assertTrue(isinstance(rotation, spice.SpiceArray))
+        self.assertEqual(rotation.shape, (3, 3))
+        self.assertEqual(memoryview(rotation).format, 'd')
+        self.assertEqual(rotation.tolist(), [list(row) for row in expected])
+
+        self.assertTrue(spice.set_array_returns(False))
+
+    def test_buffer_inputs(self):
+        rotation = spice.pxform('J2000', 'ECLIPJ2000', 0.0)
+        vector = (1.0, 2.0, 3.0)
+
+        expected = spice.mxv(rotation, vector)
+
+        spice.set_array_returns(True)
+        rotation_array = spice.pxform('J2000', 'ECLIPJ2000', 0.0)
+        vector_array = spice.vhat(vector)
+        spice.set_array_returns(False)
+
+        self.assertEqual(spice.mxv(rotation_array, vector), expected)
+        self.assertEqual(spice.mxv(rotation, [1, 2, 3]), expected)
+        self.assertEqual(spice.mxv(rotation_array, memoryview(vector_array)),
+                         spice.mxv(rotation, spice.vhat(vector)))
+
+    def test_bad_array_inputs(self):
+        rotation = spice.pxform('J2000', 'ECLIPJ2000', 0.0)
+
+        self.assertRaises(ValueError, spice.mxv, rotation, (1.0, 2.0))
+        self.assertRaises(ValueError, spice.mxv, rotation[:2], (1.0, 2.0, 3.0))
+        self.assertRaises(TypeError, spice.mxv, rotation, ('a', 'b', 'c'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,161 @@
+# Released under the BSD license, see LICENSE for details
+
+import os, shutil, struct, tempfile, threading, unittest
+
+import spice
+
+def write_spk(path, body, velocity):
+    handle = spice.spkopn(path, 'test', 0)
+    epochs = [0.0, 100.0, 200.0, 300.0]
+    states = [(velocity * et, 0.0, 0.0, velocity, 0.0, 0.0) for et in epochs]
+
+    spice.spkw09(handle, body, 399, 'J2000', 0.0, 300.0, 'test', 1, states,
+                 epochs)
+    spice.spkcls(handle)
+
+def write_pck(path, ra, dec, w):
+    # constant orientation of the ITRF93 frame (class id 3000)
+    handle = spice.pckopn(path, 'test', 0)
+
+    spice.pckw02(handle, 3000, 'J2000', 0.0, 300.0, 'test', 300.0, 0,
+                 [(ra, dec, w)], 0.0)
+    spice.pckcls(handle)
+
+# a TK frame rotated from J2000 by the angle given in degrees
+TK_FRAME = """
+FRAME_TEST_TK = 1400999
+FRAME_1400999_NAME = 'TEST_TK'
+FRAME_1400999_CLASS = 4
+FRAME_1400999_CLASS_ID = 1400999
+FRAME_1400999_CENTER = 399
+TKFRAME_1400999_RELATIVE = 'J2000'
+TKFRAME_1400999_SPEC = 'ANGLES'
+TKFRAME_1400999_UNITS = 'DEGREES'
+TKFRAME_1400999_AXES = ( 3, 1, 3 )
+TKFRAME_1400999_ANGLES = ( 0.0, 0.0, %r )
+"""
+
+class CacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.slow = os.path.join(self.directory, 'slow.bsp')
+        self.fast = os.path.join(self.directory, 'fast.bsp')
+
+        write_spk(self.slow, -1000, 1.0)
+        write_spk(self.fast, -1000, 2.0)
+
+        spice.furnsh(self.slow)
+        spice.cache.enable(2)
+        spice.cache.clear()
+
+    def tearDown(self):
+        spice.cache.disable()
+        spice.unload(self.slow)
+        spice.unload(self.fast)
+        shutil.rmtree(self.directory)
+
+    def position(self, et):
+        return spice.spkpos('-1000', et, 'J2000', 'NONE', '399')[0][0]
+
+    def test_hits(self):
+        self.assertEqual(self.position(10.0), 10.0)
+        self.assertEqual(self.position(10.0), 10.0)
+        self.assertEqual(self.position(20.0), 20.0)
+        self.assertEqual(spice.cache.info(), (1, 2, 2, 2))
+
+        # et=10 is the least recently used result
+        self.position(30.0)
+        self.position(20.0)
+        self.position(10.0)
+        self.assertEqual(spice.cache.info(), (2, 4, 2, 2))
+
+    def test_flush(self):
+        self.assertEqual(self.position(10.0), 10.0)
+
+        spice.furnsh(self.fast)
+        self.assertEqual(self.position(10.0), 20.0)
+
+        spice.unload(self.fast)
+        self.assertEqual(self.position(10.0), 10.0)
+        self.assertEqual(spice.cache.info().hits, 0)
+
+    def test_pck(self):
+        first = os.path.join(self.directory, 'first.bpc')
+        second = os.path.join(self.directory, 'second.bpc')
+
+        write_pck(first, 0.5, 0.0, 0.0)
+        write_pck(second, 0.5, 0.0, 1.0)
+
+        def position():
+            return spice.spkpos('-1000', 10.0, 'ITRF93', 'NONE', '399')[0]
+
+        handle = spice.pcklof(first)
+        before = position()
+        self.assertEqual(position(), before)
+        self.assertEqual(spice.cache.info().hits, 1)
+
+        # the second file takes precedence
+        other = spice.pcklof(second)
+        self.assertNotEqual(position(), before)
+
+        spice.pckuof(other)
+        self.assertEqual(position(), before)
+
+        spice.pckuof(handle)
+        self.assertRaises(spice.SpiceException, position)
+
+    def test_lmpool(self):
+        def position():
+            return spice.spkpos('-1000', 10.0, 'TEST_TK', 'NONE', '399')[0]
+
+        try:
+            spice.lmpool((TK_FRAME % 90.0).splitlines())
+            before = position()
+            self.assertEqual(position(), before)
+
+            spice.lmpool((TK_FRAME % 45.0).splitlines())
+            self.assertNotEqual(position(), before)
+        finally:
+            spice.clpool()
+
+    def test_array_returns(self):
+        spice.set_array_returns(True)
+
+        try:
+            position = spice.spkpos('-1000', 10.0, 'J2000', 'NONE', '399')[0]
+            memoryview(position)[0] = struct.pack('d', -1.0)
+
+            self.assertEqual(self.position(10.0), 10.0)
+            self.assertEqual(self.position(10.0), 10.0)
+            self.assertEqual(spice.cache.info().hits, 2)
+        finally:
+            spice.set_array_returns(False)
+
+    def test_threads(self):
+        def run():
+            for i in range(100):
+                self.position(10.0 * (i % 3))
+
+        threads = [threading.Thread(target=run) for i in range(4)]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        info = spice.cache.info()
+        self.assertEqual(info.hits + info.misses, 400)
+        self.assertEqual(info.currsize, 2)
+
+    def test_uncached(self):
+        self.assertRaises(spice.SpiceException, self.position, 1000.0)
+        self.assertEqual(spice.cache.info().currsize, 0)
+
+        spice.cache.disable()
+        self.assertEqual(self.position(10.0), 10.0)
+        self.assertEqual(spice.cache.info(), (0, 0, 0, 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+# Released under the BSD license, see LICENSE for details
+
+import struct, unittest
+
+import spice
+from spice import Cell
+
+class CellTestCase(unittest.TestCase):
+    def test_window(self):
+        window = Cell.double(10)
+
+        spice.wninsd(1.0, 2.0, window)
+        spice.wninsd(5.0, 8.0, window)
+
+        self.assertEqual(window.card, 4)
+        self.assertEqual(spice.wncard(window), 2)
+        self.assertEqual(window.intervals.tolist(), [[1.0, 2.0], [5.0, 8.0]])
+        self.assertEqual(spice.wnfetd(window, 1), (5.0, 8.0))
+
+        result = Cell.double(10)
+        spice.wncomd(0.0, 10.0, window, result)
+
+        self.assertEqual(list(result), [0.0, 1.0, 2.0, 5.0, 8.0, 10.0])
+
+    def test_view(self):
+        window = Cell.double(4)
+        spice.scard(4, window)
+
+        # the data view shares memory with the cell
+        struct.pack_into('4d', window.data, 0, 3.0, 4.0, 1.0, 2.0)
+        spice.wnvald(4, 4, window)
+
+        self.assertEqual(window.intervals.tolist(), [[1.0, 2.0], [3.0, 4.0]])
+
+    def test_char_cell(self):
+        names = Cell.char(5, 10)
+
+        spice.insrtc('abc', names)
+        spice.insrtc('aaa', names)
+
+        self.assertEqual(list(names), ['aaa', 'abc'])
+        self.assertEqual(memoryview(names.data).format, '10s')
+
+    def test_int_cell(self):
+        ids = Cell.int(5)
+
+        for i in (3, 1, 2):
+            spice.appndi(i, ids)
+
+        self.assertEqual(ids.data.tolist(), [3, 1, 2])
+        self.assertEqual(ids.dtype, Cell.SPICE_INT)
+
+    def test_errors(self):
+        window = Cell.double(2)
+
+        self.assertRaises(TypeError, spice.card, [1.0, 2.0])
+        self.assertRaises(ValueError, spice.ssize, 3, window)
+        self.assertRaises(ValueError, Cell, Cell.SPICE_CHR, 2, 1)
+        self.assertRaises(spice.SpiceException, spice.appndi, 1, window)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,25 @@
+# Released under the BSD license, see LICENSE for details
+
+import unittest
+
+import spice
+
+class DocsTestCase(unittest.TestCase):
+    def test_summary(self):
+        self.assertTrue("spice.doc('utc2et')" in spice.utc2et.__doc__)
+        self.assertTrue(len(spice.utc2et.__doc__) < 1000)
+
+    def test_doc(self):
+        doc = spice.doc('utc2et')
+
+        self.assertTrue('-Abstract' in doc)
+        self.assertTrue('-Detailed_Input' in doc)
+        self.assertEqual(spice.doc(spice.utc2et), doc)
+        self.assertEqual(spice.doc(spice.vec.spkezr), spice.doc('spkezr'))
+
+    def test_missing(self):
+        self.assertEqual(spice.doc('not_a_function'), '')
+
+
+if __name__ == '__main__':
+    unittest.main()
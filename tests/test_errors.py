@@ -0,0 +1,51 @@
+# Released under the BSD license, see LICENSE for details
+
+import unittest
+
+import spice
+
+class ErrorsTestCase(unittest.TestCase):
+    def fail_call(self):
+        try:
+            spice.furnsh('/dev/null')
+        except spice.SpiceException as e:
+            return e
+
+        self.fail('furnsh did not raise')
+
+    def test_class(self):
+        error = self.fail_call()
+
+        self.assertTrue(error.short.startswith('SPICE('))
+        self.assertTrue(type(error) is spice.errors.get(error.short))
+        self.assertTrue(type(error) is getattr(spice.errors, error.short[6:-1]))
+        self.assertTrue(issubclass(type(error), spice.SpiceException))
+
+    def test_details(self):
+        error = self.fail_call()
+
+        self.assertTrue(error.long_message)
+        self.assertTrue('furnsh' in error.spice_traceback.lower())
+        self.assertEqual(str(error), '%s -- %s' % (error.short,
+                                                   error.long_message))
+
+    def test_history(self):
+        first = self.fail_call()
+
+        for i in range(100):
+            self.fail_call()
+
+        # the details are gone, the short message is still there
+        self.assertEqual(first.long_message, None)
+        self.assertEqual(str(first), first.short)
+
+    def test_user_exception(self):
+        error = spice.SpiceException('testing')
+
+        self.assertEqual(str(error), 'testing')
+        self.assertEqual(error.short, None)
+        self.assertEqual(error.long_message, None)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+# Released under the BSD license, see LICENSE for details
+
+import math, unittest
+
+import spice
+from spice import Cell
+
+class CallbackTestCase(unittest.TestCase):
+    def setUp(self):
+        self.cnfine = Cell.double(2)
+        spice.wninsd(0.0, 10000.0, self.cnfine)
+
+    def sine(self, et):
+        return math.sin(et / 1000.0)
+
+    def test_gfuds(self):
+        result = Cell.double(20)
+
+        spice.gfuds(self.sine, None, '>', 0.5, 0.0, 100.0, 100, self.cnfine, result)
+
+        intervals = result.intervals.tolist()
+        expected = [[math.pi / 6, 5 * math.pi / 6],
+                    [13 * math.pi / 6, 17 * math.pi / 6]]
+
+        self.assertEqual(len(intervals), 2)
+
+        for interval, (left, right) in zip(intervals, expected):
+            self.assertAlmostEqual(interval[0], left * 1000.0, 3)
+            self.assertAlmostEqual(interval[1], right * 1000.0, 3)
+
+    def test_udqdec(self):
+        default = Cell.double(20)
+        result = Cell.double(20)
+
+        spice.gfuds(self.sine, None, '>', 0.5, 0.0, 100.0, 100, self.cnfine, default)
+        spice.gfuds(self.sine, lambda et: math.cos(et / 1000.0) < 0.0, '>', 0.5,
+                    0.0, 100.0, 100, self.cnfine, result)
+
+        self.assertEqual(result.data.tolist(), default.data.tolist())
+
+    def test_derivative(self):
+        self.assertAlmostEqual(spice.uddf(math.sin, 0.0, 1e-3), 1.0, 6)
+        self.assertTrue(spice.uddc(math.cos, 1.0, 1e-3))
+
+    def test_step_size(self):
+        spice.gfsstp(100.0)
+
+        # the step size is only set once the arguments are checked
+        self.assertRaises(ValueError, spice.gfevnt, 'DISTANCE', ['TARGET'],
+                          [], [], [], [], '>', 0.0, 1e-6, 0.0, False, 100,
+                          False, self.cnfine, Cell.double(20), 5.0)
+        self.assertEqual(spice.gfstep(0.0), 100.0)
+
+    def test_exception(self):
+        def udfuns(et):
+            raise KeyError(et)
+
+        self.assertRaises(KeyError, spice.gfuds, udfuns, None, '>', 0.5, 0.0,
+                          100.0, 100, self.cnfine, Cell.double(20))
+        self.assertFalse(spice.failed())
+
+        self.assertRaises(TypeError, spice.uddf, None, 0.0, 1.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
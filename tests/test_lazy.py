@@ -0,0 +1,49 @@
+# Released under the BSD license, see LICENSE for details
+
+import subprocess, sys, unittest
+
+import _spice
+import spice
+
+class LazyTestCase(unittest.TestCase):
+    def get_modules(self, statement):
+        # the family modules and numpy imported by statement in a new
+        # interpreter
+        script = ('import sys\n%s\n' % statement +
+                  'print " ".join(sorted([x for x in sys.modules '
+                  'if (x.startswith("_spice.") or x == "numpy") and '
+                  'sys.modules[x]]))')
+
+        return subprocess.check_output([sys.executable, '-c', script]).split()
+
+    def test_import(self):
+        self.assertEqual(self.get_modules('import spice'), [])
+        self.assertEqual(self.get_modules('import spice; spice.str2et'),
+                         ['_spice.time'])
+
+    def test_vec_import(self):
+        modules = self.get_modules('import spice; spice.vec.spkezr')
+
+        self.assertTrue('_spice._vec.spk' in modules)
+        self.assertFalse('_spice.spk' in modules)
+        self.assertFalse('_spice._vec.time' in modules)
+
+    def test_lookup(self):
+        time = _spice._load_family('time')
+
+        self.assertTrue(time is _spice._load_family('time'))
+        self.assertTrue(spice.str2et is time.str2et)
+        self.assertTrue('str2et' in dir(spice))
+        self.assertTrue('str2et' in spice.__all__)
+        self.assertRaises(ValueError, _spice._load_family, 'not_a_family')
+        self.assertRaises(AttributeError, getattr, spice, 'not_a_function')
+
+    def test_submodules(self):
+        self.assertTrue('vec' in dir(spice))
+        self.assertTrue(spice.vec is sys.modules['spice.vec'])
+        self.assertTrue(spice.vec.pxform is spice.vec.pxform)
+        self.assertRaises(AttributeError, getattr, spice.vec, 'not_a_function')
+
+
+if __name__ == '__main__':
+    unittest.main()
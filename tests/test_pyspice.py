@@ -1,6 +1,7 @@
 # Released under the BSD license, see LICENSE for details
 
-import os, sys, unittest
+import os, pickle, sys, unittest
+import spice
 from spice import Ellipse, Plane
 
 class TestFile(unittest.TestCase):
@@ -28,6 +29,35 @@ class TestFile(unittest.TestCase):
         self.assertTrue(p.normal == normal)
         self.assertTrue(p.constant == constant)
 
+    def testPlaneRoundTrip(self):
+        normal = [0.0, 0.0, 1.0]
+
+        p = spice.nvc2pl(normal, 2.0)
+
+        self.assertTrue(isinstance(p, Plane))
+        self.assertEqual(spice.pl2nvc(p), (tuple(normal), 2.0))
+
+    def testEllipseFromPlane(self):
+        p = Plane([0.0, 0.0, 1.0], 0.0)
+
+        e = spice.inedpl(2.0, 2.0, 1.0, p)
+
+        self.assertTrue(isinstance(e, Ellipse))
+        self.assertEqual(e.center, [0.0, 0.0, 0.0])
+        self.assertEqual(sorted(abs(x) for x in e.semi_major + e.semi_minor),
+                         [0.0, 0.0, 0.0, 0.0, 2.0, 2.0])
+
+    def testBadObject(self):
+        self.assertRaises(TypeError, spice.pl2nvc, [0.0, 0.0, 1.0])
+        self.assertRaises(ValueError, Plane, [0.0, 1.0])
+
+    def testPickle(self):
+        e = Ellipse([1.0, 2.0, 3.0], [4.0, 5.0, 6.0], [7.0, 8.0, 9.0])
+
+        copy = pickle.loads(pickle.dumps(e))
+
+        self.assertEqual(repr(copy), repr(e))
+
 
 if __name__ == '__main__':
     unittest.main()
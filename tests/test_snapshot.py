@@ -0,0 +1,71 @@
+# Released under the BSD license, see LICENSE for details
+
+import os, shutil, tempfile, unittest
+
+import spice
+
+KERNEL = """
+\\begindata
+
+TEST_NUMBERS = ( 1.5, 2, -3.25D2 )
+TEST_STRINGS = ( 'first', 'second value' )
+
+\\begintext
+"""
+
+class SnapshotTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.kernel = os.path.join(self.directory, 'test.tpc')
+        self.path = os.path.join(self.directory, 'test.snapshot')
+
+        with open(self.kernel, 'w') as f:
+            f.write(KERNEL)
+
+    def tearDown(self):
+        spice.kclear()
+        shutil.rmtree(self.directory)
+
+    def check_pool(self):
+        self.assertEqual(tuple(spice.gdpool('TEST_NUMBERS', 0, 10)[1]),
+                         (1.5, 2.0, -325.0))
+        self.assertEqual(tuple(spice.gcpool('TEST_STRINGS', 0, 10)[1]),
+                         ('first', 'second value'))
+
+    def test_restore(self):
+        spice.furnsh(self.kernel)
+        spice.snapshot.save(self.path)
+        spice.kclear()
+
+        self.assertEqual(spice.gdpool('TEST_NUMBERS', 0, 10), None)
+        self.assertTrue(spice.snapshot.is_current(self.path))
+
+        spice.snapshot.restore(self.path)
+        self.check_pool()
+
+    def test_changed(self):
+        spice.furnsh(self.kernel)
+        spice.snapshot.save(self.path)
+        spice.kclear()
+
+        with open(self.kernel, 'a') as f:
+            f.write('\n')
+
+        self.assertFalse(spice.snapshot.is_current(self.path))
+        self.assertRaises(ValueError, spice.snapshot.restore, self.path)
+
+    def test_load(self):
+        self.assertFalse(spice.snapshot.is_current(self.path))
+
+        spice.snapshot.load(self.kernel, self.path)
+        self.check_pool()
+        self.assertTrue(spice.snapshot.is_current(self.path))
+
+        spice.kclear()
+        spice.snapshot.load(self.kernel, self.path)
+        self.check_pool()
+        self.assertEqual(spice.ktotal('ALL'), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,125 @@
+# Released under the BSD license, see LICENSE for details
+
+import os, random, shutil, tempfile, unittest
+
+import spice
+
+try:
+    import numpy
+    from spice import spkcheb
+except ImportError:
+    numpy = None
+
+@unittest.skipIf(numpy is None, 'numpy is not installed')
+class SpkChebTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'test.bsp')
+
+        handle = spice.spkopn(self.path, 'test', 0)
+        rand = random.Random(1)
+
+        def coefficients(records, components, degree):
+            return [[rand.uniform(-1e4, 1e4) / (k + 1) ** 2
+                     for i in range(components) for k in range(degree + 1)]
+                    for j in range(records)]
+
+        # -1000 relative to -1001 in two type 2 segments, and -1001
+        # relative to the earth in a type 3 segment
+        spice.spkw02(handle, -1000, -1001, 'J2000', 0.0, 500.0, 'test',
+                     100.0, 5, coefficients(5, 3, 5), 0.0)
+        spice.spkw02(handle, -1000, -1001, 'J2000', 500.0, 1000.0, 'test',
+                     50.0, 8, coefficients(10, 3, 8), 500.0)
+        spice.spkw03(handle, -1001, 399, 'J2000', 0.0, 1000.0, 'test',
+                     250.0, 4, coefficients(4, 6, 4), 0.0)
+        spice.spkcls(handle)
+        spice.furnsh(self.path)
+
+    def tearDown(self):
+        spice.unload(self.path)
+        shutil.rmtree(self.directory)
+
+    def check(self, target, center, first, last):
+        ephemeris = spkcheb.Ephemeris(target, center, first, last)
+        ets = numpy.linspace(first, last, 101)
+
+        states = ephemeris.state(ets)
+        expected = [spice.spkgeo(target, et, 'J2000', center)[0] for et in ets]
+
+        self.assertEqual(ephemeris.frame, 'J2000')
+        self.assertTrue(numpy.allclose(states, expected, rtol=1e-13, atol=0))
+        self.assertTrue(numpy.allclose(ephemeris.position(ets), states[:, :3],
+                                       rtol=1e-13, atol=0))
+
+    def test_segments(self):
+        self.check(-1000, -1001, 0.0, 1000.0)
+        self.check(-1000, -1001, 123.0, 456.0)
+        self.check(-1001, 399, 0.0, 1000.0)
+
+    def test_chain(self):
+        self.check(-1000, 399, 0.0, 1000.0)
+        self.check(399, -1000, 250.0, 750.0)
+        self.check(-1000, -1000, 0.0, 1000.0)
+
+    def test_array_returns(self):
+        # -1002 relative to -1001 in two segments, the first of which has the
+        # higher priority at the boundary
+        path = os.path.join(self.directory, 'reversed.bsp')
+        handle = spice.spkopn(path, 'test', 0)
+        spice.spkw02(handle, -1002, -1001, 'J2000', 500.0, 1000.0, 'test',
+                     100.0, 2, [[2.0] * 9] * 5, 500.0)
+        spice.spkw02(handle, -1002, -1001, 'J2000', 0.0, 500.0, 'test',
+                     100.0, 2, [[1.0] * 9] * 5, 0.0)
+        spice.spkcls(handle)
+        spice.furnsh(path)
+
+        previous = spice.set_array_returns(True)
+
+        try:
+            self.check(-1000, -1001, 0.0, 1000.0)
+            self.check(-1002, -1001, 0.0, 1000.0)
+
+            # the second segment is used right after the boundary
+            link = spkcheb.Ephemeris(-1002, -1001, 0.0, 1000.0)._links[-1002]
+            boundary = numpy.nextafter(500.0, numpy.inf)
+
+            self.assertEqual([(x.first, x.last) for x in link.segments],
+                             [(0.0, 500.0), (boundary, 1000.0)])
+        finally:
+            spice.set_array_returns(previous)
+            spice.unload(path)
+
+    def test_priority(self):
+        # a local file loaded over the first segment of -1000 from 200 to 300
+        path = os.path.join(self.directory, 'local.bsp')
+        handle = spice.spkopn(path, 'test', 0)
+        spice.spkw02(handle, -1000, -1001, 'J2000', 200.0, 300.0, 'test',
+                     100.0, 2, [[3.0] * 9], 200.0)
+        spice.spkcls(handle)
+        spice.furnsh(path)
+
+        try:
+            self.check(-1000, -1001, 0.0, 1000.0)
+            self.check(-1000, 399, 100.0, 400.0)
+
+            link = spkcheb.Ephemeris(-1000, -1001, 0.0, 1000.0)._links[-1000]
+            boundary = numpy.nextafter(300.0, numpy.inf)
+
+            self.assertEqual([(x.first, x.last) for x in link.segments],
+                             [(0.0, 200.0), (200.0, 300.0), (boundary, 500.0),
+                              (500.0, 1000.0)])
+        finally:
+            spice.unload(path)
+
+    def test_errors(self):
+        ephemeris = spkcheb.Ephemeris(-1000, -1001, 0.0, 500.0)
+
+        self.assertRaises(ValueError, ephemeris.state, [600.0])
+        self.assertRaises(ValueError, spkcheb.Ephemeris, -1000, -1001, 0.0,
+                          2000.0)
+        self.assertRaises(ValueError, spkcheb.Ephemeris, -1000, 10, 0.0,
+                          100.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,37 @@
+# Released under the BSD license, see LICENSE for details
+
+import unittest
+
+import spice
+
+class StatsTestCase(unittest.TestCase):
+    def setUp(self):
+        spice.reset_stats()
+
+    def test_stats(self):
+        spice.vnorm((3.0, 4.0, 0.0))
+        spice.vnorm((1.0, 0.0, 0.0))
+        self.assertRaises(TypeError, spice.vnorm, None)
+
+        stats = spice.stats()
+
+        # empty unless the extension was built with PYSPICE_STATS
+        if not stats:
+            return
+
+        self.assertEqual(stats['vnorm']['calls'], 3)
+        self.assertEqual(stats['vnorm']['errors'], 1)
+        self.assertTrue(stats['vnorm']['cspice_time'] >= 0)
+        self.assertTrue(stats['vnorm']['conversion_time'] >= 0)
+
+    def test_reset(self):
+        spice.vnorm((3.0, 4.0, 0.0))
+        spice.reset_stats()
+
+        for stats in spice.stats().values():
+            self.assertEqual(stats['calls'], 0)
+            self.assertEqual(stats['errors'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
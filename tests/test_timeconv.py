@@ -0,0 +1,107 @@
+# Released under the BSD license, see LICENSE for details
+
+import os, random, shutil, tempfile, unittest
+
+import spice
+
+try:
+    import numpy
+    from spice import timeconv
+except ImportError:
+    numpy = None
+
+LEAPSECONDS = """
+\\begindata
+
+DELTET/DELTA_T_A = 32.184
+DELTET/K = 1.657D-3
+DELTET/EB = 1.671D-2
+DELTET/M = ( 6.239996D0 1.99096871D-7 )
+
+DELTET/DELTA_AT = ( 10, @1972-JAN-1
+                    11, @1972-JUL-1
+                    12, @1973-JAN-1
+                    32, @1999-JAN-1
+                    33, @2006-JAN-1
+                    34, @2009-JAN-1
+                    35, @2012-JUL-1
+                    36, @2015-JUL-1
+                    37, @2017-JAN-1 )
+
+\\begintext
+"""
+
+@unittest.skipIf(numpy is None, 'numpy is not installed')
+class TimeConvTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'test.tls')
+
+        with open(self.path, 'w') as f:
+            f.write(LEAPSECONDS)
+
+        spice.furnsh(self.path)
+        self.times = timeconv.TimeConverter()
+
+        rand = random.Random(1)
+        self.ets = [rand.uniform(-1e9, 1e9) for i in range(100)]
+        # around the leap second at the end of 2016
+        self.ets += [spice.str2et('2016-12-31T23:59:59') + 0.25 * i
+                     for i in range(9)]
+
+    def tearDown(self):
+        spice.unload(self.path)
+        shutil.rmtree(self.directory)
+
+    def test_str2et(self):
+        strings = ['2000-01-01T12:00:00', '2016-12-31T23:59:60.5',
+                   '2017-001T00:00:00.125', '2012 jun 30 23:59:60.75',
+                   '1999-12-31T23:59:59.999999', '1972-06-30T23:59:60.1',
+                   '2000-060T06:30:15.333333333', '1980 FEB 29 00:00:00.7']
+
+        ets = self.times.str2et(strings)
+
+        # within two units in the last place, see the module docstring
+        for string, et in zip(strings, ets):
+            expected = spice.str2et(string)
+
+            self.assertTrue(abs(et - expected) <=
+                            2 * numpy.spacing(abs(expected)),
+                            '%s: %r != %r' % (string, et, expected))
+
+        self.assertEqual(self.times.str2et(strings[0]), ets[0])
+
+    def test_et2utc(self):
+        for format in ('ISOC', 'ISOD', 'C'):
+            for prec in (0, 3, 6):
+                strings = self.times.et2utc(self.ets, format, prec)
+                expected = [spice.et2utc(et, format, prec) for et in self.ets]
+
+                self.assertEqual(list(strings), expected)
+
+    def test_round_trip(self):
+        ets = numpy.array(self.ets)
+        strings = self.times.et2utc(ets, 'ISOC', 9)
+
+        self.assertTrue(numpy.allclose(self.times.str2et(strings), ets,
+                                       rtol=0, atol=1e-6))
+
+        unix = self.times.et2unix(ets)
+        self.assertTrue(numpy.allclose(self.times.unix2et(unix)[:100],
+                                       ets[:100], rtol=0, atol=1e-6))
+
+        times = self.times.et2datetime(ets)
+        self.assertEqual(times.dtype, numpy.dtype('datetime64[ns]'))
+        self.assertTrue(numpy.allclose(self.times.datetime2et(times)[:100],
+                                       ets[:100], rtol=0, atol=1e-6))
+
+    def test_errors(self):
+        self.assertRaises(ValueError, self.times.str2et, '2017-02-30T00:00:00')
+        self.assertRaises(ValueError, self.times.str2et, '2017-01-01T00:00:60')
+        self.assertRaises(ValueError, self.times.str2et, 'JD 2451545.0')
+        self.assertRaises(ValueError, self.times.et2utc, 0.0, 'J', 3)
+        self.assertRaises(ValueError, self.times.et2utc, 0.0, 'ISOC', 12)
+
+
+if __name__ == '__main__':
+    unittest.main()
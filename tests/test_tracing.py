@@ -0,0 +1,64 @@
+# Released under the BSD license, see LICENSE for details
+
+import json, os, shutil, tempfile, unittest
+
+import spice
+
+class TracingTestCase(unittest.TestCase):
+    def setUp(self):
+        try:
+            spice.tracing.start(4)
+        except RuntimeError:
+            self.skipTest('the extension was built without PYSPICE_STATS')
+
+    def tearDown(self):
+        spice.tracing.stop()
+        spice.tracing.drain()
+
+    def test_drain(self):
+        spice.vnorm((3.0, 4.0, 0.0))
+        self.assertRaises(TypeError, spice.vnorm, None)
+
+        events = spice.tracing.drain()
+
+        self.assertEqual([x['name'] for x in events], ['vnorm', 'vnorm'])
+        self.assertEqual([x['args']['error'] for x in events], [False, True])
+        self.assertTrue(events[0]['ts'] <= events[1]['ts'])
+        self.assertTrue(events[0]['dur'] >= 0)
+
+        self.assertEqual(spice.tracing.drain(), [])
+
+    def test_overwritten(self):
+        for i in range(6):
+            spice.vnorm((1.0, 0.0, 0.0))
+
+        events = spice.tracing.drain()
+
+        # an instant event for the two calls that did not fit
+        self.assertEqual(len(events), 5)
+        self.assertEqual(events[0]['ph'], 'i')
+
+    def test_stop(self):
+        spice.tracing.stop()
+        spice.vnorm((1.0, 0.0, 0.0))
+
+        self.assertEqual(spice.tracing.drain(), [])
+
+    def test_write(self):
+        directory = tempfile.mkdtemp()
+        path = os.path.join(directory, 'trace.json')
+
+        try:
+            spice.vnorm((1.0, 0.0, 0.0))
+            spice.tracing.write(path)
+
+            with open(path) as f:
+                trace = json.load(f)
+        finally:
+            shutil.rmtree(directory)
+
+        self.assertEqual(len(trace['traceEvents']), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+# Released under the BSD license, see LICENSE for details
+
+import math, os, shutil, tempfile, unittest
+
+import _spice
+import spice
+
+class VecTestCase(unittest.TestCase):
+    def test_pxform(self):
+        ets = [0.0, 3600.0, 86400.0]
+
+        rotations = spice.vec.pxform('J2000', 'ECLIPJ2000', ets)
+
+        self.assertEqual(len(rotations), 3)
+
+        for i, et in enumerate(ets):
+            expected = spice.pxform('J2000', 'ECLIPJ2000', et)
+            rotation = tuple([tuple(row) for row in rotations[i]])
+
+            self.assertEqual(rotation, expected)
+
+    def test_buffer(self):
+        frames = _spice._load_vec_family('frames')
+        rotations = frames.pxform('J2000', 'ECLIPJ2000', [0.0, 1.0])
+
+        self.assertEqual(rotations.shape, (2, 3, 3))
+        self.assertEqual(memoryview(rotations).shape, (2, 3, 3))
+        self.assertEqual(len(rotations.tolist()), 2)
+
+    def test_failure(self):
+        self.assertRaises(spice.SpiceException, spice.vec.pxform,
+                          'J2000', 'NOT_A_FRAME', [0.0])
+
+    def test_bad_input(self):
+        self.assertRaises(TypeError, spice.vec.pxform,
+                          'J2000', 'ECLIPJ2000', ['not a number'])
+        self.assertRaises(TypeError, spice.vec.pxform,
+                          'J2000', 'ECLIPJ2000', [u'a'])
+        self.assertRaises(TypeError, spice.vec.pxform,
+                          'J2000', 'ECLIPJ2000', [[[[0.0]]]])
+
+    def test_bad_errors(self):
+        self.assertRaises(ValueError, spice.vec.pxform,
+                          'J2000', 'ECLIPJ2000', [0.0], errors='ignore')
+        self.assertRaises(TypeError, spice.vec.pxform,
+                          'J2000', 'ECLIPJ2000', [0.0], error='mask')
+
+class MaskTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'test.bsp')
+
+        # body -1000 covered from et 0 to 300
+        epochs = [0.0, 100.0, 200.0, 300.0]
+        states = [(et, 0.0, 0.0, 1.0, 0.0, 0.0) for et in epochs]
+
+        handle = spice.spkopn(self.path, 'test', 0)
+        spice.spkw09(handle, -1000, 399, 'J2000', 0.0, 300.0, 'test', 1,
+                     states, epochs)
+        spice.spkcls(handle)
+
+        spice.furnsh(self.path)
+
+    def tearDown(self):
+        spice.unload(self.path)
+        shutil.rmtree(self.directory)
+
+    def test_mask(self):
+        positions, lts, failed, codes = spice.vec.spkpos(
+            '-1000', [10.0, 1000.0, 20.0], 'J2000', 'NONE', '399',
+            errors='mask')
+
+        self.assertEqual([bool(x) for x in failed], [False, True, False])
+        self.assertEqual([str(x) for x in codes],
+                         ['', 'SPICE(SPKINSUFFDATA)', ''])
+
+        self.assertEqual(positions[0][0], 10.0)
+        self.assertEqual(positions[2][0], 20.0)
+        self.assertTrue(all([math.isnan(x) for x in positions[1]]))
+        self.assertTrue(math.isnan(lts[1]))
+
+        # the error was reset
+        self.assertEqual(spice.spkpos('-1000', 30.0, 'J2000', 'NONE',
+                                      '399')[0][0], 30.0)
+
+    def test_raise(self):
+        self.assertRaises(spice.errors.SPKINSUFFDATA, spice.vec.spkpos,
+                          '-1000', [10.0, 1000.0], 'J2000', 'NONE', '399')
+        self.assertRaises(spice.errors.SPKINSUFFDATA, spice.vec.spkpos,
+                          '-1000', [10.0, 1000.0], 'J2000', 'NONE', '399',
+                          errors='raise')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,135 @@
+# Released under the BSD license, see LICENSE for details
+
+import math, os, shutil, tempfile, unittest
+
+import spice
+
+def orbit(et):
+    angle = et / 1000.0
+
+    return (7000.0 * math.cos(angle), 7000.0 * math.sin(angle), 0.0,
+            -7.0 * math.sin(angle), 7.0 * math.cos(angle), 0.0)
+
+class SpkWriterTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'test.bsp')
+        self.handle = spice.spkopn(self.path, 'test', 0)
+
+    def tearDown(self):
+        spice.unload(self.path)
+        shutil.rmtree(self.directory)
+
+    def load(self):
+        spice.spkcls(self.handle)
+        spice.furnsh(self.path)
+
+    def check(self, ets):
+        for et in ets:
+            state = spice.spkezr('-1000', et, 'J2000', 'NONE', '399')[0]
+
+            for value, expected in zip(state, orbit(et)):
+                self.assertAlmostEqual(value, expected, 4)
+
+    def test_spkw13(self):
+        epochs = [10.0 * i for i in range(101)]
+        states = [orbit(et) for et in epochs]
+
+        spice.spkw13(self.handle, -1000, 399, 'J2000', 0.0, 1000.0, 'test',
+                     7, states, epochs)
+        self.load()
+
+        self.check([0.0, 123.4, 555.5, 1000.0])
+
+    def test_mismatch(self):
+        self.assertRaises(ValueError, spice.spkw09, self.handle, -1000, 399,
+                          'J2000', 0.0, 10.0, 'test', 3, [orbit(0.0)] * 3,
+                          [0.0, 10.0])
+        self.assertRaises(ValueError, spice.spkw09, self.handle, -1000, 399,
+                          'J2000', 0.0, 10.0, 'test', 3, [(1.0, 2.0)] * 2,
+                          [0.0, 10.0])
+        spice.dafcls(self.handle)
+
+    def test_segments(self):
+        def chunks():
+            for start in range(0, 1000, 100):
+                epochs = [start + 10.0 * i for i in range(10)]
+                yield epochs, [orbit(et) for et in epochs]
+
+        count = spice.writers.write_spk_segments(self.handle, -1000, 399,
+                                                 'J2000', 'test', 5, chunks(),
+                                                 spice.spkw09)
+        self.load()
+
+        self.assertEqual(count, 11)
+        self.check([0.0, 5.0, 333.3, 640.0, 777.7, 990.0])
+
+def attitude(sclkdp):
+    angle = sclkdp / 1000.0
+
+    return (math.cos(angle / 2.0), 0.0, 0.0, math.sin(angle / 2.0))
+
+class CkWriterTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'test.bc')
+        self.handle = spice.ckopn(self.path, 'test', 0)
+
+    def tearDown(self):
+        spice.unload(self.path)
+        shutil.rmtree(self.directory)
+
+    def load(self):
+        spice.ckcls(self.handle)
+        spice.furnsh(self.path)
+
+    def check(self, ticks, found=True):
+        for sclkdp in ticks:
+            result = spice.ckgp(-1000, sclkdp, 0.0, 'J2000')
+
+            self.assertEqual(result is not None, found)
+
+            if found:
+                cmat, clkout = result
+                expected = spice.q2m(attitude(sclkdp))
+
+                for row, expected_row in zip(cmat, expected):
+                    for value, expected_value in zip(row, expected_row):
+                        self.assertAlmostEqual(value, expected_value, 9)
+
+    def test_ckw03(self):
+        ticks = [10.0 * i for i in range(101)]
+        quats = [attitude(x) for x in ticks]
+        avvs = [(0.0, 0.0, 0.0)] * len(ticks)
+
+        spice.ckw03(self.handle, 0.0, 1000.0, -1000, 'J2000', False, 'test',
+                    ticks, quats, avvs, [0.0, 500.0])
+        spice.ckw01(self.handle, 2000.0, 2010.0, -1000, 'J2000', False,
+                    'test', [2000.0, 2010.0], [attitude(2000.0)] * 2,
+                    [(0.0, 0.0, 0.0)] * 2)
+        self.load()
+
+        self.check([0.0, 123.4, 500.0, 1000.0, 2000.0])
+        self.check([495.0, 2005.0], False)
+
+    def test_segments(self):
+        def chunks():
+            for start in range(0, 1000, 100):
+                ticks = [start + 10.0 * i for i in range(10)]
+
+                # leave a gap in the telemetry after 500 ticks
+                if start != 500:
+                    yield (ticks, [attitude(x) for x in ticks],
+                           [(0.0, 0.0, 0.0)] * len(ticks))
+
+        count = spice.writers.write_ck_segments(self.handle, -1000, 'J2000',
+                                                False, 'test', chunks(), 50.0)
+        self.load()
+
+        self.assertEqual(count, 9)
+        self.check([0.0, 95.0, 399.5, 600.0, 695.0, 990.0])
+        self.check([495.0, 550.0], False)
+
+
+if __name__ == '__main__':
+    unittest.main()